@@ -1,20 +1,137 @@
-from typing import Tuple, Union, Callable, List, Any
-from flask_restful import Resource, reqparse
+from typing import Tuple, Union, Callable, List, Any, Iterable, Optional
+import base64
+import binascii
+import hashlib
+import json
 
-from goto_publication import registry
+from flask import Response, request
+from flask_restful import Resource, reqparse, inputs
+
+from goto_publication import registry, metrics, timing, abbreviations, export, ratelimit, __version__
 from goto_publication.providers import API_KEY_FIELD
 
 import settings
 
-REGISTRY = registry.Registry(settings.REGISTRY_PATH, settings.PROVIDERS)
+
+def make_cache() -> Union[registry.ResultCache, None]:
+    if settings.CACHE_CONFIG.get('PATH') is None:
+        return None
+
+    return registry.ResultCache(
+        settings.CACHE_CONFIG['PATH'],
+        ttl=settings.CACHE_CONFIG['TTL'],
+        negative_ttl=settings.CACHE_CONFIG['NEGATIVE_TTL'],
+        max_size=settings.CACHE_CONFIG['MAX_SIZE'])
+
+
+if settings.ABBREVIATIONS_CONFIG.get('PATH') is not None:
+    abbreviations.set_store(
+        abbreviations.AbbreviationStore(settings.ABBREVIATIONS_CONFIG['PATH']),
+        settings.ABBREVIATIONS_CONFIG['PROCESSES'])
+
+if settings.RATE_LIMIT_CONFIG.get('PATH') is not None:
+    ratelimit.set_store(ratelimit.TokenBucketStore(settings.RATE_LIMIT_CONFIG['PATH']))
+
+if settings.METRICS_CONFIG.get('PATH') is not None:
+    metrics.set_store(metrics.MetricsStore(settings.METRICS_CONFIG['PATH']), settings.METRICS_CONFIG['FLUSH_INTERVAL'])
+
+REGISTRY = registry.Registry(
+    settings.REGISTRY_PATH,
+    settings.PROVIDERS,
+    cache=make_cache(),
+    snapshot_path=settings.REGISTRY_SNAPSHOT_PATH,
+    suggestions_cache_size=settings.API_CONFIG['SUGGESTIONS_CACHE_SIZE'])
 
 
 def make_error(msg: str, arg: str) -> dict:
     return {'message': {arg: msg}}
 
 
+def json_list(value: Any) -> list:
+    """Type of the (JSON) arguments that must be a list (``list()`` would accept a string or an object)"""
+
+    if not isinstance(value, list):
+        raise ValueError('must be a list')
+
+    return value
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag (quoted) for the given parts"""
+
+    return '"{}"'.format(hashlib.sha256('\x00'.join(str(p) for p in parts).encode()).hexdigest()[:32])
+
+
+def conditional_response(etag: str, max_age: int, data: dict = None, body: str = None) -> Union[Response, tuple]:
+    """Answer with a 304 if the client already has this version (``If-None-Match``), otherwise with ``data``
+    (encoded as usual) or with ``body`` (already encoded in JSON).
+    """
+
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age={}'.format(max_age)}
+
+    if request.if_none_match.contains(etag[1:-1]):
+        return Response(status=304, headers=headers)
+
+    if body is not None:
+        return Response(body, headers=headers, content_type='application/json')
+
+    return data, 200, headers
+
+
+class SerializedList:
+    """Items serialized (in JSON) once, from which the pages of a list are built without encoding anything
+    """
+
+    def __init__(self, items: Iterable[Any], version: str):
+        self.items = [json.dumps(i) for i in items]
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def etag(self, *parts: Any) -> str:
+        return make_etag(self.version, __version__, *parts)
+
+    def page(self, start: int, count: int, field: str) -> str:
+        items = self.items[start:start + count]
+        return '{{"start": {}, "count": {}, "total": {}, "{}": [{}]}}\n'.format(
+            start, len(items), len(self.items), field, ', '.join(items))
+
+    def select(self, positions: List[int], field: str, **extra: Any) -> str:
+        """Items at ``positions``, and ``extra`` fields"""
+
+        return '{{{}"count": {}, "{}": [{}]}}\n'.format(
+            ''.join('"{}": {}, '.format(k, json.dumps(v)) for k, v in extra.items()),
+            len(positions),
+            field,
+            ', '.join(self.items[i] for i in positions))
+
+
+def encode_cursor(key: Optional[str]) -> Optional[str]:
+    if key is None:
+        return None
+
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[str]:
+    """Get the key from the cursor (``None`` for the first page)
+
+    :raise ValueError: if the cursor is invalid
+    """
+
+    if cursor == '':
+        return None
+
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeError):
+        raise ValueError(cursor)
+
+
 class ListAPIView(Resource):
     list_field_name = 'list'
+    max_age = 0  # for the `Cache-Control` header
 
     def _get_list(self, start: int, count: int) -> List[Any]:
         raise NotImplementedError()
@@ -33,43 +150,120 @@ class ListAPIView(Resource):
         if args.count > settings.API_CONFIG['MAX_COUNT'] or args.count < 0:
             return make_error('count must be between 0 and {}'.format(settings.API_CONFIG['MAX_COUNT']), 'count'), 400
 
-        li = self._get_list(args.start, args.count)
+        return self._get_response(args)
+
+    def _get_response(self, args: reqparse.Namespace) -> Union[Response, tuple]:
+        start = args.start
+        li = self._get_list(start, args.count)
 
-        return {
-            'start': args.start,
+        data = {
+            'start': start,
             'count': len(li),
             'total': self._get_total(),
             self.list_field_name: li
         }
 
+        return conditional_response(make_etag(json.dumps(data, sort_keys=True)), self.max_age, data=data)
+
 
 class ListProviders(ListAPIView):
     list_field_name = 'providers'
+    max_age = settings.API_CONFIG['PROVIDERS_MAX_AGE']  # short, since the health of the providers changes
 
     def _get_list(self, start: int, count: int) -> List[Any]:
-        return list(p.get_info() for p in REGISTRY.providers.values())[start:start + count]
+        return list(p.get_info(with_health=True) for p in REGISTRY.providers.values())[start:start + count]
 
     def _get_total(self) -> int:
         return len(REGISTRY.providers)
 
 
+# the registry does not change at runtime: the list of journals is serialized once
+JOURNALS = SerializedList((j.get_info() for j in REGISTRY.journals.values()), REGISTRY.content_hash)
+
+
 class ListJournals(ListAPIView):
-    def _get_list(self, start: int, count: int) -> List[Any]:
-        journals = []
+    list_field_name = 'journals'
+    max_age = settings.API_CONFIG['JOURNALS_MAX_AGE']
 
-        for j in list(REGISTRY.journals.values())[start:start + count]:
-            info = {
-                'journal': j.name,
-                'abbreviation': j.abbr
-            }
+    def __init__(self):
+        super().__init__()
 
-            info.update(**j.provider.get_info())
-            journals.append(info)
+        self.parser.add_argument('provider', type=str)
+        self.parser.add_argument('prefix', type=str, default='')
+        self.parser.add_argument('cursor', type=str)
 
-        return journals
+    def _get_response(self, args: reqparse.Namespace) -> Union[Response, tuple]:
+        if args.provider is not None or args.prefix != '' or args.cursor is not None:
+            return self._get_indexed_response(args)
 
-    def _get_total(self) -> int:
-        return len(REGISTRY.journals)
+        start, count = args.start, args.count
+        etag = JOURNALS.etag(start, count)
+
+        if request.if_none_match.contains(etag[1:-1]):
+            return conditional_response(etag, self.max_age)
+
+        with timing.phase('encode'):
+            body = JOURNALS.page(start, count, self.list_field_name)
+
+        return conditional_response(etag, self.max_age, body=body)
+
+    def _get_indexed_response(self, args: reqparse.Namespace) -> Union[Response, tuple]:
+        """Journals sorted by name (and filtered), paginated with a cursor"""
+
+        try:
+            after = decode_cursor(args.cursor or '')
+        except ValueError:
+            return make_error('invalid cursor', 'cursor'), 400
+
+        etag = JOURNALS.etag(args.provider, args.prefix, after, args.count)
+
+        if request.if_none_match.contains(etag[1:-1]):
+            return conditional_response(etag, self.max_age)
+
+        try:
+            positions, last, total = REGISTRY.list_journals(args.count, args.provider, args.prefix, after)
+        except registry.RegistryError as e:
+            return make_error(e.what, e.var), 400
+
+        with timing.phase('encode'):
+            body = JOURNALS.select(positions, self.list_field_name, total=total, next=encode_cursor(last))
+
+        return conditional_response(etag, self.max_age, body=body)
+
+
+class ExportJournals(Resource):
+    """All the journals (of a provider), streamed as NDJSON, compressed if the client accepts gzip"""
+
+    max_age = settings.API_CONFIG['JOURNALS_MAX_AGE']
+
+    def __init__(self):
+        self.parser = reqparse.RequestParser()
+        self.parser.add_argument('provider', type=str)
+
+    def get(self) -> Union[Response, Tuple[dict, int]]:
+        args = self.parser.parse_args()
+
+        if args.provider is not None and args.provider not in REGISTRY.providers:
+            return make_error('unknown provider {}'.format(args.provider), 'provider'), 400
+
+        gzip = 'gzip' in request.accept_encodings
+        etag = JOURNALS.etag('export', args.provider, gzip)
+
+        headers = {'ETag': etag, 'Cache-Control': 'public, max-age={}'.format(self.max_age), 'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains(etag[1:-1]):
+            return Response(status=304, headers=headers)
+
+        if gzip:
+            headers['Content-Encoding'] = 'gzip'
+
+        # the journals are already serialized
+        if args.provider is None:
+            lines = iter(JOURNALS.items)
+        else:
+            lines = (line for line, j in zip(JOURNALS.items, REGISTRY.journals.values())
+                     if j.provider.CODE == args.provider)
+
+        return Response(export.ndjson(lines, gzip=gzip), headers=headers, content_type='application/x-ndjson')
 
 
 class SuggestJournals(Resource):
@@ -79,6 +273,7 @@ class SuggestJournals(Resource):
         self.parser.add_argument('source', default='name', choices=['name', 'abbr'])
         self.parser.add_argument('cutoff', type=float, default=settings.API_CONFIG['DEFAULT_CUTOFF'])
         self.parser.add_argument('count', type=int, default=settings.API_CONFIG['DEFAULT_NUM_SUGGESTIONS'])
+        self.parser.add_argument('mode', default='fuzzy', choices=['fuzzy', 'prefix'])
 
     def get(self) -> Union[dict, Tuple[dict, int]]:
         args = self.parser.parse_args()
@@ -89,21 +284,30 @@ class SuggestJournals(Resource):
         if args.cutoff < .0 or args.cutoff > 1:
             return make_error('cutoff must be between 0 and 1', 'cutoff'), 400
 
+        response = {
+            'request': args.get('q'),
+            'source': args.get('source'),
+            'mode': args.get('mode'),
+            'count': args.get('count'),
+            'cutoff': args.get('cutoff'),
+        }
+
         try:
-            return {
-                'request': args.get('q'),
-                'source': args.get('source'),
-                'count': args.get('count'),
-                'cutoff': args.get('cutoff'),
-                'suggestions': REGISTRY.suggest_journals(
-                    args.get('q'), args.get('source'), args.get('count'), args.get('cutoff')
-                )
-            }
+            if args.get('mode') == 'prefix':
+                response['suggestions'], response['match'] = REGISTRY.complete_journals(
+                    args.get('q'), args.get('source'), args.get('count'), args.get('cutoff'))
+            else:
+                response['suggestions'] = REGISTRY.suggest_journals(
+                    args.get('q'), args.get('source'), args.get('count'), args.get('cutoff'))
         except registry.RegistryError as e:
             return make_error(e.what, e.var), 400
 
+        return response
+
 
 class GetInfo(Resource):
+    max_age = None  # if set, the (successful) responses can be cached
+
     def __init__(self):
         self.parser = reqparse.RequestParser()
         self.parser.add_argument('journal', type=str, required=True)
@@ -117,7 +321,8 @@ class GetInfo(Resource):
         self.apiKey = ''
 
     def _get_func_args(self) -> dict:
-        args = self.parser.parse_args()
+        with timing.phase('reqparse'):
+            args = self.parser.parse_args()
 
         self.journal = args.get('journal')
         self.volume = args.get('volume')
@@ -133,21 +338,14 @@ class GetInfo(Resource):
             self.apiKey = args.get(API_KEY_FIELD)
             func_args[API_KEY_FIELD] = self.apiKey
 
+        if args.get('resolve'):
+            func_args['resolve'] = True
+
         return func_args
 
     def get(self) -> Union[dict, Tuple[dict, int]]:
         func_args = self._get_func_args()
-
-        request = {
-            'journal': self.journal,
-            'volume': self.volume,
-            'page': self.page
-        }
-
-        if self.apiKey:
-            request.update({API_KEY_FIELD: self.apiKey})
-
-        response = {'request': request}
+        response = {'request': dict(func_args)}
         response_code = 200
 
         try:
@@ -156,17 +354,120 @@ class GetInfo(Resource):
             response.update(make_error(e.what, e.var))
             response_code = 400
 
+        max_age = self._get_max_age(func_args)
+        if response_code == 200 and max_age is not None and API_KEY_FIELD not in func_args:
+            return conditional_response(make_etag(json.dumps(response, sort_keys=True)), max_age, data=response)
+
         return response, response_code
 
+    def _get_max_age(self, func_args: dict) -> Optional[int]:
+        return self.max_age
+
     def _get_response_func(self) -> Callable[[str, str, str, dict], dict]:
         raise NotImplementedError()
 
 
 class GetURL(GetInfo):
+    max_age = settings.API_CONFIG['URL_MAX_AGE']
+
+    def __init__(self):
+        super().__init__()
+        self.parser.add_argument('resolve', type=inputs.boolean)  # exact URL, for the providers that forge them
+
     def _get_response_func(self) -> Callable[[str, str, str, dict], dict]:
         return REGISTRY.get_url
 
+    def _get_max_age(self, func_args: dict) -> Optional[int]:
+        """The approximate URLs (of the providers that forge them) are replaced by the exact ones once resolved"""
+
+        journal = REGISTRY.journals.get(func_args['journal'])
+        if journal is not None and journal.provider.URL_RESOLVE and not func_args.get('resolve', False):
+            return settings.API_CONFIG['APPROXIMATE_URL_MAX_AGE']
+
+        return self.max_age
+
 
 class GetDOI(GetInfo):
     def _get_response_func(self) -> Callable[[str, str, str, dict], dict]:
         return REGISTRY.get_doi
+
+
+class BatchGetInfo(Resource):
+    kind = ''
+
+    def __init__(self):
+        self.parser = reqparse.RequestParser()
+        self.parser.add_argument('items', type=json_list, location='json', required=True, nullable=False)
+
+    @staticmethod
+    def _get_func_args(item: Any) -> dict:
+        """Get the arguments of a lookup, raise ``RegistryError`` if the item is malformed
+        """
+
+        if not isinstance(item, dict):
+            raise registry.RegistryError('item', 'must be an object')
+
+        def check(field: str) -> str:
+            value = item[field]
+            if isinstance(value, bool) or not isinstance(value, (str, int)):  # (`bool` is a subclass of `int`)
+                raise registry.RegistryError(field, 'must be a string or an integer')
+
+            return str(value)
+
+        func_args = {}
+        for field in ('journal', 'volume', 'page'):
+            if field not in item:
+                raise registry.RegistryError(field, 'Missing required parameter')
+            func_args[field] = check(field)
+
+        if item.get(API_KEY_FIELD):
+            func_args[API_KEY_FIELD] = check(API_KEY_FIELD)
+
+        return func_args
+
+    def post(self) -> Union[dict, Tuple[dict, int]]:
+        args = self.parser.parse_args()
+        items = args.get('items')
+
+        if len(items) > settings.API_CONFIG['MAX_BATCH_SIZE']:
+            return make_error(
+                'there must be at most {} items'.format(settings.API_CONFIG['MAX_BATCH_SIZE']), 'items'), 400
+
+        responses = []
+        to_lookup = []
+
+        for item in items:
+            try:
+                func_args = self._get_func_args(item)
+                responses.append({'request': dict(func_args)})
+                to_lookup.append((responses[-1], func_args))
+            except registry.RegistryError as e:
+                responses.append({'request': item})
+                responses[-1].update(make_error(e.what, e.var))
+
+        results = REGISTRY.batch(
+            self.kind,
+            [func_args for _, func_args in to_lookup],
+            max_per_provider=settings.API_CONFIG['BATCH_MAX_PER_PROVIDER'],
+            timeout=settings.API_CONFIG['BATCH_DEADLINE'])
+
+        for (response, _), result in zip(to_lookup, results):
+            if isinstance(result, registry.RegistryError):
+                response.update(make_error(result.what, result.var))
+            else:
+                response.update({'result': result})
+
+        return {'count': len(responses), 'results': responses}
+
+
+class BatchGetURL(BatchGetInfo):
+    kind = 'url'
+
+
+class BatchGetDOI(BatchGetInfo):
+    kind = 'doi'
+
+
+class Metrics(Resource):
+    def get(self) -> Response:
+        return Response(metrics.METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
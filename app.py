@@ -1,9 +1,13 @@
 import logging
+import json
 
-from flask import Flask, render_template
+from flask import Flask, render_template, request, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_restful import Api
+from flask_restful.representations.json import output_json
+
+from goto_publication import timing
 
 import settings
 import api_views
@@ -29,6 +33,69 @@ def dummy_decorator(f):
 # API
 api = Api(app)
 
+
+@api.representation('application/json')
+def timed_output_json(data, code, headers=None):
+    with timing.phase('encode'):
+        return output_json(data, code, headers)
+
+
+# Timing and profiling of the API requests
+profiler = timing.Profiler(
+    settings.PROFILING_CONFIG['PATH'],
+    keep=settings.PROFILING_CONFIG['KEEP'],
+    sample_rate=settings.PROFILING_CONFIG['SAMPLE_RATE'],
+    admin_token=settings.PROFILING_CONFIG['ADMIN_TOKEN'])
+
+
+@app.before_request
+def start_timing():
+    if not request.path.startswith('/api/'):
+        return
+
+    timing.start()
+
+    if profiler.wanted(request.headers.get('X-Profile')):
+        g.profile = profiler.start()
+
+
+@app.after_request
+def end_timing(response):
+    t = timing.stop()
+    if t is None:
+        return response
+
+    duration = t.total()
+    response.headers['Server-Timing'] = t.header()
+
+    log = {
+        'method': request.method,
+        'path': request.path,  # not the query string, which may contain an API key
+        'status': response.status_code,
+        'duration': round(duration * 1000, 3),
+        'phases': t.as_dict()
+    }
+
+    profile = g.pop('profile', None)
+    if profile is not None:
+        log['profile'] = profiler.save(profile, duration)
+
+    app.logger.info(json.dumps(log))
+
+    return response
+
+
+@app.teardown_request
+def cancel_timing(exception=None):
+    """When the request failed before ``end_timing()``"""
+
+    timing.stop()
+
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.cancel(profile)
+
+
 # Lists
 if app.config.get('API_RATE_LIMITER_LIST') is not None:
     api_rate_limiter_list = limiter.shared_limit(app.config.get('API_RATE_LIMITER_LIST'), scope='api')
@@ -38,6 +105,9 @@ else:
 api_views.ListJournals.decorators = [api_rate_limiter_list]
 api.add_resource(api_views.ListJournals, '/api/journals')
 
+api_views.ExportJournals.decorators = [api_rate_limiter_list]
+api.add_resource(api_views.ExportJournals, '/api/journals/export')
+
 api_views.ListProviders.decorators = [api_rate_limiter_list]
 api.add_resource(api_views.ListProviders, '/api/providers')
 
@@ -62,6 +132,15 @@ api.add_resource(api_views.GetURL, '/api/url')
 api_views.GetDOI.decorators = [api_rate_limiter_get]
 api.add_resource(api_views.GetDOI, '/api/doi')
 
+api_views.BatchGetURL.decorators = [api_rate_limiter_get]
+api.add_resource(api_views.BatchGetURL, '/api/batch/url')
+
+api_views.BatchGetDOI.decorators = [api_rate_limiter_get]
+api.add_resource(api_views.BatchGetDOI, '/api/batch/doi')
+
+# metrics
+api.add_resource(api_views.Metrics, '/api/metrics')
+
 # MAIN
 if __name__ == '__main__':
     app.run()
@@ -65,7 +65,7 @@ $(function(){
         input: journalInput,
         fetch: (text, update) => {
             $.ajax({
-                url: "/api/suggests?q=" + text + "&source=" + $("#input-suggs-source").val(),
+                url: "/api/suggests?mode=prefix&q=" + encodeURIComponent(text) + "&source=" + $("#input-suggs-source").val(),
                 success: a => {
                     if("suggestions" in a) {
                         let suggs = [];
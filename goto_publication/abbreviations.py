@@ -0,0 +1,151 @@
+"""
+ISO-4 abbreviation of the journal names.
+
+``iso4.abbreviate()`` is slow (it goes through the LTWA and wordnet for each word), and the names rarely change, so
+the abbreviations are memoized: in memory, and in a SQLite file (``set_store()``) shared between the processes and
+kept from one run to the next. The entries are keyed by the name and the version of ``iso4``, so that they are
+computed again when it is updated.
+"""
+
+from typing import Callable, Dict, Iterable, List
+from concurrent.futures import ProcessPoolExecutor
+import threading
+
+import iso4
+
+from goto_publication import db
+
+
+def get_iso4_version() -> str:
+    try:
+        import importlib.metadata
+        return importlib.metadata.version('iso4')
+    except ImportError:  # python < 3.8, or not installed as a distribution
+        return getattr(iso4, '__version__', 'unknown')
+
+
+ISO4_VERSION = get_iso4_version()
+
+
+def compute(name: str) -> str:
+    """Abbreviation of ``name``, without memoization"""
+
+    return iso4.abbreviate(name, periods=False, disambiguation_langs=set('en'))
+
+
+class AbbreviationStore(db.SQLiteStore):
+    """Abbreviations, by name and ``iso4`` version"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS abbreviations (
+            name TEXT NOT NULL,
+            version TEXT NOT NULL,
+            abbr TEXT NOT NULL,
+            PRIMARY KEY (name, version)
+        );
+    """
+
+    CHUNK_SIZE = 500  # (below the maximum number of parameters of a query)
+
+    def get_many(self, names: List[str], version: str = ISO4_VERSION) -> Dict[str, str]:
+        abbrs = {}
+
+        for i in range(0, len(names), self.CHUNK_SIZE):
+            chunk = names[i:i + self.CHUNK_SIZE]
+            abbrs.update(self._connection().execute(
+                'SELECT name, abbr FROM abbreviations WHERE version = ? AND name IN ({})'.format(
+                    ', '.join('?' * len(chunk))),
+                [version] + chunk).fetchall())
+
+        return abbrs
+
+    def put_many(self, abbrs: Dict[str, str], version: str = ISO4_VERSION):
+        self._connection().executemany(
+            'INSERT OR REPLACE INTO abbreviations (name, version, abbr) VALUES (?, ?, ?)',
+            [(name, version, abbr) for name, abbr in abbrs.items()])
+
+
+class Abbreviator:
+    """Memoized abbreviations.
+
+    The missing abbreviations of a bulk request (``abbreviate_all()``) are computed in a pool of ``processes``
+    processes, if more than one (``iso4`` is pure python, so threads would not help).
+    """
+
+    MIN_PER_PROCESS = 8  # below that, starting the processes costs more than it saves
+
+    def __init__(self, store: AbbreviationStore = None, processes: int = 1, func: Callable[[str], str] = compute):
+        self.store = store
+        self.processes = processes
+        self.func = func
+
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def abbreviate(self, name: str) -> str:
+        return self.abbreviate_all([name])[name]
+
+    def abbreviate_all(self, names: Iterable[str]) -> Dict[str, str]:
+        """Abbreviations of ``names``, computing the missing ones"""
+
+        abbrs = {}
+        missing = []
+
+        with self._lock:
+            for name in names:
+                if name in self._memo:
+                    abbrs[name] = self._memo[name]
+                elif name not in abbrs:
+                    abbrs[name] = None
+                    missing.append(name)
+
+        if len(missing) > 0 and self.store is not None:
+            stored = self.store.get_many(missing)
+            abbrs.update(stored)
+            missing = [name for name in missing if name not in stored]
+
+        computed = {}
+        if len(missing) > 0:
+            computed = dict(zip(missing, self._compute_all(missing)))
+            abbrs.update(computed)
+
+            if self.store is not None:
+                self.store.put_many(computed)
+
+        with self._lock:
+            self._memo.update(abbrs)
+
+        return abbrs
+
+    def _compute_all(self, names: List[str]) -> List[str]:
+        processes = min(self.processes, len(names) // self.MIN_PER_PROCESS)
+        if processes < 2:
+            return [self.func(name) for name in names]
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(self.func, names, chunksize=max(1, len(names) // (processes * 4))))
+
+    def clear(self):
+        """Forget the memoized abbreviations (not the stored ones)"""
+
+        with self._lock:
+            self._memo.clear()
+
+
+ABBREVIATOR = Abbreviator()
+
+
+def set_store(store: AbbreviationStore, processes: int = None):
+    """Share the abbreviations through ``store`` (and compute them in ``processes`` processes, if given)"""
+
+    ABBREVIATOR.store = store
+    if processes is not None:
+        ABBREVIATOR.processes = processes
+
+
+def abbreviate(name: str) -> str:
+    return ABBREVIATOR.abbreviate(name)
+
+
+def abbreviate_all(names: Iterable[str]) -> Dict[str, str]:
+    return ABBREVIATOR.abbreviate_all(names)
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base for the stores that are shared between all the (gunicorn) workers of a host, through a SQLite file.
+
+    Each process and thread gets its own connection, created on first use (a connection must never cross a fork).
+    """
+
+    SCHEMA = ''
+
+    def __init__(self, path: str, timeout: float = 5.):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.SCHEMA)
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
@@ -0,0 +1,52 @@
+"""
+Streaming export of the journals as NDJSON (one JSON object per line), possibly compressed with gzip.
+
+Everything is a generator, so that the memory used does not depend on the number of journals.
+"""
+
+from typing import Iterable, Iterator
+import json
+import zlib
+
+from goto_publication import journal as jrnl
+
+CHUNK_LINES = 256  # lines per chunk
+
+
+def journal_lines(journals: Iterable[jrnl.Journal], provider: str = None) -> Iterator[str]:
+    """Serialize the journals (of ``provider``, if given), one per line"""
+
+    for j in journals:
+        if provider is None or j.provider.CODE == provider:
+            yield json.dumps(j.get_info())
+
+
+def ndjson(lines: Iterable[str], gzip: bool = False) -> Iterator[bytes]:
+    """Chunks of the NDJSON document made of ``lines`` (already serialized)"""
+
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None  # (gzip header and trailer)
+
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_LINES:
+            data = _encode(chunk, compressor)
+            chunk = []
+            if data:
+                yield data
+
+    if chunk:
+        data = _encode(chunk, compressor)
+        if data:
+            yield data
+
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _encode(chunk: list, compressor: 'zlib._Compress' = None) -> bytes:
+    data = ''.join(line + '\n' for line in chunk).encode()
+    if compressor is not None:
+        return compressor.compress(data)
+
+    return data
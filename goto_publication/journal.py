@@ -1,7 +1,9 @@
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
+import hashlib
+import json
+import sys
 
-from goto_publication import providers
-import iso4
+from goto_publication import providers, abbreviations
 
 
 class JournalError(Exception):
@@ -14,24 +16,51 @@ class AccessError(JournalError):
         super().__init__(j + ' [' + p + ']', v)
 
 
+class ArticleNotFoundError(AccessError):
+    def __init__(self, p, j, v='Article not found'):
+        super().__init__(p, j, v)
+
+
 class Journal:
     """Define a journal_identifier, containing different articles, which have an URL and a DOI (if valid).
+
+    There are thousands of them in each worker, so they are kept compact: no ``__dict__``, interned strings, and
+    identifiers made of several parts (e.g., APS) are (immutable) tuples.
+
+    If not given, the abbreviation is computed when first needed (see ``abbreviate_journals()`` to compute the
+    abbreviations of many journals at once).
     """
 
+    __slots__ = ('name', 'identifier', '_abbr', 'provider')
+
     def __init__(self, name: str, identifier: Any, provider: 'providers.Provider', abbr: str = None):
-        self.name = name
-        self.identifier = identifier
-        self.abbr = abbr
+        self.name = sys.intern(name)
+        self.identifier = tuple(identifier) if isinstance(identifier, list) else identifier
+        self._abbr = sys.intern(abbr) if abbr is not None else None
+        self.provider = provider
 
-        if self.abbr is None:
-            self.abbr = iso4.abbreviate(self.name, periods=False, disambiguation_langs=set('en'))
+    @property
+    def abbr(self) -> str:
+        if self._abbr is None:
+            self._abbr = sys.intern(abbreviations.abbreviate(self.name))
 
-        self.provider = provider
+        return self._abbr
+
+    def get_info(self) -> Dict[str, str]:
+        """Public information about the journal (as listed by the API)"""
+
+        info = {
+            'journal': self.name,
+            'abbreviation': self.abbr
+        }
+
+        info.update(**self.provider.get_info())
+        return info
 
     def serialize(self) -> Dict[str, Any]:
         return {
             'name': self.name,
-            'identifier': self.identifier,
+            'identifier': list(self.identifier) if isinstance(self.identifier, tuple) else self.identifier,
             'provider': self.provider.CODE,
             'abbr': self.abbr
         }
@@ -45,6 +74,8 @@ class Journal:
 
         try:
             return self.provider.get_url(self.identifier, volume, page, **kwargs)
+        except providers.ArticleNotFound as e:
+            raise ArticleNotFoundError(self.provider.CODE, self.name, str(e))
         except providers.ProviderError as e:
             raise AccessError(self.provider.CODE, self.name, str(e))
         except NotImplementedError:
@@ -55,7 +86,34 @@ class Journal:
 
         try:
             return self.provider.get_doi(self.identifier, volume, page, **kwargs)
+        except providers.ArticleNotFound as e:
+            raise ArticleNotFoundError(self.provider.CODE, self.name, str(e))
         except providers.ProviderError as e:
             raise AccessError(self.provider.CODE, self.name, str(e))
         except NotImplementedError:
             raise AccessError(self.provider.CODE, self.name, 'Not yet implemented')
+
+
+def abbreviate_journals(journals: Iterable[Journal]):
+    """Compute the missing abbreviations of ``journals`` at once"""
+
+    missing = [j for j in journals if j._abbr is None]
+    if len(missing) == 0:
+        return
+
+    abbrs = abbreviations.abbreviate_all(j.name for j in missing)
+    for j in missing:
+        j._abbr = sys.intern(abbrs[j.name])
+
+
+def journals_hash(journals: Iterable[Journal]) -> str:
+    """Hash of the names and identifiers of ``journals`` (in any order), to detect that a listing changed once it is
+    parsed
+    """
+
+    h = hashlib.sha256()
+    for line in sorted(json.dumps([j.name, j.identifier]) for j in journals):  # (tuples as lists)
+        h.update(line.encode())
+        h.update(b'\n')
+
+    return h.hexdigest()
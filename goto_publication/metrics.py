@@ -0,0 +1,336 @@
+"""
+Counters, gauges and latency histograms, exposed in the Prometheus text format.
+
+Each process records its metrics in memory, and periodically writes them (from a background thread, and at exit) to
+a SQLite file shared by all the (gunicorn) workers of the host, where they are summed on collection (the gauges of
+the processes that are gone are dropped).
+Removing the file resets the metrics.
+"""
+
+from typing import List, Tuple, Optional
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from goto_publication import db
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30.)  # in seconds
+
+# name -> (type, help)
+DEFINITIONS = {
+    'goto_provider_requests_total': (
+        COUNTER, 'Outbound HTTP requests to the providers, by provider and status (or transport error)'),
+    'goto_provider_request_duration_seconds': (
+        HISTOGRAM, 'Latency of the outbound HTTP requests to the providers'),
+    'goto_lookups_total': (
+        COUNTER, 'URL/DOI lookups, by kind, provider and outcome (ok, or the type of the error)'),
+    'goto_lookup_duration_seconds': (
+        HISTOGRAM, 'Latency of the URL/DOI lookups (including the cache)'),
+    'goto_suggest_duration_seconds': (
+        HISTOGRAM, 'Latency of the journal suggestions'),
+    'goto_complete_duration_seconds': (
+        HISTOGRAM, 'Latency of the journal completions (prefix mode of the suggestions)'),
+    'goto_cache_requests_total': (
+        COUNTER, 'Requests to the result cache, by kind and result (hit, miss or error)'),
+    'goto_suggest_cache_requests_total': (
+        COUNTER, 'Requests to the (in-memory) cache of the suggestions, by source and result (hit or miss)'),
+    'goto_lookups_in_flight': (
+        GAUGE, 'Upstream URL/DOI lookups in flight, by kind and provider'),
+    'goto_lookups_in_flight_waiters': (
+        GAUGE, 'Callers waiting on the outcome of an identical lookup in flight, by kind and provider'),
+}
+
+GAUGES = tuple(name for name, (type_, _) in DEFINITIONS.items() if type_ == GAUGE)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def make_labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def format_sample(name: str, labels: Labels, value: float) -> str:
+    if len(labels) == 0:
+        return '{} {}'.format(name, format_value(value))
+
+    return '{}{{{}}} {}'.format(name, ','.join('{}="{}"'.format(
+        k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels), format_value(value))
+
+
+class MetricsStore(db.SQLiteStore):
+    """Samples of each process, which are summed on collection.
+
+    To keep the counters monotonic, the samples of the processes that are gone are merged into a single entry
+    (``process = ''``) instead of being dropped. Their gauges are dropped, though.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS metrics (
+            process TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            family TEXT NOT NULL,
+            sample TEXT NOT NULL,
+            labels TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (process, sample, labels)
+        );
+    """
+
+    def write(self, process: str, pid: int, samples: List[Tuple[str, str, Labels, float]]):
+        conn = self._connection()
+
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                'INSERT OR REPLACE INTO metrics (process, pid, family, sample, labels, value) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(process, pid, family, sample, json.dumps(labels), value)
+                 for family, sample, labels, value in samples])
+
+    def compact(self):
+        """Merge the samples of the processes that are gone"""
+
+        conn = self._connection()
+
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            processes = conn.execute("SELECT DISTINCT process, pid FROM metrics WHERE process != ''").fetchall()
+
+            for process, pid in processes:
+                if is_alive(pid):
+                    continue
+
+                conn.execute(
+                    'DELETE FROM metrics WHERE process = ? AND family IN ({})'.format(','.join('?' * len(GAUGES))),
+                    (process, ) + GAUGES)
+                # (no upsert, which requires SQLite >= 3.24)
+                conn.execute(
+                    'INSERT OR IGNORE INTO metrics (process, pid, family, sample, labels, value) '
+                    "SELECT '', 0, family, sample, labels, 0 FROM metrics WHERE process = ?", (process, ))
+                conn.execute(
+                    'UPDATE metrics SET value = value + ('
+                    '  SELECT m.value FROM metrics m '
+                    '  WHERE m.process = ? AND m.sample = metrics.sample AND m.labels = metrics.labels) '
+                    "WHERE process = '' AND EXISTS ("
+                    '  SELECT 1 FROM metrics m '
+                    '  WHERE m.process = ? AND m.sample = metrics.sample AND m.labels = metrics.labels)',
+                    (process, process))
+                conn.execute('DELETE FROM metrics WHERE process = ?', (process, ))
+
+    def aggregate(self) -> List[Tuple[str, str, Labels, float]]:
+        rows = self._connection().execute(
+            'SELECT family, sample, labels, SUM(value) FROM metrics GROUP BY family, sample, labels').fetchall()
+
+        return [(family, sample, tuple(tuple(x) for x in json.loads(labels)), value)
+                for family, sample, labels, value in rows]
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class Metrics:
+    """Metrics of the process.
+
+    If ``store`` is given, the metrics are written to it every ``flush_interval`` seconds when they changed (by a
+    background thread), on collection and at exit, and the collection aggregates the metrics of all processes.
+    """
+
+    def __init__(self, store: MetricsStore = None, flush_interval: float = 1., buckets: Tuple[float, ...] = BUCKETS):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._process = '{}-{}'.format(self._pid, uuid.uuid4().hex[:12])
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket (+Inf included), sum]
+        self._dirty = False
+        self._flusher = None  # (threads do not survive a fork)
+
+    def _check_process(self):
+        """A forked process starts from scratch (otherwise, the parent metrics would be counted twice)"""
+
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment counter ``name``"""
+
+        key = (name, make_labels(labels))
+
+        with self._lock:
+            self._check_process()
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+
+        self._start_flusher()
+
+    def set(self, name: str, value: float, **labels):
+        """Set gauge ``name``"""
+
+        key = (name, make_labels(labels))
+
+        with self._lock:
+            self._check_process()
+            self._gauges[key] = value
+            self._dirty = True
+
+        self._start_flusher()
+
+    def observe(self, name: str, value: float, **labels):
+        """Add ``value`` to histogram ``name``"""
+
+        key = (name, make_labels(labels))
+
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+
+        with self._lock:
+            self._check_process()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [.0]
+
+            histogram[i] += 1
+            histogram[-1] += value
+            self._dirty = True
+
+        self._start_flusher()
+
+    def samples(self) -> List[Tuple[str, str, Labels, float]]:
+        """Samples of this process, as ``(family, sample name, labels, value)``"""
+
+        samples = []
+
+        with self._lock:
+            self._check_process()
+
+            for (name, labels), value in self._counters.items():
+                samples.append((name, name, labels, value))
+
+            for (name, labels), value in self._gauges.items():
+                samples.append((name, name, labels, value))
+
+            for (name, labels), histogram in self._histograms.items():
+                cumulated = 0
+                for le, count in zip(self.buckets + (float('inf'), ), histogram):
+                    cumulated += count
+                    samples.append((name, name + '_bucket', labels + (('le', format_value(le)), ), cumulated))
+
+                samples.append((name, name + '_sum', labels, histogram[-1]))
+                samples.append((name, name + '_count', labels, cumulated))
+
+        return samples
+
+    def _start_flusher(self):
+        if self.store is None or self._flusher is not None:
+            return
+
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        flusher = self._flusher
+        while self._flusher is flusher:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                try:
+                    self.flush()
+                except sqlite3.Error:  # (e.g., locked for too long) will be done on the next round
+                    pass
+
+    def flush(self):
+        if self.store is None:
+            return
+
+        with self._lock:
+            self._dirty = False
+
+        samples = self.samples()
+        if len(samples) > 0:
+            self.store.write(self._process, self._pid, samples)
+
+    def collect(self) -> List[Tuple[str, str, Labels, float]]:
+        """Samples of all the processes (or of this one, if there is no store)"""
+
+        if self.store is None:
+            return self.samples()
+
+        self.flush()
+        self.store.compact()
+        return self.store.aggregate()
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text format"""
+
+        families = {}
+        for family, sample, labels, value in self.collect():
+            families.setdefault(family, []).append((sample, labels, value))
+
+        def sort_key(s: Tuple[str, Labels, float]) -> tuple:
+            sample, labels, value = s
+            le = dict(labels).get('le')
+            return (
+                tuple(x for x in labels if x[0] != 'le'),
+                sample.endswith('_count') * 2 + sample.endswith('_sum'),
+                float(le) if le is not None else .0)
+
+        lines = []
+        for name, (type_, help_) in DEFINITIONS.items():
+            lines.append('# HELP {} {}'.format(name, help_))
+            lines.append('# TYPE {} {}'.format(name, type_))
+            lines.extend(format_sample(*s) for s in sorted(families.get(name, []), key=sort_key))
+
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+@atexit.register
+def flush_at_exit():
+    """Write the last metrics of the process (otherwise, the ones recorded since the last flush are lost)"""
+
+    try:
+        METRICS.flush()
+    except sqlite3.Error:
+        pass
+
+
+def set_store(store: Optional[MetricsStore], flush_interval: float = 1.) -> Metrics:
+    """Share the metrics of the process through ``store``"""
+
+    METRICS.store = store
+    METRICS.flush_interval = flush_interval
+    return METRICS
@@ -1,13 +1,21 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import json
-from bs4 import BeautifulSoup
-from typing import List, Any
-import iso4
+import sqlite3
+import lxml.html
+from lxml import etree
+from typing import List, Any, Callable, Iterable, Tuple, Optional
 import csv
 import io
+import threading
+import hashlib
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from goto_publication import journal
+from goto_publication import journal, abbreviations, metrics, timing, ratelimit
 
 
 class ProviderError(Exception):
@@ -26,6 +34,109 @@ class NoJournalList(ProviderError):
 API_KEY_FIELD = 'apiKey'
 
 
+def has_class(name: str) -> str:
+    """XPath predicate matching the elements with class ``name`` (among others)"""
+
+    return 'contains(concat(" ", normalize-space(@class), " "), " {} ")'.format(name)
+
+
+def text_of(element: lxml.html.HtmlElement) -> str:
+    """All the text of ``element`` (and its descendants), as given by ``BeautifulSoup``'s ``.text``"""
+
+    return element.text_content()
+
+
+class CircuitBreaker:
+    """Track the health of a provider, from the outcome and latency of the last ``window`` requests.
+
+    When at least ``min_calls`` requests were made and the ratio of failures (errors, 5xx responses or requests
+    slower than ``slow_call`` seconds) reaches ``error_rate``, the breaker opens: requests fail fast for
+    ``open_duration`` seconds. Then, it is half-open: a single probe request is allowed, which closes the breaker
+    if it succeeds, or opens it again otherwise.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(
+            self,
+            window: int = 20,
+            min_calls: int = 5,
+            error_rate: float = .5,
+            slow_call: float = 10.,
+            open_duration: float = 30.):
+
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.open_duration = open_duration
+
+        self.state = CircuitBreaker.CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, latency)
+        self._opened_at = .0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request can be made"""
+
+        with self._lock:
+            if self.state == CircuitBreaker.OPEN:
+                if time.monotonic() - self._opened_at < self.open_duration:
+                    return False
+                self.state = CircuitBreaker.HALF_OPEN
+                self._probing = False
+
+            if self.state == CircuitBreaker.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+
+            return True
+
+    def record(self, failed: bool, latency: float):
+        """Record the outcome of a request"""
+
+        failed = failed or latency > self.slow_call
+
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self.state = CircuitBreaker.CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append((failed, latency))
+
+            if self.state == CircuitBreaker.CLOSED and len(self._outcomes) >= self.min_calls \
+                    and sum(f for f, _ in self._outcomes) / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def release(self):
+        """Give up a request that was allowed but not made (so that it is not waited for as a probe)"""
+
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self._probing = False
+
+    def _open(self):
+        self.state = CircuitBreaker.OPEN
+        self._opened_at = time.monotonic()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            n = len(self._outcomes)
+            return {
+                'state': self.state,
+                'errorRate': sum(f for f, _ in self._outcomes) / n if n > 0 else .0,
+                'meanLatency': sum(t for _, t in self._outcomes) / n if n > 0 else .0
+            }
+
+
 class Provider:
     CODE = ''
     NAME = ''
@@ -34,19 +145,221 @@ class Provider:
 
     API_KEY_KWARG = False
 
-    def __init__(self):
+    # how the DOIs are obtained: looked up on the website of the provider, by default (see `APS` for other ways)
+    doi_verification = 'lookup'
+
+    # whether `get_url()` forges an approximate URL, unless the exact one is requested with `resolve=True`
+    URL_RESOLVE = False
+
+    # HTTP transport
+    USER_AGENT = None
+    CONNECT_TIMEOUT = 5.  # in seconds
+    READ_TIMEOUT = 20.  # in seconds
+    MAX_RETRIES = 2  # only for idempotent requests
+    RETRY_BACKOFF = .5  # in seconds
+    POOL_MAXSIZE = 16  # number of keep-alive connections per host
+    CRAWL_MAX_CONCURRENCY = 4  # (polite) maximum number of concurrent requests to the host in `get_journals()`
+    STREAM_CHUNK_SIZE = 16 * 1024  # in bytes
+    STREAM_MAX_BYTES = 2 * 1024 * 1024  # maximum size of a streamed page (see `_stream_html()`)
+    RATE_LIMIT_MAX_WAIT = 10.  # in seconds, maximum wait for the rate limiter before giving up
+
+    def __init__(self, rate_limit: str = None):
+        """
+        :param rate_limit: maximum rate of the requests to the provider (e.g., ``2/second``), for all the workers
+            of the host (see ``ratelimit``), or ``None`` for no limit
+        """
+
         if self.ICON_URL == '':
             self.ICON_URL = self.WEBSITE_URL + 'favicon.ico'
 
-    def get_info(self) -> dict:
-        """Info that every request sends"""
+        # the connection pools are shared by all threads, but each thread gets its own session (and cookies)
+        self._adapter = HTTPAdapter(
+            pool_maxsize=self.POOL_MAXSIZE,
+            max_retries=Retry(
+                total=self.MAX_RETRIES,
+                backoff_factor=self.RETRY_BACKOFF,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False))
+
+        self._local = threading.local()
+        self.breaker = CircuitBreaker()
+
+        self._prefetched = {}  # url -> pages of the listing downloaded by `check_listing()`, reused by the crawl
+
+        self.rate_limiter = ratelimit.RateLimiter(self.CODE, rate_limit) if rate_limit is not None else None
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+
+            if self.USER_AGENT is not None:
+                session.headers['User-Agent'] = self.USER_AGENT
+
+            self._local.session = session
+
+        return session
+
+    def _request(self, method: str, url: str, **kwargs: dict) -> requests.Response:
+        """Perform a request through the (pooled) transport of the provider.
+
+        Raise ``ProviderError`` if the provider cannot be reached in time, if it is considered as unavailable
+        by the circuit breaker, or if the rate limit would delay the request for too long.
+        """
+
+        kwargs.setdefault('timeout', (self.CONNECT_TIMEOUT, self.READ_TIMEOUT))
+
+        if not self.breaker.allow():
+            metrics.METRICS.inc('goto_provider_requests_total', provider=self.CODE, status='unavailable')
+            raise ProviderError('{} is temporarily unavailable'.format(self.NAME))
+
+        if self.rate_limiter is not None:
+            try:
+                with timing.phase('ratelimit'):
+                    self.rate_limiter.acquire(self.RATE_LIMIT_MAX_WAIT)
+            except BaseException as e:
+                self.breaker.release()  # (the request is not made)
+
+                if isinstance(e, ratelimit.RateLimited):
+                    metrics.METRICS.inc('goto_provider_requests_total', provider=self.CODE, status='rate-limited')
+                    raise ProviderError('too many requests to {}, try again later'.format(self.NAME))
+                elif isinstance(e, sqlite3.Error):  # e.g., the buckets are locked for too long
+                    metrics.METRICS.inc('goto_provider_requests_total', provider=self.CODE, status='rate-limited')
+                    raise ProviderError('cannot rate limit the requests to {}'.format(self.NAME))
+
+                raise
+
+        start = time.monotonic()
+        try:
+            with timing.phase('upstream'):
+                response = self._session().request(method, url, **kwargs)
+        except requests.Timeout:
+            self._record(True, start, 'timeout')
+            raise ProviderError('timeout while contacting {}'.format(self.NAME))
+        except requests.RequestException:
+            self._record(True, start, 'error')
+            raise ProviderError('error while contacting {}'.format(self.NAME))
+        except Exception:
+            self._record(True, start, 'error')
+            raise
+
+        self._record(response.status_code >= 500, start, response.status_code)
+        return response
+
+    def _record(self, failed: bool, start: float, status: [str, int]):
+        """Record the outcome of a request, in the circuit breaker and in the metrics"""
+
+        latency = time.monotonic() - start
+        self.breaker.record(failed, latency)
+
+        metrics.METRICS.inc('goto_provider_requests_total', provider=self.CODE, status=status)
+        metrics.METRICS.observe('goto_provider_request_duration_seconds', latency, provider=self.CODE)
+
+    def _html(self, content: bytes, encoding: str = 'utf-8') -> lxml.html.HtmlElement:
+        """Parse an HTML page, to extract its content with (compiled) XPath expressions"""
+
+        with timing.phase('parse'):
+            if len(content.strip()) == 0:
+                return lxml.html.Element('html')
+
+            return lxml.html.fromstring(content, parser=lxml.html.HTMLParser(encoding=encoding))
+
+    def _stream_html(
+            self,
+            method: str,
+            url: str,
+            until: Callable[[str, lxml.html.HtmlElement], bool],
+            encoding: str = 'utf-8',
+            **kwargs: dict
+    ) -> Tuple[requests.Response, lxml.html.HtmlElement]:
+        """Perform a request, and parse the page while it is received, until ``until(event, element)`` is true
+        (for the ``start`` and ``end`` events of each element) or ``STREAM_MAX_BYTES`` were read.
+        The connection is then closed, without reading the rest of the page.
+
+        Only the pages of successful (200) responses are parsed, otherwise the (partial) page is ``None``.
+        """
+
+        response = self._request(method, url, stream=True, **kwargs)
+
+        if response.status_code != 200:
+            response.close()
+            return response, None
+
+        parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+        parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+
+        read = 0
+        try:
+            chunks = response.iter_content(self.STREAM_CHUNK_SIZE)
+            done = False
+
+            while not done and read < self.STREAM_MAX_BYTES:
+                with timing.phase('upstream'):
+                    chunk = next(chunks, None)
+
+                if chunk is None:
+                    break
+
+                read += len(chunk)
+
+                with timing.phase('parse'):
+                    parser.feed(chunk)
+                    for event, element in parser.read_events():
+                        if until(event, element):
+                            done = True
+                            break
+        except requests.RequestException:
+            raise ProviderError('error while contacting {}'.format(self.NAME))
+        finally:
+            response.close()
+
+        if read == 0:
+            return response, lxml.html.Element('html')
+
+        with timing.phase('parse'):
+            return response, parser.close()
+
+    def _get(self, url: str, **kwargs: dict) -> requests.Response:
+        if len(kwargs) == 0 and url in self._prefetched:
+            return self._prefetched.pop(url)
+
+        return self._request('GET', url, **kwargs)
+
+    def _post(self, url: str, **kwargs: dict) -> requests.Response:
+        return self._request('POST', url, **kwargs)
+
+    def _put(self, url: str, **kwargs: dict) -> requests.Response:
+        return self._request('PUT', url, **kwargs)
+
+    def _map_pages(self, func: Callable[[int], Any], pages: Iterable[int], jobs: int = 1) -> list:
+        """Get ``func(page)`` for each page, in order, with at most ``jobs`` (and ``CRAWL_MAX_CONCURRENCY``)
+        pages fetched concurrently.
+        """
+
+        workers = max(1, min(jobs, self.CRAWL_MAX_CONCURRENCY))
+        if workers == 1:
+            return [func(page) for page in pages]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, pages))
 
-        return {
+    def get_info(self, with_health: bool = False) -> dict:
+        """Info that every request sends (and the state of the circuit breaker, if ``with_health``)"""
+
+        info = {
             'providerName': self.NAME,
             'providerIcon': self.ICON_URL,
             'providerWebsite': self.WEBSITE_URL,
         }
 
+        if with_health:
+            info['providerHealth'] = self.breaker.get_status()
+
+        return info
+
     def get_url(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
         """Get an url that go close to the actual article (a search page with the form filled, or in the
         best cases, the actual article).
@@ -67,11 +380,86 @@ class Provider:
 
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
         """Retrieve, at **any** cost, a list of the journals of this provider.
-        :param **kwargs:
+
+        :param **kwargs: ``jobs`` (if any) is the number of pages of the listing that may be fetched concurrently
         """
 
         raise NotImplementedError()
 
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        """URLs of the listing crawled by ``get_journals()``, used to detect whether it changed.
+        If empty, the listing is considered to always change.
+        """
+
+        return []
+
+    def check_listing(self, state: dict, **kwargs: dict) -> Tuple[bool, dict]:
+        """Check, through conditional requests, whether the listing changed since the previous check.
+        If it did, the pages that were downloaded are used by the next ``get_journals()`` instead of downloading
+        them again.
+
+        :param state: state obtained at the previous check (or an empty ``dict``)
+        :return: whether the listing changed, and the new state (per URL, the ``etag``, ``last_modified`` and
+            content ``hash``)
+        """
+
+        urls = self.get_listing_urls(**kwargs)
+        if len(urls) == 0:
+            return True, {}
+
+        changed, new_state, downloaded = self._check_urls(urls, state, kwargs.get('jobs', 1))
+        self._set_prefetched(downloaded if changed else {})
+
+        return changed, new_state
+
+    def _check_urls(self, urls: List[str], state: dict, jobs: int = 1) -> Tuple[bool, dict, dict]:
+        """Check each URL with a conditional request (at most ``jobs`` at the same time)
+
+        :return: whether any of them changed, their new state, and the responses that were downloaded (per URL)
+        """
+
+        def check(url: str) -> Tuple[dict, Optional[requests.Response]]:
+            prev = state.get(url, {})
+
+            headers = {}
+            if prev.get('etag'):
+                headers['If-None-Match'] = prev['etag']
+            if prev.get('last_modified'):
+                headers['If-Modified-Since'] = prev['last_modified']
+
+            response = self._get(url, headers=headers)
+
+            if response.status_code == 304:
+                return prev, None
+
+            if response.status_code != 200:
+                raise NoJournalList('cannot check listing {} ({})'.format(url, response.status_code))
+
+            return {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'hash': hashlib.sha256(response.content).hexdigest()
+            }, response
+
+        changed = False
+        new_state = {}
+        downloaded = {}
+
+        for url, (url_state, response) in zip(urls, self._map_pages(check, urls, jobs)):
+            new_state[url] = url_state
+            if response is not None:
+                downloaded[url] = response
+                if url_state['hash'] != state.get(url, {}).get('hash'):
+                    changed = True
+
+        return changed, new_state, downloaded
+
+    def _set_prefetched(self, downloaded: dict):
+        """Keep the pages of the listing that were downloaded, so that the next crawl uses them"""
+
+        self._prefetched.clear()
+        self._prefetched.update(downloaded)
+
 
 # !! Please keep the list alphabetic
 
@@ -87,14 +475,6 @@ class ACS(Provider):
     base_url = WEBSITE_URL + 'action/quickLink'
     doi_regex = re.compile(r'abs/(.*/.*)\?')
 
-    def __init__(self):
-        super().__init__()
-        self.session = requests.session()
-
-    def __del__(self):
-        if self.session is not None:
-            self.session.close()
-
     def _get_url(self, journal_identifiers: str, volume: [str, int], page: str, **kwargs: dict) -> str:
         """Requires no request
         """
@@ -107,12 +487,12 @@ class ACS(Provider):
         """
 
         search_url = self.get_url(journal_identifier, volume, page)
-        result = self.session.get(search_url, allow_redirects=False)
+        result = self._get(search_url, allow_redirects=False)
 
         if result.status_code != 302:
             raise ArticleNotFound()
         if 'cookieSet' in result.headers['Location'] or 'quickLink=true' in result.headers['Location']:
-            result = self.session.get(search_url, allow_redirects=False)  # request twice after setting cookies
+            result = self._get(search_url, allow_redirects=False)  # request twice after setting cookies
 
         if 'doi' not in result.headers['Location']:
             raise ArticleNotFound()
@@ -122,24 +502,34 @@ class ACS(Provider):
     def get_url(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
         return self._get_url(journal_identifier, volume, page, **kwargs)
 
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self.WEBSITE_URL]
+
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-        result = self.session.get(self.WEBSITE_URL)
+        result = self._get(self.WEBSITE_URL)
         if result.status_code != 200:
             raise NoJournalList()
 
-        soup = BeautifulSoup(result.content, 'lxml')
-        opts = soup.find('select', attrs={'class': 'quick-search_journals-select'}).find_all('option')
+        parsed = self._parse_journals(result.content)
+        abbrs = abbreviations.abbreviate_all(name for name, _ in parsed)
 
         journals = []
-        for o in opts:
-            if o.attrs['value'] != '':
-                abbr = iso4.abbreviate(o.text, periods=False, disambiguation_langs=set('en'))
-                if o.text[:3] == 'ACS':
-                    abbr = 'ACS' + abbr[2:]
-                journals.append(journal.Journal(o.text, o.attrs['value'], self, abbr))
+        for name, identifier in parsed:
+            abbr = abbrs[name]
+            if name[:3] == 'ACS':
+                abbr = 'ACS' + abbr[2:]
+            journals.append(journal.Journal(name, identifier, self, abbr))
 
         return journals
 
+    journals_xpath = etree.XPath('(//select[{}])[1]//option'.format(has_class('quick-search_journals-select')))
+
+    def _parse_journals(self, content: bytes) -> List[Tuple[str, str]]:
+        """Name and identifier of the journals of the home page"""
+
+        return [(text_of(o), o.attrib['value']) for o in self.journals_xpath(self._html(content))
+                if o.attrib['value'] != '']
+
 
 class APS(Provider):
     """American Physical Society"""
@@ -158,29 +548,57 @@ class APS(Provider):
 
         return self.base_url.format(j1=journal_identifier[0], j2=journal_identifier[1], v=volume, p=page)
 
+    # ways of verifying the DOI given by the template (see `get_doi()`)
+    DOI_VERIFICATIONS = ('get', 'head', 'handle', 'trust')
+    HANDLE_URL = 'https://doi.org/'
+
+    def __init__(self, doi_verification: str = 'get', rate_limit: str = None):
+        super().__init__(rate_limit=rate_limit)
+
+        if doi_verification not in self.DOI_VERIFICATIONS:
+            raise ValueError('unknown DOI verification {}, must be in: {}'.format(
+                doi_verification, ', '.join(self.DOI_VERIFICATIONS)))
+
+        self.doi_verification = doi_verification
+
     def get_doi(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
-        """Only checks that the url gives a 200 response. If so, the DOI is valid.
+        """The DOI follows a template, and is only verified, depending on ``doi_verification``:
+
+        + ``get``: the article page gives a 200 response,
+        + ``head``: same, but with a ``HEAD`` request (the page is not downloaded),
+        + ``handle``: the DOI is registered, i.e., the DOI resolver redirects (the redirection is not followed),
+        + ``trust``: no request at all, so the article may not exist.
         """
+
+        doi = self.DOI.format(j2=journal_identifier[1], v=volume, p=page)
+
+        if self.doi_verification == 'trust':
+            return doi
+
+        if self.doi_verification == 'handle':
+            response = self._request('HEAD', self.HANDLE_URL + doi, allow_redirects=False)
+            if response.status_code == 404:
+                raise ArticleNotFound()
+            elif not response.is_redirect:
+                raise ProviderError('unexpected response from the DOI resolver ({})'.format(response.status_code))
+
+            return doi
+
         url = self.get_url(journal_identifier, volume, page, **kwargs)
-        response = requests.get(url)
+        response = self._request('HEAD' if self.doi_verification == 'head' else 'GET', url)
         if response.status_code != 200:
             raise ArticleNotFound()
 
-        return self.DOI.format(j2=journal_identifier[1], v=volume, p=page)
+        return doi
 
-    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-
-        response = requests.get(self.WEBSITE_URL + 'about')
-        soup = BeautifulSoup(response.content, 'lxml')
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self.WEBSITE_URL + 'about']
 
-        divs = soup.find_all('div', attrs={'class': 'article'})
-        journals = []
+    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
 
-        for l in divs[:-1]:  # Remove "Physics", which is published by another provider
-            a = l.find('a', attrs={'class': 'button'})
-            title = l.find('h5').text
-            identifier = [a.attrs['href'][1:-1], a.text[5:].replace('.', '').replace(' ', '')]
-            journals.append(journal.Journal(title, identifier, self))
+        response = self._get(self.WEBSITE_URL + 'about')
+        journals = [journal.Journal(title, identifier, self) for title, identifier in self._parse_journals(
+            response.content)]
 
         # add the two "Physical Review", which are not on the "about" page
         journals.append(
@@ -190,6 +608,21 @@ class APS(Provider):
 
         return journals
 
+    articles_xpath = etree.XPath('//div[{}]'.format(has_class('article')))
+    button_xpath = etree.XPath('(.//a[{}])[1]'.format(has_class('button')))
+    title_xpath = etree.XPath('(.//h5)[1]')
+
+    def _parse_journals(self, content: bytes) -> List[Tuple[str, List[str]]]:
+        """Title and identifier of the journals of the "about" page"""
+
+        journals = []
+        for l in self.articles_xpath(self._html(content))[:-1]:  # Remove "Physics", published by another provider
+            a = self.button_xpath(l)[0]
+            title = text_of(self.title_xpath(l)[0])
+            journals.append((title, [a.attrib['href'][1:-1], text_of(a)[5:].replace('.', '').replace(' ', '')]))
+
+        return journals
+
 
 class AIP(ACS):
     """American Institute of Physics"""
@@ -204,18 +637,23 @@ class AIP(ACS):
         return self._get_url(journal_identifier, volume, page, **kwargs)
 
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-        result = self.session.get(self.WEBSITE_URL)
+        result = self._get(self.WEBSITE_URL)
         if result.status_code != 200:
             raise NoJournalList()
 
-        soup = BeautifulSoup(result.content, 'lxml')
-        opts = soup.find('div', attrs={'class': 'scitation-journals-covers'})\
-            .find_all('span', attrs={'class': 'journal-title'})
+        return [journal.Journal(name, identifier, self) for name, identifier in self._parse_journals(result.content)]
+
+    journals_xpath = etree.XPath('(//div[{}])[1]//span[{}]'.format(
+        has_class('scitation-journals-covers'), has_class('journal-title')))
+    link_xpath = etree.XPath('(.//a)[1]')
+
+    def _parse_journals(self, content: bytes) -> List[Tuple[str, str]]:
+        """Name (which is also the identifier) of the journals of the home page"""
 
         journals = []
-        for o in opts:
-            text = o.find('a').text.strip().replace(' (co-published with ACA)', '')
-            journals.append(journal.Journal(text, text, self))
+        for o in self.journals_xpath(self._html(content)):
+            text = text_of(self.link_xpath(o)[0]).strip().replace(' (co-published with ACA)', '')
+            journals.append((text, text))
 
         return journals
 
@@ -226,6 +664,7 @@ class IOP(Provider):
     NAME = 'Institute of Physics (IOP)'
     CODE = 'IOP'
     WEBSITE_URL = 'https://iopscience.iop.org/'
+    USER_AGENT = 'tmp'  # mandatory
 
     base_url = WEBSITE_URL + 'findcontent'
     doi_regex = re.compile(r'article/(.*/.*/.*)\?')
@@ -237,25 +676,28 @@ class IOP(Provider):
     def get_doi(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
         url = self.get_url(journal_identifier, volume, page, **kwargs)
 
-        result = requests.get(url, allow_redirects=False, headers={'User-Agent': 'tmp'})
+        result = self._get(url, allow_redirects=False)
         if result.status_code != 301 or 'article' not in result.headers['Location']:
             raise ArticleNotFound()
 
         return self.doi_regex.search(result.headers['Location']).group(1)
 
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self.WEBSITE_URL + 'journalList']
+
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-        result = requests.get(self.WEBSITE_URL + 'journalList', headers={'User-Agent': 'tmp'})
+        result = self._get(self.WEBSITE_URL + 'journalList')
         if result.status_code != 200:
             raise NoJournalList()
 
-        soup = BeautifulSoup(result.content, 'lxml')
-        links = soup.find('div', attrs={'id': 'archive-titles-tab'}).find_all('a')
-        journals = []
+        return [journal.Journal(name, identifier, self) for name, identifier in self._parse_journals(result.content)]
 
-        for l in links:
-            journals.append(journal.Journal(l.text, l.attrs['href'][9:], self))
+    journals_xpath = etree.XPath('(//div[@id="archive-titles-tab"])[1]//a')
 
-        return journals
+    def _parse_journals(self, content: bytes) -> List[Tuple[str, str]]:
+        """Name and identifier (ISSN) of the journals of the list"""
+
+        return [(text_of(l), l.attrib['href'][9:]) for l in self.journals_xpath(self._html(content))]
 
 
 class Nature(Provider):
@@ -282,22 +724,48 @@ class Nature(Provider):
         """Requires a request"""
 
         url = self.get_url(journal_identifier, volume, page, **kwargs)
-        result = requests.get(url)
+
+        # stop reading the (large) page at the end of the list of results, or if there is more than one result
+        num_results = 0
+
+        def until(event: str, element: lxml.html.HtmlElement) -> bool:
+            nonlocal num_results
+
+            if event == 'start' and element.get('data-track-action') == 'search result':
+                num_results += 1
+                return num_results > 1
+
+            return event == 'end' and element.tag == 'ul' and self.RESULTS_LIST_CLASS in element.classes
+
+        result, html = self._stream_html('GET', url, until)
         if result.status_code != 200:
             raise ArticleNotFound()
 
-        soup = BeautifulSoup(result.content, 'lxml')
-        links = soup.find_all(attrs={'data-track-action': 'search result'})
+        return self._extract_search(html)
+
+    RESULTS_LIST_CLASS = 'app-article-list-row'
+    results_xpath = etree.XPath('//*[@data-track-action="search result"]')
+
+    def _parse_search(self, content: bytes) -> str:
+        """DOI of the single result of the search page"""
+
+        return self._extract_search(self._html(content))
+
+    def _extract_search(self, html: lxml.html.HtmlElement) -> str:
+        links = self.results_xpath(html)
 
         if len(links) == 0:
             raise ArticleNotFound()
         elif len(links) > 1:
             raise ProviderError('More than one result?!')  # TODO: that may happen, though
 
-        return links[0].attrs['href'].replace('/articles', self.DOI_BASE)
+        return links[0].attrib['href'].replace('/articles', self.DOI_BASE)
+
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self.base_url + '/journal_name?xhr=true&journals=']
 
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-        results = requests.get(self.base_url + '/journal_name?xhr=true&journals=')
+        results = self._get(self.base_url + '/journal_name?xhr=true&journals=')
 
         journals = []
 
@@ -318,6 +786,7 @@ class RSC(Provider):
     NAME = 'Royal society of Chemistry'
     CODE = 'rsc'
     WEBSITE_URL = 'https://pubs.rsc.org/'
+    USER_AGENT = 'tmp'  # mandatory
 
     search_url = WEBSITE_URL + 'en/results'
     search_result_url = WEBSITE_URL + 'en/search/journalresult'
@@ -336,41 +805,59 @@ class RSC(Provider):
 
         url = self.get_url(journal_identifier, volume, page)
 
-        response = requests.get(url, headers={'User-Agent': 'tmp'})
-        s = BeautifulSoup(response.content, 'lxml').find('input', attrs={'name': 'SearchTerm'}).attrs['value']
-        response = requests.post(self.search_result_url, data={
-            'searchterm': s,
+        # stop reading the (large) page once the search term is found
+        response, html = self._stream_html(
+            'GET', url, lambda event, element: element.tag == 'input' and element.get('name') == 'SearchTerm')
+
+        if html is None:
+            raise ProviderError('error while requesting search ({})'.format(response.status_code))
+
+        response = self._post(self.search_result_url, data={
+            'searchterm': self.search_term_xpath(html)[0],
             'resultcount': 1,
             'category': 'journal',
             'pageno': 1
-        }, headers={'User-Agent': 'tmp'})
+        })
+
+        return self._parse_result(response.content)
 
-        if len(response.content) < 50:
+    search_term_xpath = etree.XPath('(//input[@name="SearchTerm"])[1]/@value')
+    result_links_xpath = etree.XPath('//*[{}]//a'.format(has_class('text--small')))
+
+    def _parse_search_term(self, content: bytes) -> str:
+        """Payload of the search page, to be sent to the result page"""
+
+        return self.search_term_xpath(self._html(content))[0]
+
+    def _parse_result(self, content: bytes) -> str:
+        """DOI of the single result of the result page"""
+
+        if len(content) < 50:
             raise ArticleNotFound()
 
-        links = BeautifulSoup(response.content, 'lxml').select('.text--small a')
+        links = self.result_links_xpath(self._html(content))
 
         if len(links) == 0:
             raise ProviderError('article not found, did you put the first page?')
         elif len(links) > 1:
             raise ProviderError('More than one result?!')
 
-        return links[0].attrs['href'][16:]
+        return links[0].attrib['href'][16:]
 
-    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
-        result = requests.get(self.WEBSITE_URL + 'en/Journals', headers={'User-Agent': 'tmp'})
-        soup = BeautifulSoup(result.content, 'lxml')
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self.WEBSITE_URL + 'en/Journals']
 
-        links = soup.find('div', attrs={'class': 'journal-list--content'})\
-            .find_all('span', attrs={'class': 'list__item-label'})
+    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
+        result = self._get(self.WEBSITE_URL + 'en/Journals')
+        return [journal.Journal(title, title, self) for title in self._parse_journals(result.content)]
 
-        journals = []
+    journals_xpath = etree.XPath('(//div[{}])[1]//span[{}]'.format(
+        has_class('journal-list--content'), has_class('list__item-label')))
 
-        for l in links:
-            title = next(l.children).strip()
-            journals.append(journal.Journal(title, title, self))
+    def _parse_journals(self, content: bytes) -> List[str]:
+        """Title (which is also the identifier) of the journals of the list"""
 
-        return journals
+        return [(l.text or '').strip() for l in self.journals_xpath(self._html(content))]
 
 
 class ScienceDirect(Provider):
@@ -388,8 +875,8 @@ class ScienceDirect(Provider):
 
     CONCEPTS = [None]
 
-    def __init__(self, concepts: List[Any] = None):
-        super().__init__()
+    def __init__(self, concepts: List[Any] = None, rate_limit: str = None):
+        super().__init__(rate_limit=rate_limit)
 
         if concepts is not None:
             self.DISCIPLINES = concepts
@@ -417,8 +904,8 @@ class ScienceDirectAPI(ScienceDirect):
     sd_api_url = 'https://api.elsevier.com/content/search/sciencedirect'
     title_api_url = 'https://api.elsevier.com/content/serial/title'
 
-    def __init__(self, api_key: str = '', concepts: List[Any] = None):
-        super().__init__(concepts=concepts)
+    def __init__(self, api_key: str = '', concepts: List[Any] = None, rate_limit: str = None):
+        super().__init__(concepts=concepts, rate_limit=rate_limit)
         self.api_key = api_key
 
     def _sd_api_call(self, req: dict, **kwargs) -> dict:
@@ -432,7 +919,7 @@ class ScienceDirectAPI(ScienceDirect):
         if api_key == '':
             raise ProviderError('no API key provided')
 
-        response = requests.put(self.sd_api_url, data=json.dumps(req), headers={
+        response = self._put(self.sd_api_url, data=json.dumps(req), headers={
             'Accept': 'application/json',
             'X-ELS-APIKey': api_key,
             'Content-Type': 'application/json'
@@ -476,7 +963,7 @@ class ScienceDirectAPI(ScienceDirect):
         if api_key == '':
             raise ProviderError('no API key provided')
 
-        response = requests.get(self.title_api_url, params=req, headers={
+        response = self._get(self.title_api_url, params=req, headers={
             'Accept': 'application/json',
             'X-ELS-APIKey': api_key,
             'Content-Type': 'application/json'
@@ -492,7 +979,7 @@ class ScienceDirectAPI(ScienceDirect):
         page_size = 100
         concepts = kwargs.get('concepts', self.CONCEPTS)
 
-        def _get_journals(page: int, subject: str = None):
+        def _get_journals(page: int, subject: str = None) -> Tuple[List[journal.Journal], int]:
 
             req = {
                 'pub': 'else',  # for some reason, "elsevier" does not work
@@ -504,17 +991,18 @@ class ScienceDirectAPI(ScienceDirect):
                 req['subj'] = subject
 
             results = self._title_api_call(req, **kwargs)
-
-            for j in results['entry']:
-                t = j['dc:title']
-                journals.append(journal.Journal(t, t, self))
-
-            return 'next' in [a['@ref'] for a in results['link']]
+            return \
+                [journal.Journal(j['dc:title'], j['dc:title'], self) for j in results['entry']], \
+                int(results['opensearch:totalResults'])
 
         for c in concepts:
-            i = 0
-            while _get_journals(i, c):
-                i += 1
+            first_page, nresult = _get_journals(0, c)
+            journals.extend(first_page)
+
+            # the total is known: fetch the other pages concurrently
+            for page_journals, _ in self._map_pages(
+                    lambda i: _get_journals(i, c), range(1, -(-nresult // page_size)), kwargs.get('jobs', 1)):
+                journals.extend(page_journals)
 
         return journals
 
@@ -530,6 +1018,7 @@ class Springer(Provider):
     NAME = 'Springer'
     CODE = 'sl'  # = SpringerLink
     WEBSITE_URL = 'https://link.springer.com/'
+    USER_AGENT = 'tmp'  # mandatory
     ICON_URL = \
         'https://link.springer.com/static/17c1f2edc5a95a03d2f5f7b0019142685841f5ad/sites/link/images/favicon-32x32.png'
 
@@ -537,8 +1026,8 @@ class Springer(Provider):
 
     base_url = WEBSITE_URL + 'journal_identifier/'
 
-    def __init__(self, concepts: List[Any] = None):
-        super().__init__()
+    def __init__(self, concepts: List[Any] = None, rate_limit: str = None):
+        super().__init__(rate_limit=rate_limit)
 
         if concepts is not None:
             self.CONCEPTS = concepts
@@ -547,6 +1036,16 @@ class Springer(Provider):
         """Go to TOC of the volume, find your way into that ;)"""
         return self.base_url + '/{}/volume/{}/toc'.format(journal_identifier, volume)
 
+    def _csv_url(self, discipline: str = None) -> str:
+        url = self.WEBSITE_URL + 'search/csv?facet-content-type="Journal"'
+        if discipline is not None:
+            url += '&facet-discipline="{}"'.format(discipline)
+
+        return url
+
+    def get_listing_urls(self, **kwargs: dict) -> List[str]:
+        return [self._csv_url(c) for c in kwargs.get('concepts', self.CONCEPTS)]
+
     def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
         """... On the other hand, they have a CSV output for the research!"""
 
@@ -555,11 +1054,7 @@ class Springer(Provider):
         disciplines = kwargs.get('concepts', self.CONCEPTS)
 
         for c in disciplines:
-            ux = self.WEBSITE_URL + 'search/csv?facet-content-type="Journal"'
-            if c is not None:
-                ux += '&facet-discipline="{}"'.format(c)
-
-            result = requests.get(ux, headers={'User-Agent': 'tmp'})
+            result = self._get(self._csv_url(c))
             f = csv.DictReader(io.StringIO(result.content.decode()), dialect='unix')
 
             for l in f:
@@ -581,29 +1076,63 @@ class Wiley(Provider):
     NAME = 'Wiley'
     CODE = 'wiley'
     WEBSITE_URL = 'https://onlinelibrary.wiley.com/'
+    USER_AGENT = 'tmp'  # mandatory
     CONCEPTS = [None]
 
     api_url = WEBSITE_URL + 'action/citationSearch'
+    issues_url = WEBSITE_URL + 'loi/{j}'
 
-    def __init__(self, concepts: List[Any] = None):
-        super().__init__()
-        self.session = requests.session()
+    LISTING_PAGE_SIZE = 50
+
+    URL_RESOLVE = True
+    RESOLVED_MAXSIZE = 4096  # number of resolved links kept (per process)
+
+    def __init__(self, concepts: List[Any] = None, rate_limit: str = None):
+        super().__init__(rate_limit=rate_limit)
 
         if concepts is not None:
             self.CONCEPTS = concepts
 
-    def __del__(self):
-        if self.session is not None:
-            self.session.close()
+        self._resolved = OrderedDict()  # (journal, volume, page) -> link, least recently used first
+        self._resolved_lock = threading.Lock()
 
-    def get_url(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
-        """Require a single request to get the url (which contains the DOI)
+    def get_url(
+            self, journal_identifier: Any, volume: [str, int], page: str, resolve: bool = False, **kwargs: dict
+    ) -> str:
+        """Forge the URL of the list of issues of the journal, without any request, unless the link to the article
+        was already resolved (by this process). If ``resolve`` is set, the link to the article is resolved, which
+        requires a request.
         """
 
+        link = self._get_resolved((journal_identifier, str(volume), str(page)))
+        if link is not None:
+            return link
+
+        if not resolve:
+            return self.issues_url.format(j=journal_identifier)
+
+        return self._resolve(journal_identifier, volume, page)
+
+    def _get_resolved(self, key: tuple) -> Optional[str]:
+        with self._resolved_lock:
+            link = self._resolved.get(key)
+            if link is not None:
+                self._resolved.move_to_end(key)
+
+            return link
+
+    def _resolve(self, journal_identifier: Any, volume: [str, int], page: str) -> str:
+        """Get the link to the article from their search API"""
+
+        key = (journal_identifier, str(volume), str(page))
+        link = self._get_resolved(key)
+        if link is not None:
+            return link
+
         url = self.api_url + '?citationJournal[]={j}&citationVolume={v}&citationPage={p}'.format(
             j=journal_identifier, v=volume, p=page)
 
-        result = self.session.get(url, headers={'User-Agent': 'tmp'})
+        result = self._get(url)
 
         if result.status_code != 200:
             raise ProviderError('error while requesting search')
@@ -612,49 +1141,109 @@ class Wiley(Provider):
         if 'link' not in j:
             raise ArticleNotFound()
 
-        return self.WEBSITE_URL + j['link'][1:]
+        link = self.WEBSITE_URL + j['link'][1:]
+
+        with self._resolved_lock:
+            self._resolved[key] = link
+            if len(self._resolved) > self.RESOLVED_MAXSIZE:
+                self._resolved.popitem(last=False)
+
+        return link
 
     def get_doi(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
-        result_url = self.get_url(journal_identifier, volume, page)
+        result_url = self._resolve(journal_identifier, volume, page)
         p = result_url.find('abs/')
         if p == -1:
             raise ProviderError('cannot find DOI')
 
         return result_url[p + 4:]
 
-    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
+    def _listing_url(self, page: int, subject: str = None) -> str:
+        url = self.WEBSITE_URL + 'action/showPublications?PubType=journal&pageSize={}&startPage={}'.format(
+            self.LISTING_PAGE_SIZE, page)
+        if subject is not None:
+            url += '&ConceptID={}'.format(subject)
 
-        page_size = 50
-        journals = []
+        return url
+
+    def check_listing(self, state: dict, **kwargs: dict) -> Tuple[bool, dict]:
+        """The listing is paginated, and a change on any page (e.g., a renamed journal) may keep the total, so that
+        all the pages are checked: first the first page of each concept, which gives the number of pages (kept in
+        the state, in case it did not change), then the other ones.
+        """
+
+        jobs = kwargs.get('jobs', 1)
         concept_ids = kwargs.get('concepts', self.CONCEPTS)
 
-        url = self.WEBSITE_URL + 'action/showPublications?PubType=journal&pageSize={}'.format(page_size)
+        # (without the number of pages, the first pages are downloaded again)
+        first_urls = [self._listing_url(0, c) for c in concept_ids]
+        changed, new_state, downloaded = self._check_urls(
+            first_urls, dict((u, state[u]) for u in first_urls if 'count' in state.get(u, {})), jobs)
 
-        def _get_journals(u, page: int, subject: str = None):
-            ux = u + '&startPage={}'.format(page)
-            if subject is not None:
-                ux += '&ConceptID={}'.format(subject)
+        other_urls = []
+        for c, url in zip(concept_ids, first_urls):
+            if url in downloaded:
+                new_state[url]['count'] = self._parse_count(self._html(downloaded[url].content))
+
+            other_urls.extend(
+                self._listing_url(i, c) for i in range(1, -(-new_state[url]['count'] // self.LISTING_PAGE_SIZE)))
+
+        other_changed, other_state, other_downloaded = self._check_urls(other_urls, state, jobs)
 
-            result = requests.get(ux, headers={'User-Agent': 'tmp'})
-            soup = BeautifulSoup(result.content, 'lxml')
+        changed = changed or other_changed
+        new_state.update(other_state)
+        downloaded.update(other_downloaded)
 
-            r = soup.find('span', attrs={'class': 'result__count'})
-            nresult = int(r.b.string)
+        self._set_prefetched(downloaded if changed else {})
 
-            items = soup.find_all('li', attrs={'class': 'search__item'})
-            for i in items:
-                link = next(i.find('h3').children)
-                if link.name == 'span':
-                    continue
+        return changed, new_state
+
+    def get_journals(self, **kwargs: dict) -> List[journal.Journal]:
+
+        page_size = self.LISTING_PAGE_SIZE
+        journals = []
+        concept_ids = kwargs.get('concepts', self.CONCEPTS)
 
-                lnk = str(link['href'])
-                journals.append(journal.Journal(str(link.span.string), lnk[lnk.rfind('/') + 1:], self))
+        def _get_journals(page: int, subject: str = None) -> Tuple[List[journal.Journal], int]:
+            result = self._get(self._listing_url(page, subject))
+            page_journals, nresult = self._parse_listing(result.content)
 
-            return (page + 1) * page_size < nresult
+            return [journal.Journal(name, identifier, self) for name, identifier in page_journals], nresult
 
         for c in concept_ids:
-            i = 0
-            while _get_journals(url, i, c):
-                i += 1
+            first_page, nresult = _get_journals(0, c)
+            journals.extend(first_page)
+
+            # the total is known: fetch the other pages concurrently
+            for page_journals, _ in self._map_pages(
+                    lambda i: _get_journals(i, c), range(1, -(-nresult // page_size)), kwargs.get('jobs', 1)):
+                journals.extend(page_journals)
 
         return journals
+
+    count_xpath = etree.XPath('(//span[{}])[1]/b'.format(has_class('result__count')))
+    items_xpath = etree.XPath('//li[{}]'.format(has_class('search__item')))
+    title_xpath = etree.XPath('(.//h3)[1]/*[1]')
+    name_xpath = etree.XPath('(.//span)[1]')
+
+    def _parse_count(self, html: lxml.html.HtmlElement) -> int:
+        """Total number of journals in the listing"""
+
+        return int(text_of(self.count_xpath(html)[0]))
+
+    def _parse_listing(self, content: bytes) -> Tuple[List[Tuple[str, str]], int]:
+        """Name and identifier of the journals of a page of the listing, and total number of journals"""
+
+        html = self._html(content)
+        nresult = self._parse_count(html)
+
+        journals = []
+        for i in self.items_xpath(html):
+            link = self.title_xpath(i)[0]
+            if link.tag == 'span':  # no link to the journal
+                continue
+
+            lnk = link.attrib['href']
+            journals.append((text_of(self.name_xpath(link)[0]), lnk[lnk.rfind('/') + 1:]))
+
+        return journals, nresult
@@ -0,0 +1,148 @@
+"""
+Outbound rate limiting of the requests to the providers.
+
+Each provider gets a token bucket, stored in a SQLite file shared by all the (gunicorn) workers of the host, so that
+the rate holds for the host as a whole. A caller that finds the bucket empty reserves the next token and waits for
+it, so that the callers are served in order, unless it would have to wait longer than its deadline.
+"""
+
+from typing import Tuple
+import os
+import re
+import tempfile
+import threading
+import time
+
+from goto_publication import db
+
+UNITS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+}
+
+RATE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(?:/|per)\s*(\d+(?:\.\d+)?)?\s*(second|minute|hour)s?\s*$')
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'goto-publication-ratelimit.sqlite')
+
+
+class RateLimited(Exception):
+    def __init__(self, key: str, wait: float):
+        self.key = key
+        self.wait = wait
+        super().__init__('{}: next token in {:.2f}s'.format(key, wait))
+
+
+def parse_rate(rate: str) -> Tuple[float, float]:
+    """Parse a rate such as ``2/second``, ``30 per minute`` or ``10/5 seconds``
+
+    :return: the number of requests, and the period (in seconds)
+    """
+
+    match = RATE.match(rate)
+    if match is None:
+        raise ValueError('invalid rate {}'.format(rate))
+
+    num, period, unit = match.groups()
+    if float(num) <= 0:
+        raise ValueError('invalid rate {}'.format(rate))
+
+    return float(num), float(period or 1) * UNITS[unit]
+
+
+class TokenBucketStore(db.SQLiteStore):
+    """Token buckets, by key.
+
+    The tokens may go below zero: they are then the tokens that were reserved by the callers in the queue.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL);
+    """
+
+    def reserve(self, key: str, rate: float, burst: float, max_wait: float) -> float:
+        """Take a token from bucket ``key`` (refilled with ``rate`` tokens per second, up to ``burst``).
+
+        :return: the time to wait before the token is available (0 if it is already)
+        :raise RateLimited: if the token is not available within ``max_wait`` seconds (nothing is taken)
+        """
+
+        conn = self._connection()
+        now = time.time()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(.0, now - row[1]) * rate)
+
+            wait = max(.0, (1 - tokens) / rate)
+            if wait > max_wait:
+                raise RateLimited(key, wait)
+
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens - 1, now))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        conn.execute('COMMIT')
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM buckets')
+
+
+STORE = None
+_store_lock = threading.Lock()
+
+
+def set_store(store: TokenBucketStore):
+    """Share the buckets through ``store``"""
+
+    global STORE
+    STORE = store
+
+
+def get_store() -> TokenBucketStore:
+    """The store of the buckets (by default, in a file of the temporary directory)"""
+
+    global STORE
+
+    with _store_lock:
+        if STORE is None:
+            STORE = TokenBucketStore(DEFAULT_PATH)
+
+        return STORE
+
+
+class RateLimiter:
+    """At most ``rate`` (e.g., ``2/second``) for ``key``, with bursts of up to ``burst`` requests (by default, the
+    number of requests of the rate).
+    """
+
+    def __init__(self, key: str, rate: str, burst: float = None, store: TokenBucketStore = None):
+        self.key = key
+        self.rate = rate
+
+        num, period = parse_rate(rate)
+        self.tokens_per_second = num / period
+        self.burst = burst if burst is not None else max(1., num)
+
+        self._store = store
+
+    @property
+    def store(self) -> TokenBucketStore:
+        return self._store if self._store is not None else get_store()
+
+    def acquire(self, max_wait: float) -> float:
+        """Wait for a token, at most ``max_wait`` seconds
+
+        :return: the time waited
+        :raise RateLimited: if the wait would be longer
+        """
+
+        wait = self.store.reserve(self.key, self.tokens_per_second, self.burst, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
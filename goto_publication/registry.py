@@ -1,8 +1,23 @@
-from typing import List
+from typing import List, Optional, Tuple, Callable, Iterable, Iterator, Any, IO
+import array
 import yaml
-import difflib
+import json
+import time
+import hashlib
+import pickle
+import os
+import tempfile
+import asyncio
+import functools
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from goto_publication import providers, journal as jrnl
+from goto_publication import providers, journal as jrnl, db, search, metrics, timing
+
+logger = logging.getLogger(__name__)
 
 
 class RegistryError(Exception):
@@ -12,35 +27,384 @@ class RegistryError(Exception):
         super().__init__(var + ':' + err, *args)
 
 
+class ResultCache(db.SQLiteStore):
+    """Cache the results of the lookups (DOI and URL), shared by all the workers of a host.
+
+    Results are kept ``ttl`` seconds, while articles that were not found are kept ``negative_ttl`` seconds.
+    When more than ``max_size`` entries are stored, the least recently used ones are dropped. The time of the last
+    access is only updated if it is older than ``ACCESS_RESOLUTION`` seconds, so that most hits do not write.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY, found INTEGER, value TEXT, expires REAL, accessed REAL);
+        CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+    """
+
+    EVICT_EVERY = 100
+    ACCESS_RESOLUTION = 60.  # in seconds
+
+    def __init__(
+            self, path: str, ttl: float = 30 * 24 * 3600, negative_ttl: float = 3600, max_size: int = 100000):
+        super().__init__(path)
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+
+        self._num_puts = 0
+
+    @staticmethod
+    def make_key(kind: str, provider_code: str, journal_identifier, volume: str, page: str) -> str:
+        return json.dumps([kind, provider_code, journal_identifier, str(volume), str(page)])
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        """Get ``(found, value)``, or ``None`` if there is no (valid) entry for ``key``
+        """
+
+        conn = self._connection()
+        now = time.time()
+
+        row = conn.execute('SELECT found, value, expires, accessed FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        if row[2] < now:
+            conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            return None
+
+        if now - row[3] > self.ACCESS_RESOLUTION:
+            conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+
+        return bool(row[0]), row[1]
+
+    def put(self, key: str, value: str):
+        self._put(key, True, value, self.ttl)
+
+    def put_not_found(self, key: str):
+        self._put(key, False, '', self.negative_ttl)
+
+    def _put(self, key: str, found: bool, value: str, ttl: float):
+        conn = self._connection()
+        now = time.time()
+
+        conn.execute(
+            'INSERT OR REPLACE INTO results (key, found, value, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+            (key, int(found), value, now + ttl, now))
+
+        self._num_puts += 1
+        if self._num_puts % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones if the cache is still too large
+        """
+
+        conn = self._connection()
+        conn.execute('DELETE FROM results WHERE expires < ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_size,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM results')
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls: the first caller performs the call, while the others wait for its
+    outcome (result or exception).
+
+    If given, ``on_change`` is called with the number of waiters for each call in flight (see ``waiters()``) whenever
+    it changes.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self, on_change: Callable[[dict], None] = None):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._on_change = on_change
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change(dict((key, call.waiters) for key, call in self._calls.items()))
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+            else:
+                call.waiters += 1
+
+            self._changed()
+
+        if not leader:
+            with timing.phase('coalesced'):
+                call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._changed()
+            call.event.set()
+
+        return call.result
+
+    def waiters(self) -> dict:
+        """Number of waiters (excluding the caller that performs the call) for each call in flight"""
+
+        with self._lock:
+            return dict((key, call.waiters) for key, call in self._calls.items())
+
+
+BATCH_MAX_WORKERS = 128
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Get the thread pool in which the lookups of the batches run (created on first use, so after any fork)"""
+
+    global _batch_executor
+
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
+
+    return _batch_executor
+
+
+SNAPSHOT_VERSION = 3
+
+YAMLLoader = getattr(yaml, 'CLoader', yaml.Loader)
+
+
+def registry_key(content: bytes, provider_codes: Iterable[str]) -> str:
+    """Hash of the registry file content and of the providers that are used
+    """
+
+    h = hashlib.sha256(content)
+    h.update(','.join(sorted(provider_codes)).encode())
+    return '{}-{}'.format(SNAPSHOT_VERSION, h.hexdigest())
+
+
+def iter_registry(stream: IO) -> Iterator[dict]:
+    """Journals of a registry file, one at a time: the file is read progressively, and never loaded as a whole
+    """
+
+    loader = yaml.SafeLoader(stream)  # (the C loader only composes whole documents)
+
+    try:
+        loader.get_event()  # start of stream
+
+        if loader.check_event(yaml.StreamEndEvent):  # empty file
+            return
+
+        loader.get_event()  # start of document
+        if not loader.check_event(yaml.SequenceStartEvent):
+            raise yaml.YAMLError('the registry must be a list of journals')
+
+        loader.get_event()
+        while not loader.check_event(yaml.SequenceEndEvent):
+            yield loader.construct_document(loader.compose_node(None, None))
+    finally:
+        loader.dispose()
+
+
+def compile_registry(content: bytes, providers_: dict) -> dict:
+    """Compile the content of a registry file into a snapshot, with the abbreviations and lookup tables
+    already computed.
+
+    :param content: content of the registry file (YAML)
+    :param providers_: providers, by code (journals of other providers are discarded)
+    """
+
+    loaded = []
+    for j in yaml.load(content, Loader=YAMLLoader):
+        try:
+            loaded.append(jrnl.Journal.deserialize(j, providers_[j['provider']]))
+        except KeyError:
+            continue
+
+    # the ones without abbreviation in the file
+    jrnl.abbreviate_journals(loaded)
+
+    journals = []
+    suggs_name = {}
+    suggs_abbr = {}
+    positions = {}  # (of the journals, once loaded in the registry)
+
+    for journal in loaded:
+        journals.append(journal.serialize())
+        suggs_name[journal.name.lower()] = journal.name
+        suggs_abbr[journal.abbr] = journal.name
+        positions.setdefault(journal.name, len(positions))
+
+    return {
+        'key': registry_key(content, providers_.keys()),
+        'journals': journals,
+        'index_name': search.NGramIndex(suggs_name.keys(), values=suggs_name.values()),
+        'index_abbr': search.NGramIndex(suggs_abbr.keys(), values=suggs_abbr.values()),
+        'prefix_name': search.PrefixIndex(suggs_name.values(), (positions[n] for n in suggs_name.values())),
+        'prefix_abbr': search.PrefixIndex(suggs_abbr.keys(), (positions[n] for n in suggs_abbr.values()))
+    }
+
+
+def load_snapshot(snapshot_path: str, key: str) -> Optional[dict]:
+    """Load the snapshot, if it exists and matches ``key`` (otherwise, ``None``).
+
+    .. warning::
+
+        The snapshot is a pickle, so it must come from a trusted place (i.e., built on the host).
+    """
+
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('key') != key:
+        return None
+
+    return snapshot
+
+
+def save_snapshot(snapshot_path: str, snapshot: dict):
+    """Atomically write the snapshot, so that other workers never read a partial file
+    """
+
+    fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(snapshot_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path, snapshot_path)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def lookup_error_type(e: jrnl.JournalError) -> str:
+    """Type of the error that made a lookup fail, as reported in the metrics
+    """
+
+    if isinstance(e, jrnl.ArticleNotFoundError):
+        return 'ArticleNotFound'
+    elif isinstance(e.__context__, providers.ProviderError):
+        return 'ProviderError'
+
+    return type(e).__name__
+
+
 class Registry:
-    """Store all providers and perform actions
+    """Store all providers and perform actions.
+
+    If ``snapshot_path`` is given, the journals are loaded from this (compiled) snapshot, as long as it matches
+    the content of ``registry_path``. Otherwise, the registry file is parsed and the snapshot is rebuilt.
+
+    The last ``suggestions_cache_size`` suggestions are kept in memory, until the registry is reloaded.
     """
 
     NUM_SUGGESTIONS = 10
-
-    def __init__(self, registry_path: str, providers_: List[providers.Provider]):
+    SUGGESTIONS_CACHE_SIZE = 1024
+
+    def __init__(
+            self,
+            registry_path: str,
+            providers_: List[providers.Provider],
+            cache: ResultCache = None,
+            snapshot_path: str = None,
+            suggestions_cache_size: int = SUGGESTIONS_CACHE_SIZE):
         # register the providers
         self.providers = {}
         self.registers(providers_)
 
+        self.cache = cache
+        self._in_flight = SingleFlight(on_change=self._report_in_flight)
+        self._in_flight_labels = set()
+
+        self.suggestions_cache_size = suggestions_cache_size
+        self._suggestions = OrderedDict()
+        self._suggestions_lock = threading.Lock()
+        self.suggestions_cache_stats = {'hit': 0, 'miss': 0}
+
         # get journals
         self.registry_path = registry_path
+        self.snapshot_path = snapshot_path
 
-        with open(self.registry_path) as f:
-            journals_base = yaml.load(f, Loader=yaml.Loader)
+        self.load()
+
+    def load(self):
+        """(Re)load the journals from the registry file (or its snapshot), and forget the suggestions
+        """
+
+        snapshot = self._get_snapshot()
+        self.content_hash = snapshot['key']
 
         self.journals = {}
-        self._suggs_name = {}
-        self._suggs_abbr = {}
-        for j in journals_base:
+        for j in snapshot['journals']:
+            journal = jrnl.Journal.deserialize(j, self.providers[j['provider']])
+            self.journals[journal.name] = journal
+
+        # the names of the journals are the values of the indexes
+        self._index_name = snapshot['index_name']
+        self._index_abbr = snapshot['index_abbr']
+
+        # the positions of the journals are the ids of the prefix indexes
+        self._prefix_name = snapshot['prefix_name']
+        self._prefix_abbr = snapshot['prefix_abbr']
+        self._names = list(self.journals.keys())
+        self._positions = dict((name, i) for i, name in enumerate(self._names))
+
+        # number of successful lookups of each journal (in this worker), to rank the completions
+        self._popularity = array.array('d', [.0]) * len(self._names)
+
+        # journals sorted by name, by provider
+        self._index_sorted = search.SortedIndex(
+            self.journals.keys(), (j.provider.CODE for j in self.journals.values()))
+
+        with self._suggestions_lock:
+            self._suggestions.clear()
+
+    def _get_snapshot(self) -> dict:
+        """Get the snapshot corresponding to the registry file, and rebuild it if needed
+        """
+
+        with open(self.registry_path, 'rb') as f:
+            content = f.read()
+
+        if self.snapshot_path is not None:
+            snapshot = load_snapshot(self.snapshot_path, registry_key(content, self.providers.keys()))
+            if snapshot is not None:
+                return snapshot
+
+        snapshot = compile_registry(content, self.providers)
+
+        if self.snapshot_path is not None:
             try:
-                journal = jrnl.Journal.deserialize(j, self.providers[j['provider']])
-                self.journals[j['name']] = journal
-                self._suggs_name[journal.name.lower()] = journal
-                self._suggs_abbr[journal.abbr] = journal
-            except KeyError:
+                save_snapshot(self.snapshot_path, snapshot)
+            except OSError:  # not fatal: the next worker will try again
                 pass
 
+        return snapshot
+
     def register(self, provider: providers.Provider):
         """Register a provider
 
@@ -56,21 +420,99 @@ class Registry:
     def suggest_journals(self, q: str, source: str = 'name', n: int = NUM_SUGGESTIONS, cutoff: float = 0.6) -> list:
         """Suggest journal_identifier names based on search string
 
-        :param q: search string
+        :param q: search string (the names are searched case-insensitively, and the spaces are collapsed)
         :param source: whether the suggestion should be based on the name (``name``) or the abbreviations (``abbr``)
         :param n: number of results
         :param cutoff: cutoff
         """
 
+        q = ' '.join(q.split())
+
         if source == 'name':
-            possibilities = self._suggs_name
+            index = self._index_name
+            q = q.lower()  # (as the keys)
         elif source == 'abbr':
-            possibilities = self._suggs_abbr
+            index = self._index_abbr
         else:
             raise RegistryError('source', 'unknown source {}'.format(source))
 
-        lst = difflib.get_close_matches(q, possibilities.keys(), n=n, cutoff=cutoff)
-        return list(possibilities[n].name for n in lst)
+        start = time.monotonic()
+        key = (q, source, n, cutoff)
+
+        with self._suggestions_lock:
+            lst = self._suggestions.get(key)
+            if lst is not None:
+                self._suggestions.move_to_end(key)
+
+        result = 'miss' if lst is None else 'hit'
+        if lst is None:
+            lst = index.get_close_values(q, n=n, cutoff=cutoff)
+
+            with self._suggestions_lock:
+                self._suggestions[key] = lst
+                if len(self._suggestions) > self.suggestions_cache_size:
+                    self._suggestions.popitem(last=False)
+
+        with self._suggestions_lock:
+            self.suggestions_cache_stats[result] += 1
+
+        metrics.METRICS.inc('goto_suggest_cache_requests_total', source=source, result=result)
+        metrics.METRICS.observe('goto_suggest_duration_seconds', time.monotonic() - start, source=source)
+
+        return list(lst)
+
+    def complete_journals(
+            self, q: str, source: str = 'name', n: int = NUM_SUGGESTIONS, cutoff: float = 0.6
+    ) -> Tuple[list, str]:
+        """Complete the beginning of a journal name (or abbreviation), for the typeahead.
+
+        The completions are ranked by popularity (number of lookups), and by length. If nothing starts with ``q``,
+        fall back to the fuzzy suggestions (see ``suggest_journals()``).
+
+        :param q: beginning of the name (case, accents and punctuation do not matter)
+        :param source: whether the completion should be based on the name (``name``) or the abbreviations (``abbr``)
+        :param n: number of results
+        :param cutoff: cutoff of the fuzzy suggestions
+        :return: the names of the journals, and how they were found (``prefix`` or ``fuzzy``)
+        """
+
+        if source == 'name':
+            index = self._prefix_name
+        elif source == 'abbr':
+            index = self._prefix_abbr
+        else:
+            raise RegistryError('source', 'unknown source {}'.format(source))
+
+        start = time.monotonic()
+        ids = index.complete(q, n=n, weights=self._popularity)
+        metrics.METRICS.observe('goto_complete_duration_seconds', time.monotonic() - start, source=source)
+
+        if len(ids) == 0:
+            return self.suggest_journals(q, source, n, cutoff), 'fuzzy'
+
+        return [self._names[i] for i in ids], 'prefix'
+
+    def list_journals(
+            self,
+            count: int,
+            provider: str = None,
+            prefix: str = '',
+            after: str = None
+    ) -> Tuple[List[int], Optional[str], int]:
+        """List journals in alphabetical order
+
+        :param count: (maximum) number of journals
+        :param provider: only the journals of this provider (code)
+        :param prefix: only the journals whose name starts with this (case-insensitive)
+        :param after: only the journals that come after this one (name)
+        :return: the positions of the journals (in ``self.journals``), the name of the last one if there are more
+            of them (otherwise ``None``), and the total number of journals that match ``provider`` and ``prefix``
+        """
+
+        if provider is not None and provider not in self.providers:
+            raise RegistryError('provider', 'unknown provider {}'.format(provider))
+
+        return self._index_sorted.select(count, group=provider, prefix=prefix, after=after)
 
     def _check_input(self, journal: str, volume: str, page: str, **kwargs: dict) -> None:
         """Check input correctness, raise ``RegistryError`` if not.
@@ -85,6 +527,126 @@ class Registry:
         if len(volume) == 0:
             raise RegistryError('volume', 'Volume cannot be empty')
 
+    def _lookup(
+            self, kind: str, journal_obj: jrnl.Journal, volume: str, page: str, func: Callable[..., str], **kwargs
+    ) -> str:
+        """Perform the lookup, and record its outcome and latency in the metrics
+        """
+
+        code = journal_obj.provider.CODE
+        outcome = 'ok'
+        start = time.monotonic()
+
+        try:
+            value = self._cached_lookup(kind, journal_obj, volume, page, func, **kwargs)
+            self._popularity[self._positions[journal_obj.name]] += 1
+            return value
+        except jrnl.JournalError as e:
+            outcome = lookup_error_type(e)
+            raise
+        finally:
+            metrics.METRICS.inc('goto_lookups_total', kind=kind, provider=code, outcome=outcome)
+            metrics.METRICS.observe('goto_lookup_duration_seconds', time.monotonic() - start, kind=kind, provider=code)
+
+    def _cached_lookup(
+            self, kind: str, journal_obj: jrnl.Journal, volume: str, page: str, func: Callable[..., str], **kwargs
+    ) -> str:
+        """Perform the lookup through the cache, if any, and coalesce it with identical lookups in flight.
+
+        Lookups that need an API key are neither cached nor coalesced, since their results should not be served
+        to other users, and neither are the URLs that are forged from a template (which is cheaper than the cache).
+        If the cache cannot be read (e.g., it is locked for too long), it is a miss, and if it cannot
+        be written, the result is not cached.
+        """
+
+        provider = journal_obj.provider
+
+        if provider.API_KEY_KWARG or (kind == 'url' and not provider.URL_RESOLVE):
+            return func(volume, page, **kwargs)
+
+        key_kind = kind
+        if kind == 'doi' and provider.doi_verification != 'lookup':  # (not verified the same way)
+            key_kind = 'doi-' + provider.doi_verification
+        elif kind == 'url' and provider.URL_RESOLVE:
+            key_kind = 'url-resolved'
+
+        key = ResultCache.make_key(key_kind, provider.CODE, journal_obj.identifier, volume, page)
+
+        # the approximate URL is forged without any request (so it is neither cached nor coalesced), but the exact
+        # one is served instead if it was resolved before
+        forge = key_kind == 'url-resolved' and not kwargs.get('resolve', False)
+
+        if self.cache is not None:
+            with timing.phase('cache'):
+                try:
+                    cached = self.cache.get(key)
+                    result = 'miss' if cached is None else 'hit'
+                except sqlite3.Error:
+                    cached, result = None, 'error'
+            metrics.METRICS.inc('goto_cache_requests_total', kind=kind, result=result)
+
+            if cached is not None:
+                found, value = cached
+                if found:
+                    return value
+                elif not forge:
+                    raise jrnl.ArticleNotFoundError(provider.CODE, journal_obj.name)
+
+        if forge:
+            return func(volume, page, **kwargs)
+
+        def _store(value_: Optional[str]):
+            """Cache the result (``None`` if not found)"""
+
+            if self.cache is None:
+                return
+
+            with timing.phase('cache'):
+                try:
+                    if value_ is None:
+                        self.cache.put_not_found(key)
+                    else:
+                        self.cache.put(key, value_)
+                except sqlite3.Error:
+                    metrics.METRICS.inc('goto_cache_requests_total', kind=kind, result='error')
+
+        def _upstream_lookup() -> str:
+            try:
+                value_ = func(volume, page, **kwargs)
+            except jrnl.ArticleNotFoundError:
+                _store(None)
+                raise
+
+            _store(value_)
+            return value_
+
+        return self._in_flight.do(key, _upstream_lookup)
+
+    def in_flight_lookups(self) -> dict:
+        """Number of callers waiting on each lookup in flight (for monitoring)
+        """
+
+        return self._in_flight.waiters()
+
+    def _report_in_flight(self, waiters: dict):
+        """Set the gauges of the lookups in flight (and of their waiters), by kind and provider
+        """
+
+        counts = {}
+        for key, num_waiters in waiters.items():
+            kind, code = json.loads(key)[:2]
+            count = counts.setdefault((kind, code), [0, 0])
+            count[0] += 1
+            count[1] += num_waiters
+
+        # (the gauges that were set before are reset, rather than left with their last value)
+        for labels in self._in_flight_labels | set(counts):
+            num_calls, num_waiters = counts.get(labels, (0, 0))
+            metrics.METRICS.set('goto_lookups_in_flight', num_calls, kind=labels[0], provider=labels[1])
+            metrics.METRICS.set('goto_lookups_in_flight_waiters', num_waiters, kind=labels[0], provider=labels[1])
+
+        self._in_flight_labels |= set(counts)
+
     def get_url(self, journal: str, volume: str, page: str, **kwargs: dict) -> dict:
         """Get the URL
         """
@@ -95,7 +657,7 @@ class Registry:
         response = journal_obj.provider.get_info()
 
         try:
-            response.update({'url': journal_obj.get_url(volume, page, **kwargs)})
+            response.update({'url': self._lookup('url', journal_obj, volume, page, journal_obj.get_url, **kwargs)})
         except jrnl.JournalError as e:
             raise RegistryError('journal', str(e))
 
@@ -111,9 +673,79 @@ class Registry:
         response = journal_obj.provider.get_info()
 
         try:
-            doi = journal_obj.get_doi(volume, page, **kwargs)
-            response.update({'doi': doi, 'url': 'https://dx.doi.org/' + doi})
+            doi = self._lookup('doi', journal_obj, volume, page, journal_obj.get_doi, **kwargs)
+            response.update({
+                'doi': doi,
+                'url': 'https://dx.doi.org/' + doi,
+                'verification': journal_obj.provider.doi_verification,
+                'verified': journal_obj.provider.doi_verification != 'trust'
+            })
         except jrnl.JournalError as e:
             raise RegistryError('journal', str(e))
 
         return response
+
+    def batch(self, kind: str, items: List[dict], max_per_provider: int = 4, timeout: float = 30.) -> list:
+        """Perform many lookups concurrently (see ``async_batch()``)
+        """
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.async_batch(kind, items, max_per_provider, timeout))
+        finally:
+            loop.close()
+
+    async def async_batch(self, kind: str, items: List[dict], max_per_provider: int = 4, timeout: float = 30.) -> list:
+        """Perform many lookups concurrently. The lookups are blocking, so they run in a thread pool
+        (see ``get_batch_executor()``).
+
+        :param kind: ``doi`` or ``url``
+        :param items: list of keyword arguments for ``get_doi()`` or ``get_url()``
+        :param max_per_provider: maximum number of lookups in flight for a given provider
+        :param timeout: overall deadline, in seconds
+        :return: for each item, in order, either the result or a ``RegistryError`` (an unexpected error in a lookup
+            is logged, and only fails its item)
+        """
+
+        if kind == 'doi':
+            func = self.get_doi
+        elif kind == 'url':
+            func = self.get_url
+        else:
+            raise RegistryError('kind', 'unknown kind {}'.format(kind))
+
+        loop = asyncio.get_event_loop()
+        semaphores = {}
+
+        async def lookup(item: dict) -> dict:
+            journal_obj = self.journals.get(item.get('journal'))
+            code = journal_obj.provider.CODE if journal_obj is not None else None
+
+            if code not in semaphores:
+                semaphores[code] = asyncio.Semaphore(max_per_provider)
+
+            async with semaphores[code]:
+                return await loop.run_in_executor(get_batch_executor(), functools.partial(func, **item))
+
+        tasks = [asyncio.ensure_future(lookup(item)) for item in items]
+        if len(tasks) == 0:
+            return []
+
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+        results = []
+        for task in tasks:
+            if task in pending:
+                results.append(RegistryError('deadline', 'Deadline exceeded ({}s)'.format(timeout)))
+            elif isinstance(task.exception(), RegistryError):
+                results.append(task.exception())
+            elif task.exception() is not None:
+                e = task.exception()
+                logger.error('unexpected error in batch lookup (%s)', kind, exc_info=(type(e), e, e.__traceback__))
+                results.append(RegistryError('lookup', 'Unexpected error during the lookup'))
+            else:
+                results.append(task.result())
+
+        return results
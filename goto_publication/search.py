@@ -0,0 +1,242 @@
+import array
+import bisect
+import difflib
+import heapq
+import re
+import unicodedata
+from typing import Iterable, List, Set, Tuple, Optional, Any, Sequence
+
+
+class NGramIndex:
+    """Inverted index of the n-grams of a list of keys (to each of which a value may be attached).
+
+    It narrows the candidates of a fuzzy search to the keys that share at least one n-gram with the query, before
+    scoring them with ``difflib``, instead of scoring every key.
+
+    The positions are stored in arrays of (unboxed) integers, rather than in lists of ``int`` objects.
+    """
+
+    def __init__(self, keys: Iterable[str], n: int = 3, values: Iterable[Any] = None):
+        self.n = n
+        self.keys = list(keys)
+        self.values = list(values) if values is not None else self.keys
+
+        index = {}
+        for i, key in enumerate(self.keys):
+            for gram in self.ngrams(key):
+                index.setdefault(gram, []).append(i)
+
+        self.index = dict((gram, array.array('I', positions)) for gram, positions in index.items())
+
+    def ngrams(self, s: str) -> Set[str]:
+        s = ' ' + s + ' '
+        return set(s[i:i + self.n] for i in range(max(1, len(s) - self.n + 1)))
+
+    def candidates(self, q: str) -> Set[int]:
+        """Positions of the keys that share at least one n-gram with ``q``"""
+
+        positions = set()
+        for gram in self.ngrams(q):
+            positions.update(self.index.get(gram, ()))
+
+        return positions
+
+    def get_close_matches(self, q: str, n: int = 3, cutoff: float = 0.6) -> List[str]:
+        """Same as ``difflib.get_close_matches()``, restricted to the candidates.
+
+        With usual cutoffs (0.6 and above), the close matches share n-grams with ``q`` in practice, so the results are
+        the same. With (very) low cutoffs, a few matches may be missing.
+        """
+
+        return [self.keys[i] for i in self.close_positions(q, n, cutoff)]
+
+    def get_close_values(self, q: str, n: int = 3, cutoff: float = 0.6) -> List[Any]:
+        """Same as ``get_close_matches()``, but get the values attached to the keys"""
+
+        return [self.values[i] for i in self.close_positions(q, n, cutoff)]
+
+    def close_positions(self, q: str, n: int = 3, cutoff: float = 0.6) -> List[int]:
+        """Positions of the close matches, from the closest.
+
+        The (costly) ratio is only computed for the candidates that can still make it to the ``n`` closest: they are
+        sorted by an upper bound of their ratio (``quick_ratio()``, after the one given by the lengths), and the
+        search stops when this bound is below the ratio of the ``n``-th closest so far. The results are the same.
+        """
+
+        if not n > 0:
+            raise ValueError('n must be > 0: %r' % (n,))
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError('cutoff must be in [0.0, 1.0]: %r' % (cutoff,))
+
+        s = difflib.SequenceMatcher()
+        s.set_seq2(q)
+
+        bounds = []
+        for i in self.candidates(q):
+            x = self.keys[i]
+            if 2.0 * min(len(x), len(q)) / (len(x) + len(q)) < cutoff:  # (as `real_quick_ratio()`)
+                continue
+
+            s.set_seq1(x)
+            bound = s.quick_ratio()
+            if bound >= cutoff:
+                bounds.append((bound, x, i))
+
+        bounds.sort(reverse=True)
+
+        result = []  # heap of the n closest so far
+        for bound, x, i in bounds:
+            if len(result) == n and bound < result[0][0]:
+                break
+
+            s.set_seq1(x)
+            score = s.ratio()
+            if score >= cutoff:
+                if len(result) < n:
+                    heapq.heappush(result, (score, x, i))
+                else:
+                    heapq.heappushpop(result, (score, x, i))
+
+        return [i for score, x, i in sorted(result, reverse=True)]
+
+
+class SortedIndex:
+    """Keys sorted (case-insensitively) in an array, and the positions of the keys of each group.
+
+    The keys starting with a given prefix form a range of the array, and so do the positions of the keys of a group
+    within this range, so that both are found by bisection: selecting a page of keys costs O(log n + page size).
+    """
+
+    def __init__(self, keys: Iterable[str], groups: Iterable[str]):
+        entries = sorted((k.lower(), k, i, g) for i, (k, g) in enumerate(zip(keys, groups)))
+
+        self.sort_keys = [(f, k) for f, k, _, _ in entries]
+        self.ids = array.array('I', (i for _, _, i, _ in entries))  # position of the keys in the input
+
+        groups = {}
+        for position, (_, _, _, g) in enumerate(entries):
+            groups.setdefault(g, []).append(position)
+
+        self.groups = dict((g, array.array('I', positions)) for g, positions in groups.items())  # sorted positions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Range of the positions of the keys starting with ``prefix`` (case-insensitively)"""
+
+        prefix = prefix.lower()
+        if not prefix:
+            return 0, len(self.sort_keys)
+
+        return (
+            bisect.bisect_left(self.sort_keys, (prefix, )),
+            bisect.bisect_left(self.sort_keys, (prefix + '\U0010ffff', )))
+
+    def select(
+            self,
+            count: int,
+            group: str = None,
+            prefix: str = '',
+            after: str = None
+    ) -> Tuple[List[int], Optional[str], int]:
+        """Select (at most) ``count`` keys of ``group`` (if any) starting with ``prefix``, that come after key
+        ``after`` (if any).
+
+        :return: the ids (position in the input) of the keys, the last key if there are more of them (otherwise
+            ``None``), and the total number of keys of the group starting with the prefix
+        """
+
+        lo, hi = self.prefix_range(prefix)
+        start = lo
+        if after is not None:
+            start = max(lo, bisect.bisect_right(self.sort_keys, (after.lower(), after)))
+
+        positions = None
+        if group is not None:
+            positions = self.groups.get(group, [])
+            start, lo, hi = (bisect.bisect_left(positions, x) for x in (start, lo, hi))
+
+        end = min(hi, start + count)
+        selected = range(start, end) if positions is None else positions[start:end]
+
+        ids = [self.ids[p] for p in selected]
+        last = self.sort_keys[selected[-1]][1] if end < hi and len(selected) > 0 else None
+
+        return ids, last, hi - lo
+
+
+NOT_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(s: str) -> str:
+    """Lowercase, without accents, and with the punctuation replaced by (single) spaces, e.g.,
+    ``J. Chem. Phys.`` becomes ``j chem phys``
+    """
+
+    s = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+    return NOT_ALNUM.sub(' ', s.lower()).strip()
+
+
+class PrefixIndex:
+    """Normalized keys sorted in an array, so that the keys starting with a given prefix form a range of it, found by
+    bisection.
+
+    Each key refers to an id (e.g., the position of a journal), and keys starting with an article (e.g., "The Journal
+    of Chemical Physics") are also indexed without it.
+    """
+
+    ARTICLES = ('the ', 'a ', 'an ')
+
+    def __init__(self, keys: Iterable[str], ids: Iterable[int]):
+        entries = set()
+
+        for key, i in zip(keys, ids):
+            key = normalize(key)
+            entries.add((key, i))
+
+            for article in self.ARTICLES:
+                if key.startswith(article):
+                    entries.add((key[len(article):], i))
+
+        entries = sorted(entries)
+
+        self.keys = [k for k, _ in entries]
+        self.ids = array.array('I', (i for _, i in entries))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Range of the positions of the keys starting with ``prefix`` (already normalized)"""
+
+        return bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + '\U0010ffff')
+
+    def complete(self, q: str, n: int = 10, weights: Sequence[float] = None) -> List[int]:
+        """Ids of (at most) ``n`` keys starting with ``q``, from the most to the least popular according to
+        ``weights`` (by id), then from the shortest to the longest.
+        """
+
+        q = normalize(q)
+        if q == '' or n <= 0:
+            return []
+
+        lo, hi = self.prefix_range(q)
+
+        def rank(position: int) -> tuple:
+            key = self.keys[position]
+            return -(weights[self.ids[position]] if weights is not None else 0), len(key), key
+
+        # an id may be there more than once (with and without an article)
+        num = 2 * n
+        while True:
+            ids = []
+            for position in heapq.nsmallest(num, range(lo, hi), key=rank):
+                i = self.ids[position]
+                if i not in ids:
+                    ids.append(i)
+
+            if len(ids) >= n or num >= hi - lo:
+                return ids[:n]
+
+            num *= 2
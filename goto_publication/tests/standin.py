@@ -0,0 +1,336 @@
+"""
+Local stand-in for the providers: an HTTP server that replays recorded responses (in ``fixtures/``) for the
+``get_doi()``, ``get_url()`` and ``get_journals()`` flows of each provider, with injected latency and errors.
+
+Usage:
+
+.. code-block:: python
+
+    with StandinServer(latency=.05) as server:
+        p = server.attach(providers.ACS())
+        p.get_doi('jacsat', 138, 5052)
+"""
+
+import base64
+import json
+import os
+import random
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from typing import Tuple, Callable, List
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from goto_publication import providers
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+Response = Tuple[int, dict, bytes]
+
+# citations that the stand-in knows about (the other ones are "not found")
+CITATIONS = {
+    'acs': {('jacsat', '138', '5052'): '10.1021/jacs.6b01456'},
+    'aip': {('The Journal of Chemical Physics', '151', '064303'): '10.1063/1.5110375'},
+    'aps': {('prl', '116', '231301'): '10.1103/PhysRevLett.116.231301'},
+    'IOP': {('1751-8121', '52', '320201'): '10.1088/1751-8121/ab2a2f'},
+    'nat': {('nature', '227', '680'): '10.1038/227680a0', ('nature', '227', '681'): None},  # None: many results
+    'rsc': {('phys. chem. chem. phys.', '21', '2222'): '10.1039/C8CP06286A'},
+    'sd': {('Chemical Physics', '493', '200'): '10.1016/j.chemphys.2017.06.015'},
+    'wiley': {('15213765', '15', '186'): '10.1002/cphc.201402046'},
+}
+
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def html(content: bytes, status: int = 200, headers: dict = None) -> Response:
+    h = {'Content-Type': 'text/html; charset=utf-8'}
+    h.update(headers or {})
+    return status, h, content
+
+
+def as_json(content: bytes, status: int = 200) -> Response:
+    return status, {'Content-Type': 'application/json'}, content
+
+
+def redirect(location: str, status: int = 302, headers: dict = None) -> Response:
+    h = {'Location': location}
+    h.update(headers or {})
+    return status, h, b''
+
+
+def not_found() -> Response:
+    return html(b'<html><body><h1>Not found</h1></body></html>', 404)
+
+
+# --- routes (query values are lists, as given by ``parse_qs``)
+
+def acs_quick_link(code: str, website: str):
+    def route(query: dict, body: bytes, headers) -> Response:
+        if 'acs_cookie=1' not in headers.get('Cookie', ''):
+            return redirect(
+                website + 'action/cookieSet?redirectUri=/action/quickLink',
+                headers={'Set-Cookie': 'acs_cookie=1; Path=/'})
+
+        citation = (query['quickLinkJournal'][0], query['quickLinkVolume'][0], query['quickLinkPage'][0])
+        doi = CITATIONS[code].get(citation)
+        if doi is None:
+            return redirect(website + 'journal/' + citation[0])
+
+        return redirect(website + 'doi/abs/' + doi + '?journalCode=' + citation[0])
+
+    return route
+
+
+def aps_abstract(query: dict, body: bytes, headers, path: str) -> Response:
+    for doi in CITATIONS['aps'].values():
+        if path.endswith('/abstract/' + doi):
+            return html(fixture('aps_abstract.html'))
+    return not_found()
+
+
+def doi_handle(query: dict, body: bytes, headers, path: str) -> Response:
+    """The DOI resolver redirects to the article (of any provider)"""
+
+    doi = path[1:]
+    for citations in CITATIONS.values():
+        if doi in citations.values():
+            return redirect('https://example.com/article/' + doi)
+
+    return not_found()
+
+
+def iop_find_content(query: dict, body: bytes, headers) -> Response:
+    citation = (query['CF_JOURNAL'][0], query['CF_VOLUME'][0], query['CF_PAGE'][0])
+    doi = CITATIONS['IOP'].get(citation)
+    if doi is None:
+        return html(b'<html><body>No article found</body></html>')
+
+    return redirect('https://iopscience.iop.org/article/' + doi + '?searchHit=1', status=301)
+
+
+def nature_search(query: dict, body: bytes, headers) -> Response:
+    citation = (query['journal_identifier'][0], query['volume'][0], query['spage'][0])
+    if citation not in CITATIONS['nat']:
+        return html(fixture('nature_search_empty.html'))
+    elif CITATIONS['nat'][citation] is None:
+        return html(fixture('nature_search_many.html'))
+
+    return html(fixture('nature_search.html'))
+
+
+def rsc_results(query: dict, body: bytes, headers) -> Response:
+    citation = (query['artrefjournalname'][0], query['artrefvolumeyear'][0], query['artrefstartpage'][0])
+    term = base64.b64encode(json.dumps(citation).encode())
+    return html(fixture('rsc_results.html').replace(b'{searchterm}', term))
+
+
+def rsc_journal_result(query: dict, body: bytes, headers) -> Response:
+    form = parse_qs(body.decode())
+    citation = tuple(json.loads(base64.b64decode(form['searchterm'][0]).decode()))
+    doi = CITATIONS['rsc'].get(citation)
+    if doi is None:
+        return html(b'<div></div>')
+
+    return html(fixture('rsc_journalresult.html').replace(b'{doi}', doi.encode()))
+
+
+def sd_search(query: dict, body: bytes, headers) -> Response:
+    if not headers.get('X-ELS-APIKey'):
+        return as_json(json.dumps(
+            {'service-error': {'status': {'statusCode': 'AUTHENTICATION_ERROR', 'statusText': 'Invalid API Key'}}}
+        ).encode(), 401)
+
+    req = json.loads(body.decode())
+    if (req['pub'], str(req['volume']), str(req['page'])) not in CITATIONS['sd']:
+        return as_json(b'{"resultsFound": 0}')
+
+    return as_json(fixture('sd_search.json'))
+
+
+def sd_titles(query: dict, body: bytes, headers) -> Response:
+    return as_json(fixture('sd_titles_{}.json'.format(int(query['start'][0]) // 100)))
+
+
+def wiley_citation_search(query: dict, body: bytes, headers) -> Response:
+    citation = (query['citationJournal[]'][0], query['citationVolume'][0], query['citationPage'][0])
+    if citation not in CITATIONS['wiley']:
+        return as_json(b'{"message": "no result"}')
+
+    return as_json(fixture('wiley_citation.json'))
+
+
+def wiley_publications(query: dict, body: bytes, headers) -> Response:
+    return html(fixture('wiley_publications_{}.html'.format(query['startPage'][0])))
+
+
+def static(func: Callable[[bytes], Response], name: str):
+    def route(query: dict, body: bytes, headers) -> Response:
+        return func(fixture(name))
+
+    return route
+
+
+ROUTES = {
+    ('GET', 'pubs.acs.org', '/'): static(html, 'acs_home.html'),
+    ('GET', 'pubs.acs.org', '/action/quickLink'): acs_quick_link('acs', 'https://pubs.acs.org/'),
+    ('GET', 'aip.scitation.org', '/'): static(html, 'aip_home.html'),
+    ('GET', 'aip.scitation.org', '/action/quickLink'): acs_quick_link('aip', 'https://aip.scitation.org/'),
+    ('GET', 'journals.aps.org', '/about'): static(html, 'aps_about.html'),
+    ('GET', 'iopscience.iop.org', '/journalList'): static(html, 'iop_journal_list.html'),
+    ('GET', 'iopscience.iop.org', '/findcontent'): iop_find_content,
+    ('GET', 'www.nature.com', '/search'): nature_search,
+    ('GET', 'www.nature.com', '/search/journal_name'): static(as_json, 'nature_journals.json'),
+    ('GET', 'pubs.rsc.org', '/en/results'): rsc_results,
+    ('POST', 'pubs.rsc.org', '/en/search/journalresult'): rsc_journal_result,
+    ('GET', 'pubs.rsc.org', '/en/Journals'): static(html, 'rsc_journals.html'),
+    ('PUT', 'api.elsevier.com', '/content/search/sciencedirect'): sd_search,
+    ('GET', 'api.elsevier.com', '/content/serial/title'): sd_titles,
+    ('GET', 'link.springer.com', '/search/csv'): static(
+        lambda c: (200, {'Content-Type': 'text/csv'}, c), 'springer_journals.csv'),
+    ('GET', 'onlinelibrary.wiley.com', '/action/citationSearch'): wiley_citation_search,
+    ('GET', 'onlinelibrary.wiley.com', '/action/showPublications'): wiley_publications,
+}
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    """Requests are received as ``/<upstream host><upstream path>?<query>``"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def _handle(self, method: str, head: bool = False):
+        """Answer the request (routed as ``method``), without the body for a ``HEAD`` request"""
+
+        server = self.server.standin
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        parsed = urlsplit(self.path)
+        host, _, path = parsed.path[1:].partition('/')
+        path = '/' + path
+
+        server.count(host)
+
+        if server.latency > 0:
+            time.sleep(server.latency)
+
+        if server.error_rate > 0 and server.random.random() < server.error_rate:
+            status, headers, content = html(b'<html><body>Service unavailable</body></html>', 503)
+        else:
+            route = ROUTES.get((method, host, path))
+            if route is None and method == 'GET' and host == 'journals.aps.org' and '/abstract/' in path:
+                status, headers, content = aps_abstract(parse_qs(parsed.query), body, self.headers, path)
+            elif route is None and method == 'GET' and host == 'doi.org':
+                status, headers, content = doi_handle(parse_qs(parsed.query), body, self.headers, path)
+            elif route is None:
+                status, headers, content = not_found()
+            else:
+                status, headers, content = route(parse_qs(parsed.query), body, self.headers)
+
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+
+        if not head:
+            try:
+                self.wfile.write(content)
+            except (BrokenPipeError, ConnectionResetError):  # the client gave up (timeout)
+                pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_HEAD(self):
+        self._handle('GET', head=True)
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass  # mostly clients that gave up (timeouts)
+
+
+class StandinAdapter(HTTPAdapter):
+    """Send the requests to the stand-in instead of the actual host"""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        parsed = urlsplit(request.url)
+        request = request.copy()  # the original one is used by the session (to store the cookies, for example)
+        request.url = '{}/{}{}{}'.format(
+            self.base_url, parsed.netloc, parsed.path, '?' + parsed.query if parsed.query else '')
+
+        return super().send(request, **kwargs)
+
+
+class StandinServer:
+    """Stand-in server.
+
+    :param latency: latency added to each response, in seconds
+    :param error_rate: probability of answering with a 503 error
+    """
+
+    def __init__(self, latency: float = .0, error_rate: float = .0, seed: int = 42):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.requests = {}
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandinRequestHandler)
+        self.httpd.standin = self
+        self.url = 'http://127.0.0.1:{}'.format(self.httpd.server_port)
+        self._thread = None
+
+    def count(self, host: str):
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def start(self) -> 'StandinServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'StandinServer':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def attach(self, provider: providers.Provider) -> providers.Provider:
+        """Route the requests of ``provider`` to the stand-in (with the same transport settings)"""
+
+        provider._adapter = StandinAdapter(
+            self.url, pool_maxsize=provider.POOL_MAXSIZE, max_retries=provider._adapter.max_retries)
+        provider._local = threading.local()  # drop the existing sessions
+
+        return provider
+
+    def attach_all(self, providers_: List[providers.Provider]) -> List[providers.Provider]:
+        return [self.attach(p) for p in providers_]
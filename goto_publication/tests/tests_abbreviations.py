@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from goto_publication.tests.tests_registry import FakeProvider  # (imports the providers before the journals)
+from goto_publication import abbreviations, journal as jrnl
+
+
+def fake_abbreviate(name: str) -> str:
+    """Keep the first 4 letters of each word (picklable, so it can be used by the processes)"""
+
+    return ' '.join(w[:4] for w in name.split())
+
+
+class FailingAbbreviator(abbreviations.Abbreviator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, func=self._fail, **kwargs)
+
+    @staticmethod
+    def _fail(name: str) -> str:
+        raise AssertionError('{} should not be computed'.format(name))
+
+
+class TestAbbreviations(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = abbreviations.AbbreviationStore(os.path.join(self.temp_dir, 'abbreviations.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_memo(self):
+        names = ['Journal of Fake Physics', 'Fake Letters', 'Journal of Fake Physics']
+        abbrs = abbreviations.Abbreviator(self.store, func=fake_abbreviate).abbreviate_all(names)
+        self.assertEqual(abbrs, {'Journal of Fake Physics': 'Jour of Fake Phys', 'Fake Letters': 'Fake Lett'})
+
+        # stored, for another process or run
+        abbreviator = FailingAbbreviator(self.store)
+        self.assertEqual(abbreviator.abbreviate('Fake Letters'), 'Fake Lett')
+
+        # ... but not for another version of iso4
+        self.assertEqual(self.store.get_many(['Fake Letters'], version='whatever'), {})
+
+    def test_processes(self):
+        names = ['Fake Journal {}'.format(i) for i in range(50)]
+        abbrs = abbreviations.Abbreviator(self.store, processes=2, func=fake_abbreviate).abbreviate_all(names)
+        self.assertEqual(abbrs, dict((n, fake_abbreviate(n)) for n in names))
+
+    def test_journals(self):
+        previous = abbreviations.ABBREVIATOR
+        abbreviations.ABBREVIATOR = abbreviations.Abbreviator(func=fake_abbreviate)
+
+        try:
+            provider = FakeProvider()
+            journals = [jrnl.Journal('Journal of Fake Physics', 'jfp', provider), jrnl.Journal('Fake', 'f', provider)]
+            jrnl.abbreviate_journals(journals)
+
+            self.assertEqual([j.abbr for j in journals], ['Jour of Fake Phys', 'Fake'])
+            self.assertEqual(jrnl.Journal('Fake Letters', 'fl', provider).abbr, 'Fake Lett')  # when needed
+        finally:
+            abbreviations.ABBREVIATOR = previous
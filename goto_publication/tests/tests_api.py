@@ -0,0 +1,146 @@
+import gzip
+import json
+import unittest
+
+import app
+import api_views
+import settings
+
+
+class TestConditionalResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_journals(self):
+        response = self.client.get('/api/journals?start=1&count=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age={}'.format(
+            api_views.ListJournals.max_age))
+
+        data = response.get_json()
+        self.assertEqual((data['start'], data['count'], data['total']), (1, 3, len(api_views.REGISTRY.journals)))
+        self.assertEqual(data['journals'][0], list(api_views.REGISTRY.journals.values())[1].get_info())
+
+        etag = response.headers['ETag']
+        response = self.client.get('/api/journals?start=1&count=3', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        response = self.client.get('/api/journals?start=2&count=3', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_journals_cursor(self):
+        names, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get('/api/journals?provider=wiley&count=100&cursor={}'.format(cursor)).get_json()
+            names.extend(j['journal'] for j in data['journals'])
+            cursor = data['next']
+
+        self.assertEqual(len(names), data['total'])
+        self.assertEqual(names, sorted(names, key=lambda n: (n.lower(), n)))
+        self.assertEqual(
+            set(names), set(n for n, j in api_views.REGISTRY.journals.items() if j.provider.CODE == 'wiley'))
+
+        data = self.client.get('/api/journals?prefix=phys&count=100').get_json()
+        self.assertTrue(all(j['journal'].lower().startswith('phys') for j in data['journals']))
+
+        self.assertEqual(self.client.get('/api/journals?cursor=@@').status_code, 400)
+        self.assertEqual(self.client.get('/api/journals?provider=whatever').status_code, 400)
+
+    def test_export(self):
+        response = self.client.get('/api/journals/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+
+        lines = response.data.decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines], [j.get_info() for j in api_views.REGISTRY.journals.values()])
+
+        response = self.client.get('/api/journals/export?provider=aps', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+        journals = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+        self.assertTrue(len(journals) > 0)
+        self.assertTrue(all(j['providerName'] == 'American Physical Society' for j in journals))
+
+        etag = response.headers['ETag']
+        response = self.client.get(
+            '/api/journals/export?provider=aps', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/api/journals/export?provider=whatever').status_code, 400)
+
+    def test_url(self):
+        url = '/api/url?journal={}&volume=1&page=1'.format('Journal of the American Chemical Society')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+        response = self.client.get('/api/url?journal=whatever&volume=1&page=1')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response.headers)
+
+        # the approximate URLs are replaced by the exact ones once resolved
+        journal = next(n for n, j in api_views.REGISTRY.journals.items() if j.provider.URL_RESOLVE)
+        response = self.client.get('/api/url', query_string={'journal': journal, 'volume': 1, 'page': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age={}'.format(
+            settings.API_CONFIG['APPROXIMATE_URL_MAX_AGE']))
+
+
+class TestSuggestions(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_modes(self):
+        data = self.client.get('/api/suggests?q=chemical').get_json()
+        self.assertEqual(data['mode'], 'fuzzy')
+        self.assertNotIn('match', data)
+
+        data = self.client.get('/api/suggests?q=Chemical&mode=prefix&count=5').get_json()
+        self.assertEqual((data['mode'], data['match']), ('prefix', 'prefix'))
+        self.assertEqual(len(data['suggestions']), 5)
+        self.assertTrue(all(s.lower().replace('the ', '').startswith('chemical') for s in data['suggestions']))
+
+        data = self.client.get('/api/suggests?q=chemcial+reveiws&mode=prefix').get_json()
+        self.assertEqual(data['match'], 'fuzzy')
+        self.assertIn('Chemical Reviews', data['suggestions'])
+
+        self.assertEqual(self.client.get('/api/suggests?q=chemical&mode=whatever').status_code, 400)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_items(self):
+        journal = 'Journal of the American Chemical Society'
+        items = [
+            {'journal': journal, 'volume': 1, 'page': '1'},
+            {'journal': journal, 'volume': None, 'page': '1'},
+            {'journal': journal, 'volume': 1, 'page': ['1']},
+            {'journal': journal, 'volume': True, 'page': '1'},
+            {'journal': journal, 'page': '1'},
+            'whatever'
+        ]
+
+        response = self.client.post('/api/batch/url', json={'items': items})
+        self.assertEqual(response.status_code, 200)
+
+        results = response.get_json()['results']
+        self.assertEqual(len(results), len(items))
+        self.assertEqual(results[0]['request']['volume'], '1')
+        self.assertIn('url', results[0]['result'])
+        self.assertEqual(
+            [list(r['message']) for r in results[1:]], [['volume'], ['page'], ['volume'], ['volume'], ['item']])
+
+        for items in ('abc', {'a': 1}, 42, None):
+            response = self.client.post('/api/batch/url', json={'items': items})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('items', response.get_json()['message'])
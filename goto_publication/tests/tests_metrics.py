@@ -0,0 +1,150 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from goto_publication import metrics, registry
+from goto_publication.tests.tests_registry import RegistryTestCase
+
+
+def values(m: metrics.Metrics) -> dict:
+    return dict((metrics.format_sample(sample, labels, value).rsplit(' ', 1)[0], value)
+                for _, sample, labels, value in m.collect())
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.temp_dir, 'metrics.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_render(self):
+        m = metrics.Metrics()
+        m.inc('goto_lookups_total', kind='doi', provider='acs', outcome='ok')
+        m.inc('goto_lookups_total', kind='doi', provider='acs', outcome='ok')
+        m.observe('goto_suggest_duration_seconds', .02, source='name')
+        m.observe('goto_suggest_duration_seconds', 60, source='name')
+
+        text = m.render()
+        self.assertIn('# TYPE goto_lookups_total counter', text)
+        self.assertIn('goto_lookups_total{kind="doi",outcome="ok",provider="acs"} 2', text)
+        self.assertIn('goto_suggest_duration_seconds_bucket{source="name",le="0.01"} 0', text)
+        self.assertIn('goto_suggest_duration_seconds_bucket{source="name",le="0.025"} 1', text)
+        self.assertIn('goto_suggest_duration_seconds_bucket{source="name",le="+Inf"} 2', text)
+        self.assertIn('goto_suggest_duration_seconds_count{source="name"} 2', text)
+        self.assertIn('goto_suggest_duration_seconds_sum{source="name"} 60.02', text)
+
+    def test_aggregation(self):
+        """Two workers share the same store"""
+
+        m1 = metrics.Metrics(metrics.MetricsStore(self.store_path))
+        m2 = metrics.Metrics(metrics.MetricsStore(self.store_path))
+
+        m1.inc('goto_provider_requests_total', provider='acs', status=200)
+        m2.inc('goto_provider_requests_total', provider='acs', status=200)
+        m2.inc('goto_provider_requests_total', provider='acs', status=200)
+        m2.flush()
+
+        self.assertEqual(values(m1)['goto_provider_requests_total{provider="acs",status="200"}'], 3)
+
+    def test_background_flush(self):
+        """The metrics are written even if nothing is recorded after the interval"""
+
+        m1 = metrics.Metrics(metrics.MetricsStore(self.store_path), flush_interval=.05)
+        m2 = metrics.Metrics(metrics.MetricsStore(self.store_path))
+
+        for _ in range(3):
+            m1.inc('goto_lookups_total', kind='doi', provider='acs', outcome='ok')
+
+        time.sleep(.3)
+        self.assertEqual(values(m2)['goto_lookups_total{kind="doi",outcome="ok",provider="acs"}'], 3)
+
+    def test_flush_at_exit(self):
+        script = 'from goto_publication import metrics; metrics.set_store(metrics.MetricsStore({!r}), 3600); ' \
+            '[metrics.METRICS.inc("goto_lookups_total", kind="doi", provider="acs", outcome="ok") ' \
+            'for _ in range(3)]'.format(self.store_path)
+        subprocess.run([sys.executable, '-c', script], check=True)
+
+        m = metrics.Metrics(metrics.MetricsStore(self.store_path))
+        self.assertEqual(values(m)['goto_lookups_total{kind="doi",outcome="ok",provider="acs"}'], 3)
+
+    def test_dead_process(self):
+        """The counters of the processes that are gone are kept, but not their gauges"""
+
+        script = 'from goto_publication import metrics; m = metrics.Metrics(metrics.MetricsStore({!r})); ' \
+            'm.inc("goto_provider_requests_total", 5, provider="acs", status=200); ' \
+            'm.set("goto_lookups_in_flight", 2, kind="doi", provider="acs"); m.flush()'.format(self.store_path)
+        subprocess.run([sys.executable, '-c', script], check=True)
+
+        m = metrics.Metrics(metrics.MetricsStore(self.store_path))
+        m.inc('goto_provider_requests_total', provider='acs', status=200)
+
+        for _ in range(2):  # merged only once
+            self.assertEqual(values(m)['goto_provider_requests_total{provider="acs",status="200"}'], 6)
+
+        self.assertNotIn('goto_lookups_in_flight{kind="doi",provider="acs"}', values(m))
+
+        processes = m.store._connection().execute('SELECT DISTINCT process FROM metrics').fetchall()
+        self.assertEqual(len(processes), 2)  # the dead one (merged) and the current one
+
+        # another one is added to the merged samples
+        subprocess.run([sys.executable, '-c', script], check=True)
+        self.assertEqual(values(m)['goto_provider_requests_total{provider="acs",status="200"}'], 11)
+
+
+class TestRegistryMetrics(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.metrics = metrics.Metrics()
+        self.previous_metrics, metrics.METRICS = metrics.METRICS, self.metrics
+
+        self.cache = registry.ResultCache(os.path.join(self.temp_dir, 'cache.sqlite'))
+        self.registry = registry.Registry(self.registry_path, [self.provider], cache=self.cache)
+
+    def tearDown(self):
+        metrics.METRICS = self.previous_metrics
+        super().tearDown()
+
+    def test_lookups(self):
+        self.registry.get_doi('Fake Letters', '12', '42')
+        self.registry.get_doi('Fake Letters', '12', '42')
+        with self.assertRaises(registry.RegistryError):
+            self.registry.get_doi('Fake Letters', '12', '0')
+
+        self.registry.suggest_journals('fake')
+
+        v = values(self.metrics)
+        self.assertEqual(v['goto_lookups_total{kind="doi",outcome="ok",provider="fake"}'], 2)
+        self.assertEqual(v['goto_lookups_total{kind="doi",outcome="ArticleNotFound",provider="fake"}'], 1)
+        self.assertEqual(v['goto_lookup_duration_seconds_count{kind="doi",provider="fake"}'], 3)
+        self.assertEqual(v['goto_cache_requests_total{kind="doi",result="hit"}'], 1)
+        self.assertEqual(v['goto_cache_requests_total{kind="doi",result="miss"}'], 2)
+        self.assertEqual(v['goto_suggest_duration_seconds_count{source="name"}'], 1)
+
+    def test_in_flight(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(self.registry.get_doi, 'Fake Letters', '12', 'slow') for _ in range(4)]
+
+            time.sleep(.25)  # all of them are now waiting on the first one
+            v = values(self.metrics)
+            self.assertEqual(v['goto_lookups_in_flight{kind="doi",provider="fake"}'], 1)
+            self.assertEqual(v['goto_lookups_in_flight_waiters{kind="doi",provider="fake"}'], 3)
+
+            for f in futures:
+                f.result()
+
+        # reset once done
+        v = values(self.metrics)
+        self.assertEqual(v['goto_lookups_in_flight{kind="doi",provider="fake"}'], 0)
+        self.assertEqual(v['goto_lookups_in_flight_waiters{kind="doi",provider="fake"}'], 0)
+
+        self.assertIn('# TYPE goto_lookups_in_flight gauge', self.metrics.render())
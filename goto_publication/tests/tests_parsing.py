@@ -0,0 +1,55 @@
+import unittest
+
+from goto_publication import providers
+from goto_publication.tests.standin import fixture
+
+
+class TestParsing(unittest.TestCase):
+    """Extraction of the data from the recorded pages"""
+
+    def test_journals(self):
+        acs = providers.ACS()._parse_journals(fixture('acs_home.html'))
+        self.assertIn(('Journal of the American Chemical Society', 'jacsat'), acs)
+        self.assertNotIn('', [i for _, i in acs])
+
+        aip = providers.AIP()._parse_journals(fixture('aip_home.html'))
+        self.assertIn(('The Journal of Chemical Physics', 'The Journal of Chemical Physics'), aip)
+
+        aps = providers.APS()._parse_journals(fixture('aps_about.html'))
+        self.assertEqual(aps[0], ('Physical Review Letters', ['prl', 'PhysRevLett']))
+        self.assertNotIn('Physics', [t for t, _ in aps])
+
+        iop = providers.IOP()._parse_journals(fixture('iop_journal_list.html'))
+        self.assertIn(('Journal of Physics A: Mathematical and Theoretical', '1751-8121'), iop)
+
+        self.assertIn('Chemical Science', providers.RSC()._parse_journals(fixture('rsc_journals.html')))
+
+        wiley, nresult = providers.Wiley()._parse_listing(fixture('wiley_publications_0.html'))
+        self.assertEqual(nresult, 60)
+        self.assertEqual(wiley[0], ('Wiley Journal 000', '15210000'))
+
+    def test_Nature(self):
+        p = providers.Nature()
+        self.assertEqual(p._parse_search(fixture('nature_search.html')), '10.1038/227680a0')
+
+        with self.assertRaises(providers.ArticleNotFound):
+            p._parse_search(fixture('nature_search_empty.html'))
+
+        with self.assertRaises(providers.ArticleNotFound):
+            p._parse_search(b'')
+
+        with self.assertRaises(providers.ProviderError):
+            p._parse_search(fixture('nature_search_many.html'))
+
+    def test_RSC(self):
+        p = providers.RSC()
+        self.assertEqual(p._parse_search_term(fixture('rsc_results.html')), '{searchterm}')
+
+        content = fixture('rsc_journalresult.html').replace(b'{doi}', b'10.1039/C8CP06286A')
+        self.assertEqual(p._parse_result(content), '10.1039/C8CP06286A')
+
+        with self.assertRaises(providers.ArticleNotFound):
+            p._parse_result(b'<div></div>')
+
+        with self.assertRaises(providers.ProviderError):
+            p._parse_result(b'<div class="results">' + b' ' * 50 + b'</div>')
@@ -0,0 +1,113 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from goto_publication import providers, ratelimit
+from goto_publication.tests.standin import StandinServer
+
+
+class LockedStore(ratelimit.TokenBucketStore):
+    def reserve(self, *args, **kwargs) -> float:
+        raise sqlite3.OperationalError('database is locked')
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'ratelimit.sqlite')
+        self.store = ratelimit.TokenBucketStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('2/second'), (2, 1))
+        self.assertEqual(ratelimit.parse_rate('30 per minute'), (30, 60))
+        self.assertEqual(ratelimit.parse_rate('10/5 seconds'), (10, 5))
+        self.assertEqual(ratelimit.parse_rate('1/hour'), (1, 3600))
+
+        for rate in ('', '2', '2/fortnight', '0/second', '-1/second'):
+            with self.assertRaises(ValueError):
+                ratelimit.parse_rate(rate)
+
+    def test_reserve(self):
+        # the next tokens are reserved, and the callers wait for their turn
+        waits = [self.store.reserve('a', 1., 2., 5.) for _ in range(4)]
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 1., delta=.1)
+        self.assertAlmostEqual(waits[3], 2., delta=.1)
+
+        # ... unless they would wait too long, in which case nothing is reserved
+        with self.assertRaises(ratelimit.RateLimited):
+            self.store.reserve('a', 1., 2., 2.5)
+
+        self.assertAlmostEqual(self.store.reserve('a', 1., 2., 5.), 3., delta=.1)
+
+        # the buckets are independent, and shared through the file (e.g., by the workers)
+        self.assertEqual(self.store.reserve('b', 1., 1., 0), 0)
+        with self.assertRaises(ratelimit.RateLimited):
+            ratelimit.TokenBucketStore(self.path).reserve('b', 1., 1., 0)
+
+    def test_acquire(self):
+        limiter = ratelimit.RateLimiter('a', '20/second', burst=1, store=self.store)
+
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire(1.)
+
+        self.assertTrue(time.monotonic() - start >= .09)
+
+    def test_provider(self):
+        ratelimit.set_store(self.store)
+        try:
+            with StandinServer() as server:
+                p = server.attach(providers.Nature(rate_limit='1/minute'))
+                p.RATE_LIMIT_MAX_WAIT = .1
+
+                self.assertEqual(p.get_doi('nature', 227, 680), '10.1038/227680a0')
+
+                with self.assertRaises(providers.ProviderError):
+                    p.get_doi('nature', 227, 680)
+
+                self.assertEqual(sum(server.requests.values()), 1)
+                self.assertEqual(p.breaker.state, providers.CircuitBreaker.CLOSED)
+
+            with self.assertRaises(ValueError):
+                providers.RSC(rate_limit='whatever')
+        finally:
+            ratelimit.set_store(None)
+
+    def test_breaker(self):
+        ratelimit.set_store(self.store)
+        try:
+            with StandinServer() as server:
+                p = server.attach(providers.Nature(rate_limit='1/minute'))
+                p.RATE_LIMIT_MAX_WAIT = .1
+                p.get_doi('nature', 227, 680)
+
+                # the probe of the half-open breaker is rate limited ...
+                p.breaker._open()
+                p.breaker._opened_at -= p.breaker.open_duration
+
+                with self.assertRaises(providers.ProviderError):
+                    p.get_doi('nature', 227, 680)
+
+                # ... so it is given up, and the next request is the probe
+                self.assertEqual(p.breaker.state, providers.CircuitBreaker.HALF_OPEN)
+                self.assertTrue(p.breaker.allow())
+                p.breaker.release()
+
+                # same when the buckets are not available
+                p.rate_limiter = ratelimit.RateLimiter(p.CODE, '1/second', store=LockedStore(self.path))
+
+                with self.assertRaises(providers.ProviderError):
+                    p.get_doi('nature', 227, 680)
+
+                self.assertTrue(p.breaker.allow())
+                self.assertEqual(sum(server.requests.values()), 1)
+        finally:
+            ratelimit.set_store(None)
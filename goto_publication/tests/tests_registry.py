@@ -0,0 +1,479 @@
+import unittest
+import tempfile
+import shutil
+import os
+import difflib
+import io
+import sqlite3
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import yaml
+
+from goto_publication import providers, registry, search, journal as jrnl
+
+
+class FakeProvider(providers.Provider):
+    """Answer without any request, and count the calls"""
+
+    NAME = 'Fake'
+    CODE = 'fake'
+    WEBSITE_URL = 'https://example.com/'
+
+    def __init__(self):
+        super().__init__()
+        self.num_calls = 0
+
+    def get_url(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
+        self.num_calls += 1
+        return self.WEBSITE_URL + '{}/{}/{}'.format(journal_identifier, volume, page)
+
+    def get_doi(self, journal_identifier: Any, volume: [str, int], page: str, **kwargs: dict) -> str:
+        self.num_calls += 1
+        if page == '0':
+            raise providers.ArticleNotFound()
+        if page == 'slow':
+            time.sleep(.5)
+        if page == 'bug':
+            raise KeyError('Location')
+
+        return '10.0000/{}.{}.{}'.format(journal_identifier, volume, page)
+
+
+class FakeResolvingProvider(FakeProvider):
+    """Forge an approximate URL, unless asked to resolve the exact one"""
+
+    CODE = 'fake-resolving'
+    URL_RESOLVE = True
+
+    def get_url(
+            self, journal_identifier: Any, volume: [str, int], page: str, resolve: bool = False, **kwargs: dict
+    ) -> str:
+        if not resolve:
+            return self.WEBSITE_URL + journal_identifier
+
+        if page == '0':
+            self.num_calls += 1
+            raise providers.ArticleNotFound()
+
+        return super().get_url(journal_identifier, volume, page)
+
+
+JOURNALS = [
+    {'name': 'Journal of Fake Chemistry', 'identifier': 'jfc', 'provider': 'fake', 'abbr': 'J Fake Chem'},
+    {'name': 'Journal of Fake Physics', 'identifier': 'jfp', 'provider': 'fake', 'abbr': 'J Fake Phys'},
+    {'name': 'Fake Letters', 'identifier': 'fl', 'provider': 'fake', 'abbr': 'Fake Lett'},
+]
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.registry_path = os.path.join(self.temp_dir, 'registry.yml')
+
+        with open(self.registry_path, 'w') as f:
+            yaml.dump(JOURNALS, f, Dumper=yaml.Dumper)
+
+        self.provider = FakeProvider()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestResultCache(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.cache = registry.ResultCache(os.path.join(self.temp_dir, 'cache.sqlite'))
+        self.registry = registry.Registry(self.registry_path, [self.provider], cache=self.cache)
+
+    def test_cached_doi(self):
+        r1 = self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual(r1['doi'], '10.0000/fl.12.42')
+        self.assertEqual(self.provider.num_calls, 1)
+
+        r2 = self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual(r1, r2)
+        self.assertEqual(self.provider.num_calls, 1)
+
+        # the URLs that are forged are not cached
+        for _ in range(2):
+            self.registry.get_url('Fake Letters', '12', '42')
+        self.assertEqual(self.provider.num_calls, 3)
+        self.assertEqual(self.cache._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0], 1)
+
+        # shared with another registry using the same file
+        other = registry.Registry(
+            self.registry_path, [self.provider], cache=registry.ResultCache(self.cache.path))
+        self.assertEqual(other.get_doi('Fake Letters', '12', '42'), r1)
+        self.assertEqual(self.provider.num_calls, 3)
+
+    def test_not_found(self):
+        for _ in range(2):
+            with self.assertRaises(registry.RegistryError):
+                self.registry.get_doi('Fake Letters', '12', '0')
+
+        self.assertEqual(self.provider.num_calls, 1)
+
+    def test_expiration(self):
+        self.cache.ttl = -1
+        self.cache.negative_ttl = -1
+
+        self.registry.get_doi('Fake Letters', '12', '42')
+        self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual(self.provider.num_calls, 2)
+
+        for _ in range(2):
+            with self.assertRaises(registry.RegistryError):
+                self.registry.get_doi('Fake Letters', '12', '0')
+
+        self.assertEqual(self.provider.num_calls, 4)
+
+    def test_eviction(self):
+        self.cache.max_size = 2
+        self.cache.ACCESS_RESOLUTION = 0
+
+        for page in ('1', '2', '3'):
+            self.registry.get_doi('Fake Letters', '12', page)
+
+        self.registry.get_doi('Fake Letters', '12', '1')  # `2` is now the least recently used
+        self.cache.evict()
+
+        num_calls = self.provider.num_calls
+        self.registry.get_doi('Fake Letters', '12', '1')
+        self.registry.get_doi('Fake Letters', '12', '3')
+        self.assertEqual(self.provider.num_calls, num_calls)
+
+        self.registry.get_doi('Fake Letters', '12', '2')
+        self.assertEqual(self.provider.num_calls, num_calls + 1)
+
+    def test_access_resolution(self):
+        self.registry.get_doi('Fake Letters', '12', '42')
+        key = registry.ResultCache.make_key('doi', 'fake', 'fl', '12', '42')
+
+        def accessed():
+            return self.cache._connection().execute('SELECT accessed FROM results WHERE key = ?', (key,)).fetchone()[0]
+
+        first = accessed()
+        self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual(accessed(), first)  # (no write)
+
+        self.cache.ACCESS_RESOLUTION = 0
+        self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertGreater(accessed(), first)
+
+    def test_unavailable(self):
+        """A cache that cannot be used does not fail the lookups"""
+
+        class LockedCache(registry.ResultCache):
+            def get(self, key: str):
+                raise sqlite3.OperationalError('database is locked')
+
+            def _put(self, *args):
+                raise sqlite3.OperationalError('database is locked')
+
+        reg = registry.Registry(self.registry_path, [self.provider], cache=LockedCache(self.cache.path))
+
+        for _ in range(2):
+            self.assertEqual(reg.get_doi('Fake Letters', '12', '42')['doi'], '10.0000/fl.12.42')
+            with self.assertRaises(registry.RegistryError):
+                reg.get_doi('Fake Letters', '12', '0')
+
+        self.assertEqual(self.provider.num_calls, 4)
+
+    def test_resolved_url(self):
+        p = FakeResolvingProvider()
+        with open(self.registry_path, 'w') as f:
+            yaml.dump([{'name': 'Fake Resolved', 'identifier': 'fr', 'provider': p.CODE, 'abbr': 'Fake Res'}], f)
+
+        reg = registry.Registry(self.registry_path, [p], cache=self.cache)
+
+        self.assertEqual(reg.get_url('Fake Resolved', '12', '42')['url'], 'https://example.com/fr')  # forged
+        self.assertEqual(reg.get_url('Fake Resolved', '12', '42', resolve=True)['url'], 'https://example.com/fr/12/42')
+        self.assertEqual(p.num_calls, 1)
+
+        # the exact URL is then served by the cache, for any request
+        other = registry.Registry(self.registry_path, [p], cache=registry.ResultCache(self.cache.path))
+        self.assertEqual(other.get_url('Fake Resolved', '12', '42')['url'], 'https://example.com/fr/12/42')
+        self.assertEqual(p.num_calls, 1)
+
+        # an article that was not found still gets the approximate URL
+        with self.assertRaises(registry.RegistryError):
+            reg.get_url('Fake Resolved', '12', '0', resolve=True)
+        self.assertEqual(reg.get_url('Fake Resolved', '12', '0')['url'], 'https://example.com/fr')
+
+    def test_verification(self):
+        r = self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual((r['verification'], r['verified']), ('lookup', True))
+
+        # a result verified in another way is not reused
+        self.provider.doi_verification = 'trust'
+        r = self.registry.get_doi('Fake Letters', '12', '42')
+        self.assertEqual((r['verification'], r['verified']), ('trust', False))
+        self.assertEqual(self.provider.num_calls, 2)
+
+
+class TestSuggestions(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = registry.Registry(self.registry_path, [self.provider])
+
+    def test_same_as_difflib(self):
+        for q, source in [
+                ('journal of fake', 'name'), ('fake', 'name'), ('f', 'name'), ('J Fake', 'abbr'), ('x', 'abbr')]:
+            index = self.registry._index_name if source == 'name' else self.registry._index_abbr
+            possibilities = dict(zip(index.keys, index.values))
+            for cutoff in (.6, .75, .9):
+                self.assertEqual(
+                    self.registry.suggest_journals(q, source, n=2, cutoff=cutoff),
+                    [possibilities[k] for k in difflib.get_close_matches(q, possibilities.keys(), 2, cutoff)])
+
+    def test_pruning(self):
+        """Only the closest are scored, but the results are the same"""
+
+        words = ['journal', 'of', 'chemical', 'physics', 'letters', 'reviews', 'the', 'fake', 'applied']
+        keys = sorted(set(' '.join(words[(i * k) % len(words)] for k in range(1, 2 + i % 4)) for i in range(200)))
+        index = search.NGramIndex(keys)
+
+        for q in ('journal of chemical physics', 'chemical letters', 'the fake', 'apllied physic'):
+            for n, cutoff in ((1, .6), (3, .6), (20, .6), (10, .75)):
+                self.assertEqual(index.get_close_matches(q, n, cutoff), difflib.get_close_matches(q, keys, n, cutoff))
+
+    def test_unknown_source(self):
+        with self.assertRaises(registry.RegistryError):
+            self.registry.suggest_journals('fake', 'whatever')
+
+    def test_cache(self):
+        self.registry = registry.Registry(self.registry_path, [self.provider], suggestions_cache_size=2)
+
+        suggestions = self.registry.suggest_journals('journal of fake')
+        self.assertEqual(self.registry.suggestions_cache_stats, {'hit': 0, 'miss': 1})
+
+        suggestions.clear()  # (the cached list is not altered)
+        self.assertEqual(
+            self.registry.suggest_journals('  Journal  of FAKE'), self.registry.suggest_journals('journal of fake'))
+        self.assertNotEqual(self.registry.suggest_journals('journal of fake'), [])
+        self.assertEqual(self.registry.suggestions_cache_stats, {'hit': 3, 'miss': 1})
+
+        self.registry.suggest_journals('fake', 'abbr')  # (not the same source)
+        self.registry.suggest_journals('fake', n=2)
+        self.registry.suggest_journals('journal of fake')  # dropped
+        self.assertEqual(self.registry.suggestions_cache_stats, {'hit': 3, 'miss': 4})
+        self.assertEqual(len(self.registry._suggestions), 2)
+
+        self.registry.load()
+        self.assertEqual(len(self.registry._suggestions), 0)
+
+    def test_complete(self):
+        self.assertEqual(
+            self.registry.complete_journals('journal of'),
+            (['Journal of Fake Physics', 'Journal of Fake Chemistry'], 'prefix'))  # the shortest first
+        self.assertEqual(
+            self.registry.complete_journals('JOURNAL-of fake c', n=1), (['Journal of Fake Chemistry'], 'prefix'))
+        self.assertEqual(
+            self.registry.complete_journals('j fake phys', 'abbr'), (['Journal of Fake Physics'], 'prefix'))
+
+        # the most looked up first
+        self.registry.get_doi('Journal of Fake Chemistry', '1', '1')
+        self.assertEqual(self.registry.complete_journals('journal', n=1), (['Journal of Fake Chemistry'], 'prefix'))
+
+        # otherwise, the fuzzy suggestions
+        self.assertEqual(self.registry.complete_journals('fake lettres'), (['Fake Letters'], 'fuzzy'))
+        self.assertEqual(self.registry.complete_journals('whatever'), ([], 'fuzzy'))
+
+        with self.assertRaises(registry.RegistryError):
+            self.registry.complete_journals('fake', 'whatever')
+
+    def test_prefix_index(self):
+        index = search.PrefixIndex(['The Journal of Physical Chemistry', 'Journal de Physique', 'Physics'], range(3))
+
+        self.assertEqual(index.complete('journal'), [1, 0])
+        self.assertEqual(index.complete('the journal'), [0])
+        self.assertEqual(index.complete('Journal', weights=[0, 0, 0]), [1, 0])
+        self.assertEqual(index.complete('Journal', weights=[2, 1, 0]), [0, 1])
+        self.assertEqual(index.complete('journal', n=1, weights=[2, 1, 0]), [0])  # (indexed twice)
+        self.assertEqual(index.complete('PHYSI'), [2])
+        self.assertEqual(index.complete(' '), [])
+
+
+class TestListing(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = registry.Registry(self.registry_path, [self.provider])
+
+    def names(self, positions: list) -> list:
+        journals = list(self.registry.journals.keys())
+        return [journals[i] for i in positions]
+
+    def test_pages(self):
+        positions, last, total = self.registry.list_journals(2)
+        self.assertEqual(self.names(positions), ['Fake Letters', 'Journal of Fake Chemistry'])
+        self.assertEqual((last, total), ('Journal of Fake Chemistry', 3))
+
+        positions, last, total = self.registry.list_journals(2, after=last)
+        self.assertEqual(self.names(positions), ['Journal of Fake Physics'])
+        self.assertIsNone(last)
+
+    def test_filters(self):
+        positions, last, total = self.registry.list_journals(10, prefix='JOURNAL of')
+        self.assertEqual(self.names(positions), ['Journal of Fake Chemistry', 'Journal of Fake Physics'])
+        self.assertEqual((last, total), (None, 2))
+
+        positions, last, total = self.registry.list_journals(1, provider='fake', prefix='j', after='Fake Letters')
+        self.assertEqual(self.names(positions), ['Journal of Fake Chemistry'])
+        self.assertEqual((last, total), ('Journal of Fake Chemistry', 2))
+
+        self.assertEqual(self.registry.list_journals(10, prefix='x'), ([], None, 0))
+
+        with self.assertRaises(registry.RegistryError):
+            self.registry.list_journals(10, provider='whatever')
+
+
+class TestIterRegistry(RegistryTestCase):
+
+    def test_iter(self):
+        with open(self.registry_path) as f:
+            self.assertEqual(list(registry.iter_registry(f)), JOURNALS)
+
+        with self.assertRaises(yaml.YAMLError):
+            list(registry.iter_registry(io.StringIO('journals: []')))
+
+
+class TestJournal(RegistryTestCase):
+
+    def test_compact(self):
+        j = jrnl.Journal.deserialize(
+            {'name': 'Physical Review Fakes', 'identifier': ['prf', 'PhysRevF'], 'abbr': 'Phys Rev F'}, self.provider)
+
+        self.assertEqual(j.identifier, ('prf', 'PhysRevF'))
+        self.assertEqual(j.serialize()['identifier'], ['prf', 'PhysRevF'])
+
+        with self.assertRaises(AttributeError):  # no __dict__
+            j.whatever = 1
+
+    def test_journals_hash(self):
+        journals = [jrnl.Journal(j['name'], j['identifier'], self.provider, j['abbr']) for j in JOURNALS]
+        h = jrnl.journals_hash(journals)
+
+        self.assertEqual(jrnl.journals_hash(reversed(journals)), h)  # (in any order)
+
+        journals[-1] = jrnl.Journal('Fake Letters A', 'fl', self.provider)  # renamed
+        self.assertNotEqual(jrnl.journals_hash(journals), h)
+
+
+class TestSnapshot(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot_path = os.path.join(self.temp_dir, 'registry.snapshot')
+
+    def test_snapshot(self):
+        r1 = registry.Registry(self.registry_path, [self.provider], snapshot_path=self.snapshot_path)
+        self.assertTrue(os.path.exists(self.snapshot_path))
+
+        snapshot = registry.load_snapshot(self.snapshot_path, r1.content_hash)
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(len(snapshot['journals']), len(JOURNALS))
+
+        r2 = registry.Registry(self.registry_path, [self.provider], snapshot_path=self.snapshot_path)
+        self.assertEqual(list(r1.journals.keys()), list(r2.journals.keys()))
+        self.assertEqual(r1.suggest_journals('fake lett'), r2.suggest_journals('fake lett'))
+
+    def test_rebuild(self):
+        r1 = registry.Registry(self.registry_path, [self.provider], snapshot_path=self.snapshot_path)
+
+        with open(self.registry_path, 'w') as f:
+            yaml.dump(JOURNALS + [
+                {'name': 'Fake Reviews', 'identifier': 'fr', 'provider': 'fake', 'abbr': 'Fake Rev'}
+            ], f, Dumper=yaml.Dumper)
+
+        r2 = registry.Registry(self.registry_path, [self.provider], snapshot_path=self.snapshot_path)
+        self.assertNotEqual(r1.content_hash, r2.content_hash)
+        self.assertIn('Fake Reviews', r2.journals)
+        self.assertIsNotNone(registry.load_snapshot(self.snapshot_path, r2.content_hash))
+        self.assertIsNone(registry.load_snapshot(self.snapshot_path, r1.content_hash))
+
+
+class TestBatch(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = registry.Registry(self.registry_path, [self.provider])
+
+    def test_batch(self):
+        items = [{'journal': 'Fake Letters', 'volume': '12', 'page': str(p)} for p in range(3)]
+        items.append({'journal': 'Unknown', 'volume': '12', 'page': '1'})
+        items.append({'journal': 'Fake Letters', 'volume': '12', 'page': 'slow'})
+        items.append({'journal': 'Fake Letters', 'volume': '12', 'page': 'bug'})
+
+        with self.assertLogs(registry.logger, level='ERROR'):
+            results = self.registry.batch('doi', items, max_per_provider=2, timeout=.25)
+        self.assertEqual(len(results), len(items))
+
+        self.assertIsInstance(results[0], registry.RegistryError)  # not found
+        self.assertEqual(results[0].var, 'journal')
+        self.assertEqual([r['doi'] for r in results[1:3]], ['10.0000/fl.12.1', '10.0000/fl.12.2'])
+        self.assertIsInstance(results[3], registry.RegistryError)  # unknown journal
+        self.assertIsInstance(results[4], registry.RegistryError)  # deadline
+        self.assertEqual(results[4].var, 'deadline')
+        self.assertIsInstance(results[5], registry.RegistryError)  # unexpected error (of the provider)
+        self.assertEqual(results[5].var, 'lookup')
+
+        self.assertEqual(self.registry.batch('url', []), [])
+
+        with self.assertRaises(registry.RegistryError):
+            self.registry.batch('whatever', items)
+
+
+class TestSingleFlight(RegistryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = registry.Registry(self.registry_path, [self.provider])
+
+    def test_coalescing(self):
+        def lookup(page):
+            try:
+                return self.registry.get_doi('Fake Letters', '12', page)['doi']
+            except registry.RegistryError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(lookup, 'slow') for _ in range(8)]
+
+            time.sleep(.25)  # all of them are now waiting on the first one
+            waiters = self.registry.in_flight_lookups()
+            self.assertEqual(list(waiters.values()), [7])
+
+            results = [f.result() for f in futures]
+
+        self.assertEqual(results, ['10.0000/fl.12.slow'] * 8)
+        self.assertEqual(self.provider.num_calls, 1)
+        self.assertEqual(self.registry.in_flight_lookups(), {})
+
+    def test_error_shared(self):
+        flight = registry.SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(.1)
+            raise ValueError('x')
+
+        def follow():
+            started.wait()
+            return flight.do('k', lambda: 'not called')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            f1 = executor.submit(flight.do, 'k', fail)
+            f2 = executor.submit(follow)
+
+            for f in (f1, f2):
+                with self.assertRaises(ValueError):
+                    f.result()
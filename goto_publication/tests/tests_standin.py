@@ -0,0 +1,208 @@
+import unittest
+
+import nltk
+
+from goto_publication import providers
+from goto_publication.tests.standin import StandinServer
+
+
+try:
+    nltk.data.find('corpora/wordnet')  # used by `iso4` to abbreviate the journal names
+    HAS_WORDNET = True
+except LookupError:
+    HAS_WORDNET = False
+
+needs_wordnet = unittest.skipIf(not HAS_WORDNET, 'the wordnet corpus (`nltk`) is not available')
+
+
+class StandinTestCase(unittest.TestCase):
+
+    LATENCY = .0
+    ERROR_RATE = .0
+
+    def setUp(self):
+        self.server = StandinServer(latency=self.LATENCY, error_rate=self.ERROR_RATE).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestProvidersOffline(StandinTestCase):
+    """Same flows as in ``tests_providers.py``, but against the stand-in"""
+
+    def _check(self, p: providers.Provider, info: tuple, doi: str, **kwargs):
+        self.server.attach(p)
+        self.assertEqual(p.get_doi(*info, **kwargs), doi)
+
+        with self.assertRaises(providers.ArticleNotFound):
+            p.get_doi(info[0], 1, 1, **kwargs)
+
+    # !! Please keep the list alphabetic
+    def test_ACS(self):
+        self._check(providers.ACS(), ('jacsat', 138, 5052), '10.1021/jacs.6b01456')
+        self.assertEqual(self.server.requests['pubs.acs.org'], 3)  # first lookup sets the cookie
+
+    def test_APS(self):
+        self._check(providers.APS(), (('prl', 'PhysRevLett'), 116, 231301), '10.1103/PhysRevLett.116.231301')
+
+    def test_APS_verifications(self):
+        info, doi = (('prl', 'PhysRevLett'), 116, 231301), '10.1103/PhysRevLett.116.231301'
+
+        for verification in ('head', 'handle'):
+            self._check(providers.APS(doi_verification=verification), info, doi)
+
+        self.assertEqual(self.server.requests['journals.aps.org'], 2)
+        self.assertEqual(self.server.requests['doi.org'], 2)
+
+        p = self.server.attach(providers.APS(doi_verification='trust'))
+        self.assertEqual(p.get_doi(*info), doi)
+        self.assertEqual(p.get_doi(info[0], 1, 1), '10.1103/PhysRevLett.1.1')  # not verified
+        self.assertEqual(sum(self.server.requests.values()), 4)
+
+        with self.assertRaises(ValueError):
+            providers.APS(doi_verification='whatever')
+
+    @needs_wordnet
+    def test_APS_journals(self):
+        journals = self.server.attach(providers.APS()).get_journals()
+        self.assertIn('Physical Review Letters', [j.name for j in journals])
+
+    def test_AIP(self):
+        self._check(providers.AIP(), ('The Journal of Chemical Physics', 151, '064303'), '10.1063/1.5110375')
+
+    def test_IOP(self):
+        self._check(providers.IOP(), ('1751-8121', 52, 320201), '10.1088/1751-8121/ab2a2f')
+
+    def test_Nature(self):
+        self._check(providers.Nature(), ('nature', 227, 680), '10.1038/227680a0')
+
+        p = self.server.attach(providers.Nature())
+        with self.assertRaises(providers.ProviderError):
+            p.get_doi('nature', 227, 681)
+
+    @needs_wordnet
+    def test_Nature_journals(self):
+        self.assertTrue(len(self.server.attach(providers.Nature()).get_journals()) > 0)
+
+    def test_RSC(self):
+        self._check(providers.RSC(), ('phys. chem. chem. phys.', 21, 2222), '10.1039/C8CP06286A')
+        self.assertEqual(self.server.requests['pubs.rsc.org'], 4)  # two requests per lookup
+
+    def test_ScienceDirect(self):
+        p = self.server.attach(providers.ScienceDirectAPI('key'))
+        self._check(p, ('Chemical Physics', 493, 200), '10.1016/j.chemphys.2017.06.015')
+
+        with self.assertRaises(providers.ProviderError):
+            p.get_doi('Chemical Physics', 493, 200, **{providers.API_KEY_FIELD: ''})
+
+    @needs_wordnet
+    def test_ScienceDirect_journals(self):
+        p = self.server.attach(providers.ScienceDirectAPI('key'))
+        self.assertEqual(len(p.get_journals()), 130)
+        self.assertEqual(len(p.get_journals(jobs=2)), 130)
+
+    @needs_wordnet
+    def test_Springer_journals(self):
+        p = self.server.attach(providers.Springer())
+        self.assertTrue(len(p.get_journals()) > 0)
+
+    def test_Wiley(self):
+        self._check(providers.Wiley(), ('15213765', 15, 186), '10.1002/cphc.201402046')
+
+    def test_Wiley_url(self):
+        p = self.server.attach(providers.Wiley())
+        link = 'https://onlinelibrary.wiley.com/doi/abs/10.1002/cphc.201402046'
+
+        self.assertEqual(p.get_url('15213765', 15, 186), 'https://onlinelibrary.wiley.com/loi/15213765')
+        self.assertEqual(self.server.requests, {})  # forged
+
+        self.assertEqual(p.get_url('15213765', 15, 186, resolve=True), link)
+        self.assertEqual(p.get_url('15213765', 15, 186), link)  # resolved before
+        self.assertEqual(p.get_doi('15213765', 15, 186), '10.1002/cphc.201402046')
+        self.assertEqual(self.server.requests['onlinelibrary.wiley.com'], 1)
+
+        with self.assertRaises(providers.ArticleNotFound):
+            p.get_url('15213765', 1, 1, resolve=True)
+
+    def test_Wiley_listing(self):
+        p = self.server.attach(providers.Wiley())
+
+        changed, state = p.check_listing({}, jobs=2)
+        self.assertTrue(changed)
+        self.assertEqual(set(state), set(p._listing_url(i) for i in range(2)))  # 60 journals, on two pages
+        self.assertEqual(state[p._listing_url(0)]['count'], 60)
+        self.assertEqual(set(p._prefetched), set(state))  # (reused by the crawl)
+        self.assertEqual(self.server.requests['onlinelibrary.wiley.com'], 2)
+
+        changed, state2 = p.check_listing(state)  # (no validators, but the same content)
+        self.assertFalse(changed)
+        self.assertEqual(state2, state)
+        self.assertEqual(p._prefetched, {})
+        self.assertEqual(self.server.requests['onlinelibrary.wiley.com'], 4)
+
+    @needs_wordnet
+    def test_Wiley_journals(self):
+        journals = self.server.attach(providers.Wiley()).get_journals()
+        self.assertEqual(len(journals), 59)  # one of the items is not a link
+
+
+class NoRetryAPS(providers.APS):
+    MAX_RETRIES = 0
+
+
+class TestInjectedErrors(StandinTestCase):
+
+    ERROR_RATE = 1.
+
+    def test_errors(self):
+        p = self.server.attach(NoRetryAPS())
+
+        for _ in range(p.breaker.min_calls):
+            with self.assertRaises(providers.ArticleNotFound):  # 503 is not a 200
+                p.get_doi(('prl', 'PhysRevLett'), 116, 231301)
+
+        self.assertEqual(p.breaker.state, p.breaker.OPEN)
+
+
+class TestInjectedLatency(StandinTestCase):
+
+    LATENCY = .2
+
+    def test_latency(self):
+        p = self.server.attach(providers.IOP())
+        p.READ_TIMEOUT = .1
+
+        with self.assertRaises(providers.ProviderError):
+            p.get_doi('1751-8121', 52, 320201)
+
+
+class TestStreaming(StandinTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.provider = self.server.attach(providers.Nature())
+        self.provider.STREAM_CHUNK_SIZE = 1024
+        self.url = self.provider.get_url('nature', 227, 680)
+
+    def test_early_termination(self):
+        response, html = self.provider._stream_html(
+            'GET', self.url, lambda event, element: event == 'end' and element.tag == 'main')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(html.xpath('//main')), 1)
+        self.assertEqual(len(html.xpath('//a[@href="/info/page-699"]')), 0)  # the end of the page is not read
+
+    def test_max_bytes(self):
+        self.provider.STREAM_MAX_BYTES = 4096
+
+        _, html = self.provider._stream_html('GET', self.url, lambda event, element: False)
+        self.assertTrue(len(html.xpath('//script')) > 0)
+        self.assertEqual(len(html.xpath('//main')), 0)
+
+    def test_not_found(self):
+        response, html = self.provider._stream_html(
+            'GET', self.provider.WEBSITE_URL + 'unknown', lambda event, element: False)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(html)
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from goto_publication import timing, providers
+from goto_publication.tests.standin import StandinServer
+
+
+class TestTiming(unittest.TestCase):
+
+    def test_phases(self):
+        with timing.phase('nothing'):  # no timing in progress
+            pass
+
+        t = timing.start()
+
+        for _ in range(2):
+            with timing.phase('upstream'):
+                time.sleep(.01)
+
+        self.assertIs(timing.stop(), t)
+        self.assertIsNone(timing.current())
+
+        self.assertEqual(list(t.phases.keys()), ['upstream'])
+        self.assertEqual(t.as_dict()['upstream']['count'], 2)
+        self.assertTrue(t.as_dict()['upstream']['dur'] >= 20)
+
+        header = t.header()
+        self.assertTrue(header.startswith('upstream;dur='))
+        self.assertIn(', total;dur=', header)
+
+    def test_provider_phases(self):
+        with StandinServer() as server:
+            p = server.attach(providers.Nature())
+
+            t = timing.start()
+            try:
+                p.get_doi('nature', 227, 680)
+            finally:
+                timing.stop()
+
+        # the page is streamed: one phase per chunk received and parsed
+        self.assertTrue(t.phases['upstream'][1] >= 1)
+        self.assertTrue(t.phases['parse'][1] >= 1)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_wanted(self):
+        self.assertFalse(timing.Profiler(self.temp_dir).wanted())
+        self.assertTrue(timing.Profiler(self.temp_dir, sample_rate=1).wanted())
+
+        profiler = timing.Profiler(self.temp_dir, admin_token='secret')
+        self.assertTrue(profiler.wanted('secret'))
+        self.assertFalse(profiler.wanted('whatever'))
+        self.assertFalse(timing.Profiler(self.temp_dir).wanted('secret'))
+
+    def test_keep_slowest(self):
+        profiler = timing.Profiler(self.temp_dir, keep=2)
+
+        for duration in (.3, .1, .2):
+            self.assertIsNotNone(profiler.save(profiler.start(), duration))
+
+        self.assertIsNone(profiler.save(profiler.start(), .05))  # not one of the slowest
+
+        profiles = sorted(os.listdir(self.temp_dir))
+        self.assertEqual([int(p.split('-')[0]) for p in profiles], [200000, 300000])
+
+    def test_single_profile(self):
+        profiler = timing.Profiler(self.temp_dir)
+
+        profile = profiler.start()
+        self.assertIsNone(profiler.start())  # already profiling
+
+        profiler.cancel(profile)
+
+        profile = profiler.start()
+        self.assertIsNotNone(profile)
+        profiler.cancel(profile)
@@ -0,0 +1,212 @@
+import unittest
+import socket
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+from goto_publication import providers
+
+
+class StalledProvider(providers.Provider):
+    NAME = 'Stalled'
+    CODE = 'stalled'
+
+    READ_TIMEOUT = .2
+    MAX_RETRIES = 0
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    content = b'journals'
+    num_requests = 0
+
+    def do_GET(self):
+        ListingHandler.num_requests += 1
+        etag = '"{}"'.format(hash(self.content))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(self.content)))
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ListingProvider(providers.Provider):
+    NAME = 'Listing'
+    CODE = 'listing'
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+
+    def get_listing_urls(self, **kwargs: dict):
+        return [self.url]
+
+
+class TestListing(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), ListingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.provider = ListingProvider('http://127.0.0.1:{}/'.format(self.server.server_port))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        ListingHandler.content = b'journals'
+        ListingHandler.num_requests = 0
+
+    def test_check_listing(self):
+        changed, state = self.provider.check_listing({})
+        self.assertTrue(changed)
+        self.assertIsNotNone(state[self.provider.url]['etag'])
+
+        changed, state2 = self.provider.check_listing(state)  # 304
+        self.assertFalse(changed)
+        self.assertEqual(state, state2)
+
+        ListingHandler.content = b'other journals'
+        changed, state3 = self.provider.check_listing(state)
+        self.assertTrue(changed)
+        self.assertNotEqual(state[self.provider.url]['hash'], state3[self.provider.url]['hash'])
+
+        state3[self.provider.url]['etag'] = None  # no validator, but same content
+        changed, _ = self.provider.check_listing(state3)
+        self.assertFalse(changed)
+
+    def test_prefetched(self):
+        """The pages downloaded by the check are not downloaded again by the crawl"""
+
+        changed, state = self.provider.check_listing({})
+        self.assertTrue(changed)
+        self.assertEqual(self.provider._get(self.provider.url).content, b'journals')
+        self.assertEqual(ListingHandler.num_requests, 1)
+
+        self.provider._get(self.provider.url)  # (only once)
+        self.assertEqual(ListingHandler.num_requests, 2)
+
+        self.provider.check_listing(state)  # unchanged: nothing to reuse
+        self.provider._get(self.provider.url)
+        self.assertEqual(ListingHandler.num_requests, 4)
+
+    def test_no_listing(self):
+        self.assertEqual(providers.Provider().check_listing({}), (True, {}))
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        # accepts connections (through the backlog), but never answers
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(16)
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.getsockname()[1])
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_timeout(self):
+        p = StalledProvider()
+
+        with self.assertRaises(providers.ProviderError):
+            p._get(self.url)
+
+    def test_session_per_thread(self):
+        p = StalledProvider()
+        sessions = set()
+        lock = threading.Lock()
+        barrier = threading.Barrier(4)
+
+        def get_session(_):
+            barrier.wait()  # ensure that 4 different threads are used
+            s = p._session()
+            self.assertIs(s, p._session())
+            with lock:
+                sessions.add(id(s))
+            return s.get_adapter(self.url)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            adapters = list(executor.map(get_session, range(4)))
+
+        self.assertEqual(len(sessions), 4)
+        self.assertTrue(all(a is p._adapter for a in adapters))
+
+    def test_map_pages(self):
+        p = StalledProvider()
+        in_flight = [0, 0]  # current, max
+        lock = threading.Lock()
+
+        def fetch(page):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(.01)
+            with lock:
+                in_flight[0] -= 1
+            return page * 10
+
+        self.assertEqual(p._map_pages(fetch, range(20), jobs=10), [i * 10 for i in range(20)])
+        self.assertLessEqual(in_flight[1], p.CRAWL_MAX_CONCURRENCY)
+        self.assertEqual(p._map_pages(fetch, range(5)), [i * 10 for i in range(5)])
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_breaker(self):
+        breaker = providers.CircuitBreaker(window=4, min_calls=4, error_rate=.5, slow_call=1., open_duration=.1)
+
+        for failed in (False, True, False):
+            self.assertTrue(breaker.allow())
+            breaker.record(failed, .1)
+
+        self.assertEqual(breaker.state, providers.CircuitBreaker.CLOSED)
+
+        self.assertTrue(breaker.allow())
+        breaker.record(False, 2.)  # too slow
+        self.assertEqual(breaker.state, providers.CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.get_status()['errorRate'], .5)
+
+        # half-open: a single probe
+        time.sleep(.15)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, providers.CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.record(True, .1)  # probe failed
+        self.assertEqual(breaker.state, providers.CircuitBreaker.OPEN)
+
+        time.sleep(.15)
+        self.assertTrue(breaker.allow())
+        breaker.record(False, .1)  # probe succeeded
+        self.assertEqual(breaker.state, providers.CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_fail_fast(self):
+        p = StalledProvider()
+        p.breaker = providers.CircuitBreaker(min_calls=1, open_duration=60)
+
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+
+        try:
+            with self.assertRaises(providers.ProviderError):
+                p._get('http://127.0.0.1:{}/'.format(server.getsockname()[1]))
+        finally:
+            server.close()
+
+        self.assertEqual(p.get_info(with_health=True)['providerHealth']['state'], providers.CircuitBreaker.OPEN)
+        self.assertNotIn('providerHealth', p.get_info())
+
+        start = time.monotonic()
+        with self.assertRaisesRegex(providers.ProviderError, 'temporarily unavailable'):
+            p._get('http://127.0.0.1:1/')
+        self.assertLess(time.monotonic() - start, .1)
@@ -0,0 +1,160 @@
+"""
+Timing of the phases of a request (parsing of the arguments, upstream requests, HTML parsing, encoding, ...),
+and opt-in profiling of the slowest requests.
+
+The timing is attached to the current thread: ``start()`` it when the request begins, and wrap the phases with
+``phase()``, which does nothing if there is no timing in progress.
+"""
+
+from typing import Optional, Dict
+import contextlib
+import cProfile
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+
+class Timing:
+    """Duration and number of occurrences of each phase"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}  # name -> [duration, count]
+
+    def add(self, name: str, duration: float):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = [.0, 0]
+
+        phase[0] += duration
+        phase[1] += 1
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def as_dict(self) -> Dict[str, dict]:
+        """Phases, with durations in milliseconds"""
+
+        return dict((name, {'dur': round(d * 1000, 3), 'count': c}) for name, (d, c) in self.phases.items())
+
+    def header(self) -> str:
+        """Value of the ``Server-Timing`` header (durations in milliseconds)"""
+
+        metrics = ['{};dur={:.3f}'.format(name, d * 1000) for name, (d, _) in self.phases.items()]
+        metrics.append('total;dur={:.3f}'.format(self.total() * 1000))
+
+        return ', '.join(metrics)
+
+
+_local = threading.local()
+
+
+def start() -> Timing:
+    _local.timing = Timing()
+    return _local.timing
+
+
+def current() -> Optional[Timing]:
+    return getattr(_local, 'timing', None)
+
+
+def stop() -> Optional[Timing]:
+    timing = current()
+    _local.timing = None
+    return timing
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Add the duration of the block to phase ``name`` of the current timing, if any"""
+
+    timing = current()
+    if timing is None:
+        yield
+        return
+
+    start_ = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start_)
+
+
+class Profiler:
+    """Profile a sample of the requests (``sample_rate``) or the ones that ask for it with the admin token, and keep
+    the profiles (``pstats`` files) of the ``keep`` slowest ones in ``path``.
+
+    The file names start with the duration of the request (in microseconds), so that they are sorted from the
+    fastest to the slowest.
+    """
+
+    def __init__(self, path: str, keep: int = 10, sample_rate: float = .0, admin_token: str = None):
+        self.path = path
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+
+        self._active = threading.Lock()  # a single profile at a time, per process
+
+    def wanted(self, token: Optional[str] = None) -> bool:
+        """Whether the request should be profiled, given the token it provides (if any)"""
+
+        if self.admin_token is not None and token is not None and token == self.admin_token:
+            return True
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling the current thread (if no other request is being profiled)"""
+
+        if not self._active.acquire(blocking=False):
+            return None
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def cancel(self, profile: cProfile.Profile):
+        """Stop ``profile``, and drop it"""
+
+        profile.disable()
+        self._active.release()
+
+    def _profiles(self) -> list:
+        try:
+            return sorted(f for f in os.listdir(self.path) if f.endswith('.prof'))
+        except FileNotFoundError:
+            return []
+
+    def save(self, profile: cProfile.Profile, duration: float) -> Optional[str]:
+        """Stop ``profile``, and keep it if the request is one of the slowest.
+        Return the path to the profile, if kept.
+        """
+
+        profile.disable()
+        self._active.release()
+
+        duration_us = int(duration * 1e6)
+        profiles = self._profiles()
+        if len(profiles) >= self.keep and duration_us <= int(profiles[-self.keep].split('-')[0]):
+            return None
+
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, '{:012d}-{}-{}.prof'.format(duration_us, os.getpid(), uuid.uuid4().hex[:8]))
+
+        # written atomically, since other workers may look at the directory
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        os.close(fd)
+        profile.dump_stats(temp_path)
+        os.replace(temp_path, path)
+
+        for name in self._profiles()[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:  # removed by another worker
+                pass
+
+        return path
@@ -0,0 +1,28 @@
+"""
+Configuration of gunicorn: ``gunicorn -c gunicorn.conf.py app:app``.
+
+The application (and thus the registry of journals) is loaded once, in the master, and the workers are forked from
+it, so that they share its memory pages (copy-on-write) instead of each loading its own copy.
+"""
+
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    """The application is loaded, and the workers are not forked yet: move everything that exists to the permanent
+    generation of the garbage collector, which then never touches (and thus never copies) these objects in the
+    workers. ``gc.freeze()`` only exists from Python 3.7: before, the pages are still shared, but less of them.
+    """
+
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+
+def worker_exit(server, worker):
+    """Write the last metrics of the worker, so that they are still counted once it is gone"""
+
+    from goto_publication import metrics
+    metrics.flush_at_exit()
@@ -0,0 +1,150 @@
+"""
+Measure the memory of the (forked) workers, with the application loaded in each worker, or loaded once in the
+master (``preload_app``) and possibly frozen from the garbage collector (``gc.freeze()``), as done by
+`gunicorn.conf.py`.
+
+The private memory of a worker (``Private_*`` in ``/proc/<pid>/smaps_rollup``) is what it does not share with the
+others, so what each additional worker costs. Linux only.
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import time
+import tracemalloc
+
+import settings
+
+# no store shared between the workers (they would be created in the working directory)
+settings.CACHE_CONFIG['PATH'] = None
+settings.METRICS_CONFIG['PATH'] = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODES = {
+    # name: (preload, freeze)
+    'per-worker': (False, False),
+    'preload': (True, False),
+    'preload+freeze': (True, True),
+}
+
+
+def load_app():
+    os.chdir(ROOT)  # the paths of the settings are relative to the root of the repository
+    import app  # noqa
+    return app
+
+
+def workload(app):
+    """What a worker does: a few requests, and garbage collections"""
+
+    client = app.app.test_client()
+    for q in ('chemical', 'phys rev', 'nature', 'angewandte'):
+        client.get('/api/suggests?q={}'.format(q))
+
+    client.get('/api/journals?count=100')
+    client.get('/api/journals?prefix=j&count=100')
+
+    gc.collect()
+
+
+def memory() -> dict:
+    """Memory of the current process, in kB"""
+
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == 'kB':
+                values[fields[0][:-1]] = int(fields[1])
+
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def measure(preload: bool, freeze: bool, workers: int) -> list:
+    app = None
+    if preload:
+        app = load_app()
+        if freeze:
+            gc.freeze()
+
+    pids, pipes = [], []
+    for _ in range(workers):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # worker
+            os.close(r)
+            workload(app if app is not None else load_app())
+            os.write(w, json.dumps(memory()).encode())
+            os.close(w)
+            signal.pause()  # stay alive, so that the shared pages are counted as such
+            os._exit(0)
+
+        os.close(w)
+        pids.append(pid)
+        pipes.append(r)
+
+    results = []
+    for r in pipes:
+        with os.fdopen(r) as f:
+            results.append(json.loads(f.read()))
+
+    time.sleep(.1)
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+    return results
+
+
+def registry_size() -> int:
+    """Memory allocated to build the registry, in kB"""
+
+    from goto_publication import registry
+
+    tracemalloc.start()
+    r = registry.Registry(os.path.join(ROOT, settings.REGISTRY_PATH), settings.PROVIDERS)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del r
+    return size // 1024
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='benchmark the memory of the workers')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='number of workers')
+    parser.add_argument('-m', '--mode', choices=list(MODES.keys()), help='only this mode')
+    parser.add_argument('--registry', action='store_true', help='only measure the size of the registry')
+    args = parser.parse_args()
+
+    if args.registry:
+        print('registry: {} kB'.format(registry_size()))
+        raise SystemExit(0)
+
+    print('{:<16} {:>10} {:>10} {:>14}'.format('mode', 'RSS (kB)', 'PSS (kB)', 'private (kB)'))
+
+    for mode, (preload, freeze) in MODES.items():
+        if args.mode is not None and mode != args.mode:
+            continue
+
+        if freeze and not hasattr(gc, 'freeze'):
+            print('{:<16} (requires Python 3.7)'.format(mode))
+            continue
+
+        # in a separate process, so that the modes do not share anything
+        pid = os.fork()
+        if pid == 0:
+            results = measure(preload, freeze, args.workers)
+            print('{:<16} {:>10} {:>10} {:>14}'.format(
+                mode, *(sum(r[k] for r in results) // len(results) for k in ('rss', 'pss', 'private'))))
+            os._exit(0)
+
+        os.waitpid(pid, 0)
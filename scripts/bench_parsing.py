@@ -0,0 +1,139 @@
+"""
+Compare the extraction of the providers (compiled XPath on lxml) with the former whole-document `BeautifulSoup`
+parsing, on the recorded pages of the provider stand-in
+"""
+
+import argparse
+import base64
+import os
+import timeit
+
+from bs4 import BeautifulSoup
+
+from goto_publication import providers
+from goto_publication.tests.standin import FIXTURES_DIR
+
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+# --- former implementations (with BeautifulSoup)
+
+def bs4_acs_journals(content: bytes) -> list:
+    soup = BeautifulSoup(content, 'lxml')
+    opts = soup.find('select', attrs={'class': 'quick-search_journals-select'}).find_all('option')
+    return [(o.text, o.attrs['value']) for o in opts if o.attrs['value'] != '']
+
+
+def bs4_aip_journals(content: bytes) -> list:
+    soup = BeautifulSoup(content, 'lxml')
+    opts = soup.find('div', attrs={'class': 'scitation-journals-covers'})\
+        .find_all('span', attrs={'class': 'journal-title'})
+
+    journals = []
+    for o in opts:
+        text = o.find('a').text.strip().replace(' (co-published with ACA)', '')
+        journals.append((text, text))
+
+    return journals
+
+
+def bs4_aps_journals(content: bytes) -> list:
+    soup = BeautifulSoup(content, 'lxml')
+
+    journals = []
+    for l in soup.find_all('div', attrs={'class': 'article'})[:-1]:
+        a = l.find('a', attrs={'class': 'button'})
+        journals.append((l.find('h5').text, [a.attrs['href'][1:-1], a.text[5:].replace('.', '').replace(' ', '')]))
+
+    return journals
+
+
+def bs4_iop_journals(content: bytes) -> list:
+    soup = BeautifulSoup(content, 'lxml')
+    return [(l.text, l.attrs['href'][9:]) for l in soup.find('div', attrs={'id': 'archive-titles-tab'}).find_all('a')]
+
+
+def bs4_nature_search(content: bytes) -> str:
+    links = BeautifulSoup(content, 'lxml').find_all(attrs={'data-track-action': 'search result'})
+    return links[0].attrs['href'].replace('/articles', providers.Nature.DOI_BASE)
+
+
+def bs4_rsc_search_term(content: bytes) -> str:
+    return BeautifulSoup(content, 'lxml').find('input', attrs={'name': 'SearchTerm'}).attrs['value']
+
+
+def bs4_rsc_result(content: bytes) -> str:
+    return BeautifulSoup(content, 'lxml').select('.text--small a')[0].attrs['href'][16:]
+
+
+def bs4_rsc_journals(content: bytes) -> list:
+    soup = BeautifulSoup(content, 'lxml')
+    links = soup.find('div', attrs={'class': 'journal-list--content'})\
+        .find_all('span', attrs={'class': 'list__item-label'})
+    return [next(l.children).strip() for l in links]
+
+
+def bs4_wiley_listing(content: bytes) -> tuple:
+    soup = BeautifulSoup(content, 'lxml')
+    nresult = int(soup.find('span', attrs={'class': 'result__count'}).b.string)
+
+    journals = []
+    for i in soup.find_all('li', attrs={'class': 'search__item'}):
+        link = next(i.find('h3').children)
+        if link.name == 'span':
+            continue
+
+        lnk = str(link['href'])
+        journals.append((str(link.span.string), lnk[lnk.rfind('/') + 1:]))
+
+    return journals, nresult
+
+
+BENCHMARKS = [
+    # name, page, former, current
+    ('ACS journals', 'acs_home.html', bs4_acs_journals, providers.ACS()._parse_journals),
+    ('AIP journals', 'aip_home.html', bs4_aip_journals, providers.AIP()._parse_journals),
+    ('APS journals', 'aps_about.html', bs4_aps_journals, providers.APS()._parse_journals),
+    ('IOP journals', 'iop_journal_list.html', bs4_iop_journals, providers.IOP()._parse_journals),
+    ('Nature search', 'nature_search.html', bs4_nature_search, providers.Nature()._parse_search),
+    ('RSC search term', 'rsc_results.html', bs4_rsc_search_term, providers.RSC()._parse_search_term),
+    ('RSC result', 'rsc_journalresult.html', bs4_rsc_result, providers.RSC()._parse_result),
+    ('RSC journals', 'rsc_journals.html', bs4_rsc_journals, providers.RSC()._parse_journals),
+    ('Wiley listing', 'wiley_publications_0.html', bs4_wiley_listing, providers.Wiley()._parse_listing),
+]
+
+# placeholders of the stand-in
+REPLACEMENTS = {
+    'rsc_results.html': (b'{searchterm}', base64.b64encode(b'["phys. chem. chem. phys.", "21", "2222"]')),
+    'rsc_journalresult.html': (b'{doi}', b'10.1039/C8CP06286A'),
+}
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='benchmark the extraction of data from the provider pages')
+    parser.add_argument('-n', '--number', type=int, default=20, help='number of executions of each extraction')
+    args = parser.parse_args()
+
+    print('{:<20} {:>8} {:>12} {:>12} {:>8} {:>6}'.format('page', 'size', 'bs4 (ms)', 'lxml (ms)', 'speedup', 'same'))
+
+    total_bs4, total_lxml = .0, .0
+
+    for name, page, former, current in BENCHMARKS:
+        content = fixture(page)
+        if page in REPLACEMENTS:
+            content = content.replace(*REPLACEMENTS[page])
+
+        t_bs4 = timeit.timeit(lambda: former(content), number=args.number) / args.number * 1000
+        t_lxml = timeit.timeit(lambda: current(content), number=args.number) / args.number * 1000
+        total_bs4 += t_bs4
+        total_lxml += t_lxml
+
+        print('{:<20} {:>7}k {:>12.3f} {:>12.3f} {:>7.1f}x {:>6}'.format(
+            name, len(content) // 1024, t_bs4, t_lxml, t_bs4 / t_lxml,
+            'yes' if former(content) == current(content) else 'no'))
+
+    print('{:<20} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+        'total', '', total_bs4, total_lxml, total_bs4 / total_lxml))
@@ -0,0 +1,81 @@
+"""
+Compare the n-gram index used by `Registry.suggest_journals()` with a plain `difflib` search, and time the
+completions of `Registry.complete_journals()`
+"""
+
+import argparse
+import difflib
+import timeit
+
+from settings import REGISTRY_PATH, PROVIDERS, API_CONFIG
+
+from goto_publication import registry
+
+registry_path = '../' + REGISTRY_PATH
+
+QUERIES = {
+    'name': ['chemical', 'journal of chemical physics', 'phys rev', 'nature', 'angewandte', 'j', 'mater chem'],
+    'abbr': ['J Chem Phys', 'Phys Rev Lett', 'Nat', 'Angew Chem', 'ACS Nano', 'J', 'Chem Phys Lett'],
+}
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='benchmark the journal suggestions')
+    parser.add_argument('-n', '--number', type=int, default=20, help='number of executions of each query')
+    args = parser.parse_args()
+
+    reg = registry.Registry(registry_path, PROVIDERS, suggestions_cache_size=0)  # (measure the scoring)
+    n, cutoff = API_CONFIG['DEFAULT_NUM_SUGGESTIONS'], API_CONFIG['DEFAULT_CUTOFF']
+
+    sources = {
+        'name': reg._index_name,
+        'abbr': reg._index_abbr,
+    }
+
+    for source, index in sources.items():
+        print('- source: {} ({} keys)'.format(source, len(index.keys)))
+        print('  {:<30} {:>12} {:>12} {:>8} {:>6}'.format('query', 'difflib (ms)', 'index (ms)', 'speedup', 'same'))
+
+        total_difflib, total_index = .0, .0
+
+        for q in QUERIES[source]:
+            def f_difflib():
+                return difflib.get_close_matches(q, index.keys, n=n, cutoff=cutoff)
+
+            def f_index():
+                return index.get_close_matches(q, n=n, cutoff=cutoff)
+
+            t_difflib = timeit.timeit(f_difflib, number=args.number) / args.number * 1000
+            t_index = timeit.timeit(f_index, number=args.number) / args.number * 1000
+            total_difflib += t_difflib
+            total_index += t_index
+
+            print('  {:<30} {:>12.3f} {:>12.3f} {:>7.1f}x {:>6}'.format(
+                q, t_difflib, t_index, t_difflib / t_index, 'yes' if f_difflib() == f_index() else 'no'))
+
+        print('  {:<30} {:>12.3f} {:>12.3f} {:>7.1f}x\n'.format(
+            'total', total_difflib, total_index, total_difflib / total_index))
+
+    # completions (prefix mode), with the fuzzy fallback computed each time
+    for source, index in [('name', reg._prefix_name), ('abbr', reg._prefix_abbr)]:
+        print('- completions: {} ({} keys)'.format(source, len(index)))
+        print('  {:<30} {:>12} {:>8} {:>8}'.format('query', 'time (ms)', 'match', 'found'))
+
+        for q in QUERIES[source]:
+            t = timeit.timeit(lambda: reg.complete_journals(q, source, n, cutoff), number=args.number)
+            found, match = reg.complete_journals(q, source, n, cutoff)
+            print('  {:<30} {:>12.3f} {:>8} {:>8}'.format(q, t / args.number * 1000, match, len(found)))
+
+        print()
+
+    # cache of the suggestions
+    cached = registry.Registry(registry_path, PROVIDERS)
+    print('- cache of the suggestions')
+    print('  {:<30} {:>12} {:>12}'.format('query', 'miss (ms)', 'hit (ms)'))
+
+    for q in QUERIES['name']:
+        t_miss = timeit.timeit(lambda: cached.suggest_journals(q, 'name', n, cutoff), number=1)
+        t_hit = timeit.timeit(lambda: cached.suggest_journals(q, 'name', n, cutoff), number=args.number)
+        print('  {:<30} {:>12.3f} {:>12.3f}'.format(q, t_miss * 1000, t_hit / args.number * 1000))
+
+    print('  {}'.format(cached.suggestions_cache_stats))
@@ -0,0 +1,218 @@
+"""
+End-to-end benchmarks, run against the provider stand-in (no network needed):
+
+- ``providers``: latency of a DOI lookup, for each provider;
+- ``api``: throughput of the API under concurrent requests;
+- ``suggest``: latency of ``Registry.suggest_journals()``, when the suggestions are computed (``source:q``) and when
+  they are in its cache (``cached:source:q``);
+- ``load``: load time of the registry, from the YAML file and from the snapshot.
+
+The results are written as JSON (``-o``), and can be compared with a previous run (``--compare``).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import settings
+
+from goto_publication import registry, providers, __version__
+from goto_publication.tests.standin import StandinServer
+
+registry_path = '../' + settings.REGISTRY_PATH
+
+# citations known by the stand-in, for each provider
+LOOKUPS = [
+    (providers.ACS, ('jacsat', 138, 5052)),
+    (providers.APS, (('prl', 'PhysRevLett'), 116, 231301)),
+    (providers.AIP, ('The Journal of Chemical Physics', 151, '064303')),
+    (providers.IOP, ('1751-8121', 52, 320201)),
+    (providers.Nature, ('nature', 227, 680)),
+    (providers.RSC, ('phys. chem. chem. phys.', 21, 2222)),
+    (lambda: providers.ScienceDirectAPI('key'), ('Chemical Physics', 493, 200)),
+    (providers.Wiley, ('15213765', 15, 186)),
+]
+
+API_REQUESTS = [
+    '/api/doi?journal=Physical Review Letters&volume=116&page=231301',
+    '/api/url?journal=Journal of the American Chemical Society&volume=138&page=5052',
+    '/api/suggests?q=journal of chemical',
+    '/api/journals?start=100&count=25',
+]
+
+SUGGESTIONS = [
+    ('chemical', 'name'), ('journal of chemical physics', 'name'), ('phys rev', 'name'), ('j', 'name'),
+    ('J Chem Phys', 'abbr'), ('Phys Rev Lett', 'abbr'), ('Nat', 'abbr'),
+]
+
+
+def stats(timings: List[float]) -> dict:
+    """Summary of ``timings`` (in seconds), in milliseconds"""
+
+    timings = sorted(timings)
+    return {
+        'n': len(timings),
+        'mean': statistics.mean(timings) * 1000,
+        'median': statistics.median(timings) * 1000,
+        'p95': timings[min(len(timings) - 1, int(len(timings) * .95))] * 1000,
+        'min': timings[0] * 1000,
+        'max': timings[-1] * 1000,
+    }
+
+
+def measure(func: Callable, number: int) -> List[float]:
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def bench_providers(server: StandinServer, args: argparse.Namespace) -> dict:
+    results = {}
+
+    for factory, citation in LOOKUPS:
+        p = server.attach(factory())
+        p.get_doi(*citation)  # warm up (connection, cookies)
+        results[p.CODE] = stats(measure(lambda: p.get_doi(*citation), args.number))
+
+    return results
+
+
+def bench_api(server: StandinServer, args: argparse.Namespace) -> dict:
+    settings.REGISTRY_PATH = registry_path
+    settings.REGISTRY_SNAPSHOT_PATH = None
+    settings.CACHE_CONFIG['PATH'] = None  # measure the lookups, not the cache
+    settings.APP_CONFIG['RATELIMIT_ENABLED'] = False
+    server.attach_all(settings.PROVIDERS)
+
+    from app import app
+
+    def request(url: str) -> float:
+        start = time.perf_counter()
+        response = app.test_client().get(url)
+        if response.status_code != 200:
+            raise Exception('{} gave {}'.format(url, response.status_code))
+
+        return time.perf_counter() - start
+
+    results = {}
+    urls = API_REQUESTS * args.number
+
+    for concurrency in args.concurrency:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            timings = list(executor.map(request, urls))
+            elapsed = time.perf_counter() - start
+
+        r = stats(timings)
+        r['throughput'] = len(urls) / elapsed  # requests per second
+        results['concurrency_{}'.format(concurrency)] = r
+
+    return results
+
+
+def bench_suggest(server: StandinServer, args: argparse.Namespace) -> dict:
+    uncached = registry.Registry(registry_path, settings.PROVIDERS, suggestions_cache_size=0)
+    cached = registry.Registry(registry_path, settings.PROVIDERS)
+    n, cutoff = settings.API_CONFIG['DEFAULT_NUM_SUGGESTIONS'], settings.API_CONFIG['DEFAULT_CUTOFF']
+
+    results = {}
+    for q, source in SUGGESTIONS:
+        results['{}:{}'.format(source, q)] = stats(
+            measure(lambda: uncached.suggest_journals(q, source, n, cutoff), args.number))
+
+        cached.suggest_journals(q, source, n, cutoff)  # (miss)
+        results['cached:{}:{}'.format(source, q)] = stats(
+            measure(lambda: cached.suggest_journals(q, source, n, cutoff), args.number))
+
+    assert uncached.suggestions_cache_stats['hit'] == 0
+    assert cached.suggestions_cache_stats['miss'] == len(SUGGESTIONS)
+
+    return results
+
+
+def bench_load(server: StandinServer, args: argparse.Namespace) -> dict:
+    temp_dir = tempfile.mkdtemp()
+    snapshot_path = os.path.join(temp_dir, 'registry.snapshot')
+
+    try:
+        registry.Registry(registry_path, settings.PROVIDERS, snapshot_path=snapshot_path)  # build the snapshot
+
+        return {
+            'yaml': stats(measure(lambda: registry.Registry(registry_path, settings.PROVIDERS), args.number)),
+            'snapshot': stats(measure(
+                lambda: registry.Registry(registry_path, settings.PROVIDERS, snapshot_path=snapshot_path),
+                args.number)),
+        }
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+GROUPS = {
+    'providers': bench_providers,
+    'api': bench_api,
+    'suggest': bench_suggest,
+    'load': bench_load,
+}
+
+
+def compare(previous: dict, current: dict):
+    """Print the ratio of the medians (and throughputs) between two runs"""
+
+    print('{:<50} {:>12} {:>12} {:>8}'.format('benchmark', 'before', 'after', 'ratio'))
+
+    for group, results in current['results'].items():
+        for name, r in results.items():
+            prev = previous['results'].get(group, {}).get(name)
+            if prev is None:
+                continue
+
+            key = 'throughput' if 'throughput' in r else 'median'
+            print('{:<50} {:>12.3f} {:>12.3f} {:>7.2f}x'.format(
+                '{}/{} ({})'.format(group, name, key), prev[key], r[key], r[key] / prev[key]))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='benchmark goto-publication (offline)')
+    parser.add_argument('-g', '--groups', nargs='*', choices=list(GROUPS.keys()), default=list(GROUPS.keys()))
+    parser.add_argument('-n', '--number', type=int, default=20, help='number of executions of each benchmark')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='*', default=[1, 8, 32])
+    parser.add_argument('-l', '--latency', type=float, default=.05, help='latency of the stand-in (in seconds)')
+    parser.add_argument('-e', '--error-rate', type=float, default=.0, help='error rate of the stand-in')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument('--compare', type=argparse.FileType('r'), help='previous output, to compare with')
+    args = parser.parse_args()
+
+    output = {
+        'version': __version__,
+        'date': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'number': args.number, 'concurrency': args.concurrency, 'latency': args.latency,
+            'error_rate': args.error_rate
+        },
+        'results': {}
+    }
+
+    with StandinServer(latency=args.latency, error_rate=args.error_rate) as server:
+        for group in args.groups:
+            output['results'][group] = GROUPS[group](server, args)
+
+    json.dump(output, args.output, indent=2)
+    args.output.write('\n')
+
+    if args.compare is not None:
+        compare(json.load(args.compare), output)
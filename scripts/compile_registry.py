@@ -0,0 +1,39 @@
+"""
+Compile the registry into a snapshot, so that the workers do not have to parse it
+"""
+
+import argparse
+import os
+import time
+
+from settings import REGISTRY_PATH, ABBREVIATIONS_CONFIG, REGISTRY_SNAPSHOT_PATH, PROVIDERS
+
+from goto_publication import registry, abbreviations
+
+registry_path = '../' + REGISTRY_PATH
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='compile the registry')
+    parser.add_argument(
+        '-o', '--output', action='store', default='../' + (REGISTRY_SNAPSHOT_PATH or 'journals_register.snapshot'),
+        help='snapshot path')
+    parser.add_argument(
+        '-P', '--processes', type=int, default=os.cpu_count(), help='number of processes to compute the abbreviations')
+    args = parser.parse_args()
+
+    if ABBREVIATIONS_CONFIG.get('PATH') is not None:
+        abbreviations.set_store(abbreviations.AbbreviationStore('../' + ABBREVIATIONS_CONFIG['PATH']))
+    abbreviations.ABBREVIATOR.processes = args.processes
+
+    providers = dict((p.CODE, p) for p in PROVIDERS)
+
+    with open(registry_path, 'rb') as f:
+        content = f.read()
+
+    t = time.time()
+    snapshot = registry.compile_registry(content, providers)
+    registry.save_snapshot(args.output, snapshot)
+
+    print('- Compiled {} journals in {:.3f}s'.format(len(snapshot['journals']), time.time() - t))
+    print('- Key: {}'.format(snapshot['key']))
@@ -0,0 +1,46 @@
+"""
+Export the journals of the registry as NDJSON (one JSON object per line, as `/api/journals/export`), reading the
+registry file progressively
+"""
+
+import argparse
+import sys
+
+from settings import REGISTRY_PATH, ABBREVIATIONS_CONFIG, PROVIDERS
+
+from goto_publication import registry, journal, abbreviations, export
+
+registry_path = '../' + REGISTRY_PATH
+
+
+def journals(path: str, providers: dict):
+    with open(path) as f:
+        for j in registry.iter_registry(f):
+            if j['provider'] in providers:
+                yield journal.Journal.deserialize(j, providers[j['provider']])
+
+
+if __name__ == '__main__':
+
+    providers = dict((p.CODE, p) for p in PROVIDERS)
+
+    parser = argparse.ArgumentParser(description='export the journals as NDJSON')
+    parser.add_argument('-i', '--input', default=registry_path, help='registry file')
+    parser.add_argument('-o', '--output', help='output file (default: standard output)')
+    parser.add_argument('-p', '--provider', choices=list(providers.keys()), help='only the journals of this provider')
+    parser.add_argument('-z', '--gzip', action='store_true', help='compress the output')
+    args = parser.parse_args()
+
+    # (for the journals without abbreviation)
+    if ABBREVIATIONS_CONFIG.get('PATH') is not None:
+        abbreviations.set_store(abbreviations.AbbreviationStore('../' + ABBREVIATIONS_CONFIG['PATH']))
+
+    output = open(args.output, 'wb') if args.output is not None else sys.stdout.buffer
+
+    try:
+        for chunk in export.ndjson(
+                export.journal_lines(journals(args.input, providers), args.provider), gzip=args.gzip):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
@@ -2,17 +2,51 @@
 Find missing journals in provider
 """
 
+import os
+import json
+import time
 import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 from datetime import datetime
 
-from settings import REGISTRY_PATH, PROVIDERS
+from settings import REGISTRY_PATH, ABBREVIATIONS_CONFIG, PROVIDERS
 
-from goto_publication import journal
+from goto_publication import journal, abbreviations
 
 registry_path = '../' + REGISTRY_PATH
+state_path = registry_path + '.state'
+
+
+def journal_key(j: journal.Journal) -> str:
+    return json.dumps([j.provider.CODE, j.identifier])
+
+
+def report(prev: dict, new: dict):
+    """Report added, removed and renamed journals (a renamed journal keeps its identifier)"""
+
+    prev_keys = dict((journal_key(j), j) for j in prev.values())
+    new_keys = dict((journal_key(j), j) for j in new.values())
+
+    renamed = []
+    for k, j in new_keys.items():
+        if k in prev_keys and prev_keys[k].name != j.name:
+            renamed.append((prev_keys[k].name, j.name))
+
+    renamed_names = set(n for n, _ in renamed) | set(n for _, n in renamed)
+    added = sorted(n for n in new if n not in prev and n not in renamed_names)
+    removed = sorted(n for n in prev if n not in new and n not in renamed_names)
+
+    print('\nChanges: {} added, {} removed, {} renamed'.format(len(added), len(removed), len(renamed)))
+    for n in added:
+        print('  + {}'.format(n))
+    for n in removed:
+        print('  - {}'.format(n))
+    for o, n in sorted(renamed):
+        print('  ~ {} -> {}'.format(o, n))
+
 
 if __name__ == '__main__':
 
@@ -26,9 +60,26 @@ if __name__ == '__main__':
     parser.add_argument('-m', '--mix', action='store_true', help='update registry')
     parser.add_argument(
         '-O', '--only', action='store', help='Only update given providers in a comma separated list (implies `-m`)')
+    parser.add_argument(
+        '-i', '--incremental', action='store_true',
+        help='skip providers for which the listing did not change since last run (implies `-m`). '
+             'The providers without a listing to check (e.g., the ScienceDirect API) are always crawled')
+    parser.add_argument(
+        '-r', '--remove', action='store_true',
+        help='with `-m`, `-O` or `-i`, remove the journals that are not listed anymore by the crawled providers '
+             '(otherwise, they are kept)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help='number of providers (and pages of a listing) fetched concurrently')
+
+    parser.add_argument(
+        '-P', '--processes', type=int, default=os.cpu_count(), help='number of processes to compute the abbreviations')
 
     args = parser.parse_args()
 
+    if ABBREVIATIONS_CONFIG.get('PATH') is not None:
+        abbreviations.set_store(abbreviations.AbbreviationStore('../' + ABBREVIATIONS_CONFIG['PATH']))
+    abbreviations.ABBREVIATOR.processes = args.processes
+
     # backup
     if args.backup:
         shutil.copy(registry_path, registry_path + '.bak')
@@ -36,7 +87,7 @@ if __name__ == '__main__':
     # prepare mixing
     prev_journals = {}
 
-    if args.mix or args.only:
+    if args.mix or args.only or args.incremental:
         with open(registry_path) as f:
             journals_base = yaml.load(f, Loader=yaml.Loader)
         for journals in journals_base:
@@ -54,19 +105,86 @@ if __name__ == '__main__':
             if p not in providers:
                 raise Exception('provider {} unknown, must be in: {}'.format(p, ', '.join(providers.keys())))
 
-    for p in PROVIDERS:
-        if p.CODE in p_list:
-            print('- Getting journals from {}'.format(p.NAME), end='')
-            try:
-                journals = p.get_journals()
-                for j in journals:
-                    prev_journals[j.name] = j
-                print(' ({})'.format(len(journals)))
-            except NotImplementedError:
+    # incremental refresh: per provider, the state of the listing pages (see `check_listing()`) and the hash of the
+    # journals that were parsed from them
+    listing_states = {}
+    if args.incremental and os.path.exists(state_path):
+        with open(state_path) as f:
+            listing_states = yaml.load(f, Loader=yaml.Loader) or {}
+
+    unchanged = object()
+
+    def get_journals(p):
+        prev_state = listing_states.get(p.CODE, {})
+        if 'pages' not in prev_state:  # (former state file)
+            prev_state = {}
+
+        if args.incremental:
+            changed, pages_state = p.check_listing(prev_state.get('pages', {}), jobs=args.jobs)
+            if not changed:
+                listing_states[p.CODE] = {'pages': pages_state, 'journals': prev_state.get('journals')}
+                return unchanged
+
+        try:
+            journals = p.get_journals(jobs=args.jobs)
+        except NotImplementedError:
+            return None
+
+        if args.incremental:
+            listing_states[p.CODE] = {'pages': pages_state, 'journals': journal.journals_hash(journals)}
+            if listing_states[p.CODE]['journals'] == prev_state.get('journals'):
+                return unchanged
+
+        return journals
+
+    base_journals = dict(prev_journals)
+    crawled = {}
+
+    # crawl concurrently, but merge in the order of `PROVIDERS`, so that the output is stable
+    to_crawl = [p for p in PROVIDERS if p.CODE in p_list]
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(get_journals, p) for p in to_crawl]
+
+        for p, future in zip(to_crawl, futures):
+            print('- Getting journals from {}'.format(p.NAME), end='', flush=True)
+            journals = future.result()
+            if journals is None:
                 print(' (skipped, `get_journals()` not implemented)')
+                continue
+            if journals is unchanged:
+                print(' (skipped, listing did not change)')
+                continue
+
+            crawled[p.CODE] = journals
+            for j in journals:
+                prev_journals[j.name] = j
+            print(' ({})'.format(len(journals)))
+
+    if args.remove:
+        # listings are authoritative (journals that disappeared are removed), and journals are grouped by provider
+        journals_per_provider = dict((p.CODE, []) for p in PROVIDERS)
+        for j in base_journals.values():
+            journals_per_provider[j.provider.CODE].append(j)
+
+        prev_journals = {}
+        for p in PROVIDERS:
+            for j in crawled.get(p.CODE, journals_per_provider[p.CODE]):
+                prev_journals[j.name] = j
+
+    if args.mix or args.only or args.incremental:
+        report(base_journals, prev_journals)
+
+    # the abbreviations of the new journals, at once
+    t = time.time()
+    journal.abbreviate_journals(prev_journals.values())
+    print('\nAbbreviations computed in {:.3f}s'.format(time.time() - t))
 
     print('\nTotal: {}'.format(len(prev_journals)))
 
     with open(registry_path, 'w') as f:
         f.write('# generated on {}\n'.format(datetime.now()))
         yaml.dump(list(i.serialize() for i in prev_journals.values()), f, Dumper=yaml.Dumper)
+
+    if args.incremental:
+        with open(state_path, 'w') as f:
+            yaml.dump(listing_states, f, Dumper=yaml.Dumper)
@@ -18,6 +18,15 @@ API_CONFIG = {
     'MAX_COUNT': 100,
     'DEFAULT_CUTOFF': 0.6,
     'DEFAULT_NUM_SUGGESTIONS': 15,
+    'SUGGESTIONS_CACHE_SIZE': 1024,  # number of suggestions kept in memory, by each worker
+    'MAX_BATCH_SIZE': 100,
+    'BATCH_MAX_PER_PROVIDER': 4,  # maximum number of concurrent lookups for a given provider
+    'BATCH_DEADLINE': 30,  # in seconds
+    # `Cache-Control` of the responses (in seconds)
+    'JOURNALS_MAX_AGE': 3600,
+    'PROVIDERS_MAX_AGE': 10,
+    'URL_MAX_AGE': 24 * 3600,
+    'APPROXIMATE_URL_MAX_AGE': 0,  # URLs that may be replaced by the exact ones (so, to be revalidated with the ETag)
 }
 
 WEBPAGE_INFO = {
@@ -31,17 +40,53 @@ WEBPAGE_INFO = {
 }
 
 REGISTRY_PATH = 'journals_register.yml'
+REGISTRY_SNAPSHOT_PATH = 'journals_register.snapshot'  # compiled registry, rebuilt when needed (`None` to disable)
 
+CACHE_CONFIG = {
+    # Cache of the DOI/URL lookups, shared by all the workers of the host (set `PATH` to `None` to disable it)
+    'PATH': 'cache.sqlite',
+    'TTL': 30 * 24 * 3600,  # in seconds
+    'NEGATIVE_TTL': 3600,  # for the articles that were not found
+    'MAX_SIZE': 100000,  # number of entries
+}
+
+ABBREVIATIONS_CONFIG = {
+    # ISO-4 abbreviations of the journal names, memoized in this file (set `PATH` to `None` to only keep them in memory)
+    'PATH': 'abbreviations.sqlite',
+    'PROCESSES': 1,  # processes computing the missing abbreviations of a registry (the scripts use all the CPUs)
+}
+
+METRICS_CONFIG = {
+    # Metrics of the workers, aggregated through this file (set `PATH` to `None` to only report the current worker)
+    'PATH': 'metrics.sqlite',
+    'FLUSH_INTERVAL': 1,  # in seconds
+}
+
+RATE_LIMIT_CONFIG = {
+    # Token buckets of the outbound rate limits (see `rate_limit` below), shared by all the workers of the host through
+    # this file (`None` for a file in the temporary directory)
+    'PATH': None,
+}
+
+PROFILING_CONFIG = {
+    # Profile (with cProfile) a fraction of the API requests, and keep the profiles of the slowest ones
+    'SAMPLE_RATE': 0,  # between 0 (disabled) and 1
+    'ADMIN_TOKEN': None,  # if set, requests with a `X-Profile: <ADMIN_TOKEN>` header are profiled as well
+    'PATH': 'profiles',
+    'KEEP': 10,  # number of profiles
+}
+
+# each provider accepts a `rate_limit` (e.g., `rate_limit='2/second'`, or `'30/minute'`) for its outbound requests
 PROVIDERS = [  # please keep this alphabetic
     providers.ACS(),
-    providers.APS(),
+    providers.APS(doi_verification='get'),  # or 'head', 'handle' (DOI resolver) or 'trust' (no verification)
     providers.AIP(),
     providers.IOP(),
     providers.Nature(),
-    providers.RSC(),
+    providers.RSC(rate_limit='2/second'),
     providers.ScienceDirect(concepts=['CHEM', 'PHYS']),
     providers.Springer(concepts=['Chemistry', 'Physics']),
-    providers.Wiley(concepts=[93, 43]),
+    providers.Wiley(concepts=[93, 43], rate_limit='2/second'),
 ]
 
 # Load the production settings, overwrite the existing ones if needed